@@ -1,12 +1,9 @@
-import uuid
 import json
 import threading
-import time
 from pika import BasicProperties
-from pika.exceptions import AMQPConnectionError
 
-from book_cruises.commons.utils import logger
 from .connection import create_connection
+from .rpc_client import RpcClient
 
 
 class RabbitMQProducer:
@@ -17,8 +14,7 @@ class RabbitMQProducer:
         self.connection = None
         self.channel = None
         self._lock = threading.Lock()
-        self._response_lock = threading.Lock()
-        self.responses = {}
+        self.rpc_client: RpcClient = None
 
     def _ensure_channel(self):
         with self._lock:
@@ -35,58 +31,26 @@ class RabbitMQProducer:
             body=json.dumps(message).encode(),
             properties=BasicProperties(content_type="application/json", delivery_mode=2),
         )
-        self.close()
-
-    def _on_response(self, ch, method, props, body):
-        with self._response_lock:
-            self.responses[props.correlation_id] = json.loads(body)
-        ch.basic_ack(delivery_tag=method.delivery_tag)
+        self._close_connection()
 
     def rpc_publish(self, routing_key: str, message: dict, timeout=5, exchange: str = ""):
-        self._ensure_channel()
-        correlation_id = str(uuid.uuid4())
-        result = self.channel.queue_declare(queue="", exclusive=True, auto_delete=True)
-        callback_queue = result.method.queue
-
-        self.channel.basic_consume(
-            queue=callback_queue,
-            on_message_callback=self._on_response,
-            auto_ack=False
-        )
-
-        self.channel.basic_publish(
-            exchange=exchange,
-            routing_key=routing_key,
-            body=json.dumps(message).encode(),
-            properties=BasicProperties(
-                reply_to=callback_queue,
-                correlation_id=correlation_id,
-                content_type="application/json",
-                delivery_mode=2,
-            ),
-        )
-
-        # Start the I/O loop in a separate thread if not already running
-        def consumer_loop():
-            while correlation_id not in self.responses:
-                try:
-                    self.connection.process_data_events(time_limit=0.1)
-                except AMQPConnectionError as e:
-                    print(f"Lost connection while waiting for RPC reply: {e}")
-                    break
+        """Sends a request and waits up to `timeout` seconds for its reply (None on timeout).
 
-        start = time.time()
-        thread = threading.Thread(target=consumer_loop)
-        thread.start()
-        thread.join(timeout)
-        
-        self.close()
-
-        with self._response_lock:
-            return self.responses.pop(correlation_id, None)
-        
+        All calls share one RpcClient, so concurrent requests reuse its
+        connection and reply queue instead of opening their own.
+        """
+        with self._lock:
+            if self.rpc_client is None:
+                self.rpc_client = RpcClient(self.host, self.username, self.password)
+        return self.rpc_client.call(routing_key, message, timeout=timeout, exchange=exchange)
 
     def close(self):
+        if self.rpc_client:
+            self.rpc_client.close()
+            self.rpc_client = None
+        self._close_connection()
+
+    def _close_connection(self):
         if self.channel and self.channel.is_open:
             self.channel.close()
         if self.connection and self.connection.is_open:
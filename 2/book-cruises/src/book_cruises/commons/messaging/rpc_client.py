@@ -0,0 +1,166 @@
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future
+
+from pika import BasicProperties, SelectConnection
+
+from book_cruises.commons.utils import logger
+from .connection import create_parameters
+
+RECONNECT_DELAY = 1  # Seconds between reconnection attempts
+DIRECT_REPLY_TO = "amq.rabbitmq.reply-to"  # Pseudo-queue that routes RPC replies straight to this channel
+
+
+class RpcClient:
+    """Thread-safe RPC client sharing one connection and reply queue per process.
+
+    A background I/O thread owns the connection and consumes RabbitMQ's direct
+    reply-to pseudo-queue; every `call` publishes through that thread and waits
+    on a future resolved by the reply with the same correlation id. A call costs
+    one broker round-trip, no matter how many threads are calling at once.
+    """
+
+    def __init__(self, host: str, username: str, password: str):
+        self.host = host
+        self.username = username
+        self.password = password
+        self.connection: SelectConnection = None
+        self.channel = None
+
+        self.__lock = threading.Lock()
+        self.__io_thread: threading.Thread = None
+        self.__closing = False
+        self.__ready = threading.Event()
+        self.__outbox: deque = deque()  # (exchange, routing_key, body, properties) waiting for the I/O thread
+        self.__pending_replies: dict[str, Future] = {}  # Correlation id -> reply
+
+    def call(self, routing_key: str, message: dict, timeout: float = 5, exchange: str = ""):
+        """Sends a request and waits up to `timeout` seconds for its reply.
+
+        Returns the decoded reply, or None if it does not arrive in time.
+        """
+        self.__start()
+        correlation_id = str(uuid.uuid4())
+        reply = Future()
+        self.__pending_replies[correlation_id] = reply
+        self.__outbox.append(
+            (
+                exchange,
+                routing_key,
+                json.dumps(message).encode(),
+                BasicProperties(
+                    reply_to=DIRECT_REPLY_TO,
+                    correlation_id=correlation_id,
+                    content_type="application/json",
+                    delivery_mode=2,
+                ),
+            )
+        )
+        self.__wake()
+        try:
+            return reply.result(timeout)
+        except TimeoutError:
+            logger.warning(f"No reply from '{routing_key}' after {timeout}s")
+            return None
+        finally:
+            self.__pending_replies.pop(correlation_id, None)
+
+    def close(self):
+        with self.__lock:
+            io_thread, self.__io_thread = self.__io_thread, None
+        if io_thread is None:
+            return
+        self.__closing = True
+        if self.connection:
+            self.connection.ioloop.add_callback_threadsafe(self.__shutdown)
+        io_thread.join(RECONNECT_DELAY * 5)
+
+    def __start(self) -> None:
+        with self.__lock:
+            if self.__io_thread is not None:
+                return
+            self.__closing = False
+            self.__io_thread = threading.Thread(target=self.__run, daemon=True)
+            self.__io_thread.start()
+
+    def __wake(self) -> None:
+        connection = self.connection
+        if connection is None:
+            return
+        try:
+            connection.ioloop.add_callback_threadsafe(self.__drain)
+        except Exception:
+            # The connection is being replaced; the new channel drains the outbox when it opens
+            pass
+
+    def __run(self) -> None:
+        while not self.__closing:
+            self.connection = SelectConnection(
+                parameters=create_parameters(self.host, self.username, self.password),
+                on_open_callback=self.__on_connection_open,
+                on_open_error_callback=self.__on_connection_open_error,
+                on_close_callback=self.__on_connection_closed,
+            )
+            self.connection.ioloop.start()
+            if not self.__closing:
+                time.sleep(RECONNECT_DELAY)
+
+    def __shutdown(self) -> None:
+        if self.connection.is_open:
+            self.connection.close()
+        elif not self.connection.is_closing:
+            self.connection.ioloop.stop()
+
+    def __on_connection_open(self, connection: SelectConnection) -> None:
+        connection.channel(on_open_callback=self.__on_channel_open)
+
+    def __on_connection_open_error(self, connection: SelectConnection, error: Exception) -> None:
+        logger.error(f"RPC client failed to connect to RabbitMQ, retrying: {error}")
+        connection.ioloop.stop()
+
+    def __on_connection_closed(self, connection: SelectConnection, reason: Exception) -> None:
+        self.channel = None
+        self.__ready.clear()
+        if not self.__closing:
+            logger.warning(f"RPC client connection closed, reconnecting: {reason}")
+        connection.ioloop.stop()
+
+    def __on_channel_open(self, channel) -> None:
+        self.channel = channel
+        channel.add_on_close_callback(self.__on_channel_closed)
+        # Replies to direct reply-to must be consumed, without acks, before any request is sent
+        channel.basic_consume(
+            queue=DIRECT_REPLY_TO, on_message_callback=self.__on_response, auto_ack=True
+        )
+        self.__ready.set()
+        self.__drain()
+
+    def __on_channel_closed(self, channel, reason: Exception) -> None:
+        self.channel = None
+        self.__ready.clear()
+        if not self.__closing:
+            logger.warning(f"RPC client channel closed: {reason}")
+            if self.connection and self.connection.is_open:
+                self.connection.close()
+
+    def __drain(self) -> None:
+        while self.__ready.is_set() and self.__outbox:
+            exchange, routing_key, body, properties = self.__outbox.popleft()
+            if properties.correlation_id not in self.__pending_replies:
+                continue  # The caller already gave up
+            self.channel.basic_publish(
+                exchange=exchange, routing_key=routing_key, body=body, properties=properties
+            )
+
+    def __on_response(self, channel, method, properties: BasicProperties, body: bytes) -> None:
+        reply = self.__pending_replies.pop(properties.correlation_id, None)
+        if reply is None:
+            logger.debug(f"Discarding late RPC reply '{properties.correlation_id}'")
+            return
+        try:
+            reply.set_result(json.loads(body))
+        except json.JSONDecodeError as e:
+            reply.set_exception(e)
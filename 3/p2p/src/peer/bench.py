@@ -0,0 +1,519 @@
+"""Simulação e benchmark da rede P2P, sem a CLI interativa.
+
+Inicia um serviço de nomes local e N peers, no próprio processo ou em
+subprocessos, e mede:
+- tempo de failover: da queda do tracker até um novo tracker registrado
+  (e, com peers no processo, até todos os peers o conhecerem);
+- latência das buscas de arquivos (percentis);
+- vazão dos downloads em swarm;
+- mensagens Pyro por operação, por método remoto.
+
+Com peers em subprocessos (para centenas de peers sem disputar o GIL) as
+buscas são feitas pelo próprio benchmark no tracker, e downloads e
+contagem de mensagens dos peers não são medidos.
+
+Uso: python -m peer.bench --peers 20 --kills 3
+"""
+import os
+import sys
+import json
+import time
+import random
+import signal
+import argparse
+import tempfile
+import threading
+import subprocess
+
+import Pyro5.api
+import Pyro5.client
+import Pyro5.errors
+import Pyro5.nameserver
+
+from collections import Counter
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from .logging import logger
+from .utils import generate_random_file
+
+BENCH_NS_HOST = "localhost"  # Serviço de nomes iniciado pelo benchmark
+SETTLE_TIMEOUT = 60  # Espera máxima padrão até todas as partições terem tracker
+FAILOVER_TIMEOUT = 30  # Espera máxima por um novo tracker após uma queda
+POLL_INTERVAL = 0.01  # Intervalo entre consultas ao serviço de nomes durante o failover
+SEED_FILE = "bench_{}.bin"  # Arquivo grande de cada peer semeador
+DEFAULT_FILE_SIZE = 8 * 1024 * 1024  # Tamanho padrão do arquivo grande
+
+
+def percentile(values, p):
+    """Percentil 'p' (0-100) pelo método do posto mais próximo; None se não houver valores"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(p / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50),
+        "p90": percentile(values, 90),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else None,
+    }
+
+
+def seed_peer(peer, size, sparse=False):
+    """Cria o arquivo grande do peer antes de iniciá-lo; ele é anunciado junto com os demais"""
+    filename = SEED_FILE.format(peer.name)
+    if filename not in peer.local_store:
+        path = peer.get_file_path(filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        generate_random_file(path, size, sparse=sparse)
+        peer.add_file(filename, flush=False)
+    return filename
+
+
+class MessageCounter:
+    """Conta as chamadas Pyro feitas neste processo, por método remoto.
+
+    As consultas do próprio benchmark para acompanhar a rede são feitas
+    dentro de 'ignored()' e não entram na contagem.
+    """
+
+    def __init__(self):
+        self.counts = Counter()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def install(self):
+        original = Pyro5.client.Proxy._pyroInvoke
+        counter = self
+
+        def invoke(proxy, methodname, vargs, kwargs, flags=0, objectId=None):
+            if not getattr(counter.local, "ignored", False):
+                with counter.lock:
+                    counter.counts[methodname] += 1
+            return original(proxy, methodname, vargs, kwargs, flags, objectId)
+
+        Pyro5.client.Proxy._pyroInvoke = invoke
+
+    @contextmanager
+    def ignored(self):
+        self.local.ignored = True
+        try:
+            yield
+        finally:
+            self.local.ignored = False
+
+    def snapshot(self):
+        with self.lock:
+            return Counter(self.counts)
+
+
+class LocalCluster:
+    """Peers no mesmo processo do benchmark; permite medir os próprios peers."""
+
+    in_process = True
+
+    def __init__(self, names, seeders, seed_size, sparse):
+        from .peer import Peer  # Importado depois das variáveis de ambiente do benchmark
+
+        self.peers = {name: Peer(name) for name in names}
+        self.seeds = {name: seed_peer(self.peers[name], seed_size, sparse) for name in seeders}
+        self.alive = set(names)
+
+    def start(self):
+        for peer in self.peers.values():
+            peer.start_peer()
+
+    def kill(self, name):
+        self.alive.discard(name)
+        self.peers[name].stop()
+
+    def close(self):
+        for name in list(self.alive):
+            self.kill(name)
+
+
+class ProcessCluster:
+    """Cada peer em um subprocesso, finalizado com SIGKILL para simular uma queda."""
+
+    in_process = False
+
+    def __init__(self, names, seeders, seed_size, sparse, log_level):
+        self.names = names
+        self.seeders = set(seeders)
+        self.seed_size = seed_size
+        self.sparse = sparse
+        self.log_level = log_level
+        self.seeds = {name: SEED_FILE.format(name) for name in seeders}
+        self.processes = {}
+        self.alive = set()
+
+    def start(self):
+        env = dict(os.environ)
+        src_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [src_dir, env.get("PYTHONPATH")]))
+        for name in self.names:
+            command = [sys.executable, "-m", "peer.bench", "--worker", name, "--log-level", self.log_level]
+            if name in self.seeders:
+                command += ["--file-size", str(self.seed_size)] + (["--sparse"] if self.sparse else [])
+            self.processes[name] = subprocess.Popen(command, env=env)
+            self.alive.add(name)
+
+    def kill(self, name):
+        self.alive.discard(name)
+        process = self.processes[name]
+        process.kill()
+        process.wait()
+
+    def close(self):
+        for name in list(self.alive):
+            self.kill(name)
+
+
+class Benchmark:
+    def __init__(self, args, cluster, counter):
+        from .peer import RANDOM_FILES
+        from .pool import ProxyPool, NameServerCache
+        from .sharding import TRACKER_SHARDS, HashRing
+
+        self.args = args
+        self.cluster = cluster
+        self.counter = counter
+        self.pool = ProxyPool()
+        self.ns = NameServerCache(self.pool, BENCH_NS_HOST)
+        self.shards = TRACKER_SHARDS
+        self.files_per_peer = RANDOM_FILES
+        self.ring = HashRing()
+        self.results = {"config": vars(args)}
+
+    # Serviço de nomes
+    def peer_uris(self):
+        return {name[len("Peer_"):]: str(uri) for name, uri in self.ns.list(prefix="Peer_", fresh=True).items()}
+
+    def current_trackers(self):
+        """Tracker mais recente de cada partição: {partição: (época, uri)}"""
+        from .sharding import parse_tracker_name
+
+        latest = {}
+        for name, uri in self.ns.list(prefix="Tracker_", fresh=True).items():
+            parsed = parse_tracker_name(name)
+            if parsed and parsed[1] > latest.get(parsed[0], (0, None))[0]:
+                latest[parsed[0]] = (parsed[1], str(uri))
+        return latest
+
+    def live_trackers(self):
+        """Partições cujo tracker mais recente está vivo: {partição: (época, nome do peer)}"""
+        names = {uri: name for name, uri in self.peer_uris().items()}
+        return {
+            shard_id: (epoch, names[uri])
+            for shard_id, (epoch, uri) in self.current_trackers().items()
+            if names.get(uri) in self.cluster.alive
+        }
+
+    def converged(self, shard_id, tracker_name):
+        # Todos os peers vivos conhecem o tracker da partição
+        tracker_uri = self.cluster.peers[tracker_name].uri
+        return all(self.cluster.peers[name].trackers[shard_id].tracker_uri == tracker_uri for name in self.cluster.alive)
+
+    def wait_until(self, condition, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                with self.counter.ignored():
+                    if condition():
+                        return True
+            except Pyro5.errors.PyroError:
+                pass  # Serviço de nomes ocupado; tenta de novo
+            time.sleep(POLL_INTERVAL)
+        return False
+
+    # Fases
+    def settle(self):
+        started = time.monotonic()
+        timeout = self.args.settle_timeout
+        expected = len(self.cluster.alive)
+        ok = self.wait_until(lambda: len(self.peer_uris()) >= expected, timeout)
+        if ok and self.args.mode == "tracker":
+            ok = self.wait_until(lambda: len(self.live_trackers()) == self.shards, timeout)
+            if ok and self.cluster.in_process:
+                ok = self.wait_until(
+                    lambda: all(self.converged(s, name) for s, (_, name) in self.live_trackers().items()),
+                    timeout,
+                )
+        if not ok:
+            with self.counter.ignored():
+                registered, trackers = len(self.peer_uris()), len(self.live_trackers())
+            raise TimeoutError(
+                f"Rede não estabilizou em {timeout}s: {registered}/{expected} peers registrados, "
+                f"{trackers}/{self.shards} partições com tracker"
+            )
+        # Arquivos iniciais anunciados e primeiras rodadas de heartbeat/republicação concluídas
+        time.sleep(self.args.warmup)
+        self.results["startup_seconds"] = time.monotonic() - started
+        logger.info(f"Rede estável em {self.results['startup_seconds']:.2f}s")
+
+    def measure_idle(self):
+        """Mensagens por segundo sem operações (heartbeats, republicações), para descontar das fases"""
+        before = self.counter.snapshot()
+        time.sleep(self.args.idle)
+        delta = self.counter.snapshot() - before
+        self.results["idle_messages_per_second"] = {
+            method: count / self.args.idle for method, count in delta.most_common()
+        }
+
+    def _phase_messages(self, before, operations):
+        delta = self.counter.snapshot() - before
+        return {method: count / operations for method, count in delta.most_common()} if operations else {}
+
+    def _lookup_targets(self):
+        names = sorted(self.cluster.alive)
+        return [f"arquivo_{random.choice(names)}_{random.randrange(self.files_per_peer)}.txt" for _ in range(self.args.lookups)]
+
+    def _lookup_in_process(self, filename):
+        owner = filename.split("_")[1]
+        client = self.cluster.peers[random.choice([name for name in self.cluster.alive if name != owner])]
+        started = time.monotonic()
+        located = client.locate_file(filename)
+        elapsed = time.monotonic() - started
+        return elapsed, bool(located and owner in located[0])
+
+    def _lookup_remote(self, filename, trackers):
+        # Mesmas chamadas de Peer.locate_file, feitas pelo benchmark no tracker da partição
+        owner = filename.split("_")[1]
+        started = time.monotonic()
+        _, uri = trackers[self.ring.owner(filename)]
+        with self.pool.proxy(uri) as tracker:
+            holders = tracker.list_peers_with_file(filename)
+            tracker.get_manifest(filename)
+        return time.monotonic() - started, owner in holders
+
+    def measure_lookups(self):
+        if not self.args.lookups or not self.files_per_peer:
+            return
+        if not self.cluster.in_process and self.args.mode == "dht":
+            logger.warning("Buscas pela DHT só são medidas com peers no processo (--in-process)")
+            return
+        if self.cluster.in_process:
+            lookup = self._lookup_in_process
+        else:
+            with self.counter.ignored():
+                trackers = self.current_trackers()
+            lookup = lambda filename: self._lookup_remote(filename, trackers)
+        before = self.counter.snapshot()
+        latencies, failures = [], 0
+        with ThreadPoolExecutor(max_workers=self.args.concurrency) as executor:
+            for future in [executor.submit(lookup, filename) for filename in self._lookup_targets()]:
+                try:
+                    elapsed, found = future.result()
+                except (Pyro5.errors.PyroError, KeyError, IndexError) as e:
+                    logger.debug(f"Falha na busca: {e}")
+                    failures += 1
+                    continue
+                latencies.append(elapsed)
+                failures += not found
+        self.results["lookups"] = dict(summarize(latencies), failures=failures)
+        self.results["lookup_messages"] = self._phase_messages(before, self.args.lookups)
+
+    def measure_downloads(self):
+        if not self.args.downloads or not self.cluster.seeds:
+            return
+        if not self.cluster.in_process:
+            logger.warning("Downloads só são medidos com peers no processo (--in-process)")
+            return
+        before = self.counter.snapshot()
+        downloads = []
+        for _ in range(self.args.downloads):
+            seeder, filename = random.choice(list(self.cluster.seeds.items()))
+            candidates = [
+                name for name in self.cluster.alive if name != seeder and filename not in self.cluster.peers[name].local_store
+            ]
+            if not candidates:
+                break
+            client = self.cluster.peers[random.choice(candidates)]
+            started = time.monotonic()
+            path = client.download_file_swarm(filename)
+            elapsed = time.monotonic() - started
+            downloads.append({
+                "peer": client.name,
+                "filename": filename,
+                "seconds": elapsed,
+                "ok": path is not None,
+                "mb_per_second": self.args.file_size / elapsed / 1e6 if path else 0.0,
+            })
+        throughputs = [download["mb_per_second"] for download in downloads if download["ok"]]
+        self.results["downloads"] = dict(summarize(throughputs), failures=sum(not d["ok"] for d in downloads))
+        self.results["download_runs"] = downloads
+        self.results["download_messages"] = self._phase_messages(before, len(downloads))
+
+    def measure_failovers(self):
+        failovers = []
+        before = self.counter.snapshot()
+        for kill in range(self.args.kills):
+            time.sleep(self.args.kill_interval)
+            shard_id = kill % self.shards
+            with self.counter.ignored():
+                trackers = self.live_trackers()
+            if shard_id not in trackers:
+                logger.warning(f"Partição {shard_id} sem tracker vivo, queda ignorada")
+                continue
+            epoch, victim = trackers[shard_id]
+            logger.info(f"Derrubando tracker {victim} | Partição {shard_id} | Época {epoch}")
+            started = time.monotonic()
+            self.cluster.kill(victim)
+
+            def elected():
+                current = self.live_trackers().get(shard_id)
+                return current is not None and current[0] > epoch
+
+            result = {"shard": shard_id, "victim": victim, "old_epoch": epoch, "failover_seconds": None}
+            if self.wait_until(elected, FAILOVER_TIMEOUT):
+                result["failover_seconds"] = time.monotonic() - started
+                with self.counter.ignored():
+                    result["new_epoch"], result["new_tracker"] = self.live_trackers()[shard_id]
+                if self.cluster.in_process and self.wait_until(
+                    lambda: self.converged(shard_id, result["new_tracker"]), FAILOVER_TIMEOUT
+                ):
+                    result["converged_seconds"] = time.monotonic() - started
+            else:
+                logger.error(f"Nenhum tracker eleito em {FAILOVER_TIMEOUT}s após a queda de {victim}")
+            failovers.append(result)
+        times = [f["failover_seconds"] for f in failovers if f["failover_seconds"] is not None]
+        self.results["failovers"] = dict(summarize(times), failures=len(failovers) - len(times))
+        self.results["failover_runs"] = failovers
+        self.results["failover_messages"] = self._phase_messages(before, len(failovers))
+
+    def run(self):
+        self.settle()
+        self.measure_idle()
+        self.measure_lookups()
+        self.measure_downloads()
+        if self.args.mode == "tracker":
+            self.measure_failovers()
+        return self.results
+
+
+def format_seconds(value):
+    return "-" if value is None else f"{value * 1000:.1f}ms"
+
+
+def print_report(results):
+    print(f"Peers: {results['config']['peers']} | Inicialização: {results['startup_seconds']:.2f}s")
+    for key, label in (("lookups", "Buscas"), ("failovers", "Failover")):
+        if key in results:
+            stats = results[key]
+            print(
+                f"{label}: {stats['count']} | p50 {format_seconds(stats['p50'])} | p90 {format_seconds(stats['p90'])} | "
+                f"p99 {format_seconds(stats['p99'])} | máx {format_seconds(stats['max'])} | falhas {stats['failures']}"
+            )
+    for run in results.get("failover_runs", []):
+        converged = format_seconds(run.get("converged_seconds"))
+        print(f"  {run['victim']} (Partição {run['shard']}): novo tracker em {format_seconds(run['failover_seconds'])}, "
+              f"todos os peers em {converged}")
+    if "downloads" in results:
+        stats = results["downloads"]
+        fmt = lambda value: "-" if value is None else f"{value:.1f}MB/s"
+        print(f"Downloads: {stats['count']} | p50 {fmt(stats['p50'])} | máx {fmt(stats['max'])} | falhas {stats['failures']}")
+    for key, label in (
+        ("idle_messages_per_second", "Mensagens por segundo sem operações"),
+        ("lookup_messages", "Mensagens por busca"),
+        ("download_messages", "Mensagens por download"),
+        ("failover_messages", "Mensagens por failover"),
+    ):
+        if results.get(key):
+            print(f"{label}: " + ", ".join(f"{method}={count:.1f}" for method, count in results[key].items()))
+
+
+def run_worker(name, seed_size, sparse):
+    """Peer de um subprocesso: inicia e atende a rede até ser finalizado"""
+    from .peer import Peer
+
+    peer = Peer(name)
+    if seed_size:
+        seed_peer(peer, seed_size, sparse)
+    peer.start_peer()
+    signal.sigwait({signal.SIGTERM, signal.SIGINT})
+    peer.stop()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m peer.bench", description="Benchmark headless da rede P2P")
+    parser.add_argument("--peers", type=int, default=10, help="Quantidade de peers")
+    parser.add_argument("--subprocess", action="store_true", help="Cada peer em um subprocesso (padrão: no processo)")
+    parser.add_argument("--mode", choices=("tracker", "dht"), default=os.getenv("LOOKUP_MODE", "tracker"))
+    parser.add_argument("--shards", type=int, default=int(os.getenv("TRACKER_SHARDS", "1")), help="Partições do índice")
+    parser.add_argument("--kills", type=int, default=3, help="Trackers derrubados, um por vez")
+    parser.add_argument("--kill-interval", type=float, default=3.0, help="Segundos entre as quedas")
+    parser.add_argument("--lookups", type=int, default=200, help="Buscas de arquivos")
+    parser.add_argument("--concurrency", type=int, default=4, help="Buscas em paralelo")
+    parser.add_argument("--downloads", type=int, default=5, help="Downloads em swarm")
+    parser.add_argument("--seeders", type=int, default=1, help="Peers com um arquivo grande para os downloads")
+    parser.add_argument("--file-size", type=int, help=f"Tamanho do arquivo grande (padrão: {DEFAULT_FILE_SIZE} bytes)")
+    parser.add_argument("--sparse", action="store_true", help="Arquivo grande esparso, criado sem gravar todo o conteúdo")
+    parser.add_argument("--settle-timeout", type=float, default=SETTLE_TIMEOUT, help="Espera máxima pela rede estável")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Segundos de espera após a rede estabilizar")
+    parser.add_argument("--idle", type=float, default=3.0, help="Segundos medindo as mensagens sem operações")
+    parser.add_argument("--workdir", help="Pasta dos peers (padrão: pasta temporária)")
+    parser.add_argument("--output", help="Grava os resultados em JSON")
+    parser.add_argument("--seed", type=int, help="Semente dos sorteios do benchmark")
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    # Sem maioria dos peers registrados nenhuma eleição é vencida
+    if args.mode == "tracker" and not args.worker and args.kills >= (args.peers + 1) // 2:
+        parser.error("--kills deve deixar a maioria dos peers viva")
+    if not args.worker:
+        args.file_size = args.file_size or DEFAULT_FILE_SIZE
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logger.setLevel(args.log_level)
+    if args.worker:
+        signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGTERM, signal.SIGINT})
+        run_worker(args.worker, args.file_size, args.sparse)
+        return
+
+    # Lidas na importação dos módulos do peer, inclusive nos subprocessos
+    os.environ["LOOKUP_MODE"] = args.mode
+    os.environ["TRACKER_SHARDS"] = str(args.shards)
+    if args.seed is not None:
+        random.seed(args.seed)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="p2p-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    logger.info(f"Pasta dos peers: {workdir}")
+
+    # O serviço de nomes usa o mesmo servidor multiplexado dos daemons dos peers, configurado
+    # na importação de .peer: conexões abertas não ocupam uma thread cada, nem com centenas de peers
+    from . import peer  # noqa: F401
+    _, ns_daemon, _ = Pyro5.nameserver.start_ns(BENCH_NS_HOST)
+    threading.Thread(target=ns_daemon.requestLoop, daemon=True).start()
+
+    counter = MessageCounter()
+    counter.install()
+    names = [f"peer-{i}" for i in range(1, args.peers + 1)]
+    seeders = names[: args.seeders if args.downloads else 0]
+    if args.subprocess:
+        cluster = ProcessCluster(names, seeders, args.file_size, args.sparse, args.log_level)
+    else:
+        cluster = LocalCluster(names, seeders, args.file_size, args.sparse)
+    try:
+        cluster.start()
+        results = Benchmark(args, cluster, counter).run()
+    finally:
+        cluster.close()
+        ns_daemon.shutdown()
+
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
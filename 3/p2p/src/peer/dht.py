@@ -0,0 +1,292 @@
+import time
+import heapq
+import hashlib
+import threading
+
+import Pyro5.errors
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .logging import logger
+
+ID_BITS = 160  # Tamanho dos identificadores (SHA-1)
+K = 8  # Contatos por bucket e réplicas de cada valor
+ALPHA = 3  # Consultas em paralelo em cada passo da busca
+DHT_WORKERS = 16  # Threads para as consultas (find_node, find_value, store) em paralelo
+PUBLISH_WORKERS = 4  # Arquivos publicados ao mesmo tempo; cada um faz sua busca no pool de consultas
+LOOKUP_STEP_TIMEOUT = 1.0  # Espera máxima por alguma resposta em um passo da busca
+PUBLISH_TIMEOUT = 30  # Espera máxima pela publicação de um lote de arquivos
+VALUE_TTL = 60  # Segundos até um registro não republicado expirar
+REPUBLISH_INTERVAL = 20  # Intervalo para republicar os próprios arquivos
+
+
+def dht_id(key):
+    return int.from_bytes(hashlib.sha1(key.encode()).digest(), "big")
+
+
+def _contact_id(contact):
+    return int(contact[0], 16)
+
+
+class RoutingTable:
+    """Tabela de roteamento Kademlia: um bucket por bit de distância (XOR) até o próprio id.
+
+    Cada bucket guarda até K contatos do menos para o mais recentemente visto.
+    Com o bucket cheio, o contato mais antigo é mantido se ainda responder,
+    já que peers que estão na rede há mais tempo tendem a continuar nela.
+    """
+
+    def __init__(self, own_id, k=K):
+        self.own_id = own_id
+        self.k = k
+        self.buckets = [OrderedDict() for _ in range(ID_BITS)]  # id -> contato (id hex, nome, uri)
+        self.lock = threading.Lock()
+
+    def _bucket(self, node_id):
+        return self.buckets[(node_id ^ self.own_id).bit_length() - 1]
+
+    def update(self, contact):
+        """Registra um contato visto. Retorna o contato mais antigo do bucket se ele estiver cheio, senão None"""
+        node_id = _contact_id(contact)
+        if node_id == self.own_id:
+            return None
+        bucket = self._bucket(node_id)
+        with self.lock:
+            if node_id in bucket:
+                bucket[node_id] = tuple(contact)
+                bucket.move_to_end(node_id)
+                return None
+            if len(bucket) < self.k:
+                bucket[node_id] = tuple(contact)
+                return None
+            return next(iter(bucket.values()))
+
+    def replace(self, old, new):
+        """Troca um contato que não respondeu por um novo no mesmo bucket"""
+        self.remove(old)
+        self.update(new)
+
+    def touch(self, contact):
+        bucket = self._bucket(_contact_id(contact))
+        with self.lock:
+            if _contact_id(contact) in bucket:
+                bucket.move_to_end(_contact_id(contact))
+
+    def remove(self, contact):
+        node_id = _contact_id(contact)
+        if node_id == self.own_id:
+            return
+        with self.lock:
+            self._bucket(node_id).pop(node_id, None)
+
+    def closest(self, target, count=K):
+        with self.lock:
+            contacts = [contact for bucket in self.buckets for contact in bucket.values()]
+        return heapq.nsmallest(count, contacts, key=lambda contact: _contact_id(contact) ^ target)
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self.buckets)
+
+
+class DHTNode:
+    """Nó Kademlia que guarda parte do mapa arquivo -> peers que o possuem.
+
+    Cada arquivo é guardado nos K nós com id mais próximo (XOR) do hash do
+    nome. As buscas consultam ALPHA nós por vez, cada vez mais próximos da
+    chave, e terminam em O(log N) passos sem passar pelo serviço de nomes.
+    Os registros expiram se o dono não os republicar.
+    """
+
+    def __init__(self, name, uri, pool, k=K, alpha=ALPHA):
+        self.id = dht_id(name)
+        self.contact = (f"{self.id:040x}", name, str(uri))
+        self.pool = pool
+        self.k = k
+        self.alpha = alpha
+        self.table = RoutingTable(self.id, k)
+        self.storage = {}  # chave hex -> {"name": arquivo, "holders": {peer: (uri, manifesto, expira em)}}
+        self.storage_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=DHT_WORKERS, thread_name_prefix=f"{name}-dht")
+        # Pool separado: uma publicação espera pelas consultas da sua busca, que rodam em 'executor';
+        # no mesmo pool, publicações suficientes ocupariam todas as threads e nenhuma consulta rodaria
+        self.publisher = ThreadPoolExecutor(max_workers=PUBLISH_WORKERS, thread_name_prefix=f"{name}-dht-pub")
+
+    # Chamadas remotas
+    def _call(self, contact, method, *args):
+        """Chama um método DHT de outro nó. Retorna None e descarta o contato se ele não responder"""
+        try:
+            with self.pool.proxy(contact[2]) as proxy:
+                result = getattr(proxy, method)(self.contact, *args)
+        except Pyro5.errors.PyroError as e:
+            logger.debug(f"Nó DHT {contact[1]} não respondeu a {method}: {e}")
+            self.table.remove(contact)
+            return None
+        self.see(contact)
+        return result
+
+    def see(self, contact):
+        """Atualiza a tabela com um contato; com o bucket cheio, testa o mais antigo em segundo plano"""
+        oldest = self.table.update(contact)
+        if oldest is not None:
+            self.executor.submit(self._challenge, oldest, tuple(contact))
+
+    def _challenge(self, oldest, candidate):
+        try:
+            with self.pool.proxy(oldest[2]) as proxy:
+                proxy.dht_ping(self.contact)
+            self.table.touch(oldest)
+        except Pyro5.errors.PyroError:
+            self.table.replace(oldest, candidate)
+
+    def bootstrap(self, uris):
+        """Entra na rede a partir de nós conhecidos e busca o próprio id para preencher a tabela"""
+        for uri in uris:
+            if str(uri) == self.contact[2]:
+                continue
+            try:
+                with self.pool.proxy(uri) as proxy:
+                    self.see(tuple(proxy.dht_ping(self.contact)))
+            except Pyro5.errors.PyroError as e:
+                logger.debug(f"Nó de entrada {uri} indisponível: {e}")
+        self.lookup(self.id)
+        logger.info(f"DHT iniciada com {len(self.table)} contatos")
+
+    # Métodos chamados por outros nós
+    def handle_ping(self, sender):
+        self.see(sender)
+        return self.contact
+
+    def handle_find_node(self, sender, target):
+        self.see(sender)
+        return self.table.closest(int(target, 16), self.k)
+
+    def handle_find_value(self, sender, key):
+        self.see(sender)
+        holders = self.local_holders(key)
+        if holders:
+            return {"value": holders}
+        return {"nodes": self.table.closest(int(key, 16), self.k)}
+
+    def handle_store(self, sender, key, filename, holder, uri, manifest):
+        """Registra (ou remove, com manifesto None) um peer que possui o arquivo"""
+        self.see(sender)
+        with self.storage_lock:
+            entry = self.storage.setdefault(key, {"name": filename, "holders": {}})
+            if manifest is None:
+                entry["holders"].pop(holder, None)
+                if not entry["holders"]:
+                    del self.storage[key]
+            else:
+                entry["holders"][holder] = (uri, manifest, time.monotonic() + VALUE_TTL)
+
+    def local_holders(self, key):
+        now = time.monotonic()
+        with self.storage_lock:
+            entry = self.storage.get(key)
+            if entry is None:
+                return {}
+            # Registros expirados são descartados na leitura
+            for holder in [h for h, (_, _, expires) in entry["holders"].items() if expires <= now]:
+                del entry["holders"][holder]
+            if not entry["holders"]:
+                del self.storage[key]
+                return {}
+            return {holder: {"uri": uri, "manifest": manifest} for holder, (uri, manifest, _) in entry["holders"].items()}
+
+    def expire(self):
+        """Descarta registros expirados de arquivos que ninguém buscou"""
+        with self.storage_lock:
+            keys = list(self.storage)
+        for key in keys:
+            self.local_holders(key)
+
+    # Busca iterativa
+    def lookup(self, target, find_value=False):
+        """Busca os K nós mais próximos de 'target' (exceto este).
+
+        Com find_value, junta os valores guardados nos K nós mais próximos,
+        inclusive este; nós mais distantes podem ter registros antigos, de
+        quando a rede era menor, e são ignorados. Retorna ("nodes", contatos)
+        ou ("value", peers que possuem o arquivo).
+        """
+        key = f"{target:040x}"
+        shortlist = {_contact_id(contact): tuple(contact) for contact in self.table.closest(target, self.k)}
+        queried = set()
+        responded = {}
+        values = {}  # id do nó -> peers que possuem o arquivo, segundo ele
+        futures = {}
+        while True:
+            candidates = heapq.nsmallest(self.k, shortlist, key=lambda node_id: node_id ^ target)
+            pending = [node_id for node_id in candidates if node_id not in queried]
+            # Mantém até ALPHA consultas em andamento
+            for node_id in pending[: max(0, self.alpha - len(futures))]:
+                queried.add(node_id)
+                contact = shortlist[node_id]
+                method = "find_value" if find_value else "find_node"
+                futures[self.executor.submit(self._call, contact, method, key)] = contact
+            if not futures:
+                break
+            done, _ = wait(futures, timeout=LOOKUP_STEP_TIMEOUT, return_when=FIRST_COMPLETED)
+            if not done:
+                # Nós que não responderam no prazo saem da busca, que segue com os próximos
+                for future, contact in futures.items():
+                    future.cancel()
+                    shortlist.pop(_contact_id(contact), None)
+                futures.clear()
+                continue
+            for future in done:
+                contact = futures.pop(future)
+                result = future.result()
+                if result is None:
+                    shortlist.pop(_contact_id(contact), None)
+                    continue
+                responded[_contact_id(contact)] = contact
+                if find_value:
+                    if "value" in result:
+                        values[_contact_id(contact)] = result["value"]
+                        continue
+                    result = result["nodes"]
+                for found in result:
+                    found_id = _contact_id(found)
+                    if found_id != self.id:
+                        shortlist.setdefault(found_id, tuple(found))
+        closest = heapq.nsmallest(self.k, responded.values(), key=lambda contact: _contact_id(contact) ^ target)
+        if find_value:
+            values[self.id] = self.local_holders(key)
+            merged = {}
+            for contact in heapq.nsmallest(self.k, closest + [self.contact], key=lambda c: _contact_id(c) ^ target):
+                merged.update(values.get(_contact_id(contact), {}))
+            if merged:
+                return "value", merged
+        return "nodes", closest
+
+    # Operações do peer
+    def publish(self, changes, holder, uri):
+        """Registra nos K nós mais próximos de cada arquivo as adições (manifesto) e remoções (None)"""
+        futures = [self.publisher.submit(self._publish_one, filename, manifest, holder, str(uri))
+                   for filename, manifest in changes.items()]
+        _, not_done = wait(futures, timeout=PUBLISH_TIMEOUT)
+        if not_done:
+            logger.warning(f"{len(not_done)} arquivos não publicados na DHT no prazo")
+
+    def _publish_one(self, filename, manifest, holder, uri):
+        target = dht_id(filename)
+        key = f"{target:040x}"
+        _, nodes = self.lookup(target)
+        # O próprio nó também guarda o registro se estiver entre os K mais próximos
+        nodes = heapq.nsmallest(self.k, nodes + [self.contact], key=lambda contact: _contact_id(contact) ^ target)
+        for contact in nodes:
+            if contact == self.contact:
+                self.handle_store(self.contact, key, filename, holder, uri, manifest)
+            else:
+                self._call(contact, "store", key, filename, holder, uri, manifest)
+
+    def find_holders(self, filename):
+        """Peers que possuem o arquivo: {peer: {"uri", "manifest"}}"""
+        kind, result = self.lookup(dht_id(filename), find_value=True)
+        return result if kind == "value" else {}
+
+    def close(self):
+        self.publisher.shutdown(wait=False, cancel_futures=True)
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,69 @@
+import threading
+
+
+class ElectionState:
+    """Época do tracker, voto e eleição em andamento de um peer.
+
+    Os campos são lidos sem lock, mas só mudam através dos métodos abaixo,
+    que fazem cada verificação e alteração de forma atômica (compare-and-set).
+    Assim um voto pedido por outro peer, um heartbeat e o timer de eleição não
+    sobrescrevem as alterações uns dos outros.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tracker_epoch = 0
+        self.voted_in_epoch = -1
+        self.election_in_progress = False
+
+    def advance_epoch(self, epoch):
+        """Adota a época de um tracker mais novo. Retorna False se ela não for maior que a atual."""
+        with self.lock:
+            if epoch <= self.tracker_epoch:
+                return False
+            self.tracker_epoch = epoch
+            self.voted_in_epoch = -1
+            return True
+
+    def try_vote(self, epoch):
+        """Registra o voto na época, se ainda não votou nela ou em uma época maior.
+
+        Épocas que já têm tracker conhecido também são recusadas; senão um peer
+        que entrou depois da eleição poderia ser eleito uma segunda vez na mesma época.
+        """
+        with self.lock:
+            if epoch <= self.voted_in_epoch or epoch <= self.tracker_epoch:
+                return False
+            self.voted_in_epoch = epoch
+            return True
+
+    def begin_election(self):
+        """Inicia uma eleição na próxima época, votando em si mesmo.
+
+        Retorna (época, None) ou (None, motivo) quando a eleição não pode começar.
+        """
+        with self.lock:
+            if self.election_in_progress:
+                return None, "in_progress"
+            if self.voted_in_epoch > self.tracker_epoch:
+                return None, "voted"
+            self.election_in_progress = True
+            self.tracker_epoch += 1
+            self.voted_in_epoch = self.tracker_epoch
+            return self.tracker_epoch, None
+
+    def win_election(self, epoch):
+        with self.lock:
+            if self.tracker_epoch != epoch:
+                # Outro tracker assumiu uma época mais nova durante a eleição
+                self.election_in_progress = False
+                return False
+            self.election_in_progress = False
+            return True
+
+    def abort_election(self, epoch):
+        with self.lock:
+            self.election_in_progress = False
+            if self.tracker_epoch == epoch:
+                self.tracker_epoch -= 1
+                self.voted_in_epoch = -1
@@ -0,0 +1,110 @@
+import math
+import time
+import threading
+
+from collections import deque
+
+PHI_THRESHOLD = 8.0  # Suspeita quando a chance do heartbeat ainda chegar é menor que 10^-8
+MAX_SAMPLE_SIZE = 100  # Intervalos entre heartbeats considerados
+MIN_STD_DEVIATION = 0.1  # Desvio padrão mínimo (s), evita suspeitas com redes muito estáveis
+ACCEPTABLE_HEARTBEAT_PAUSE = 0.3  # Pausa tolerada além do intervalo médio (s), ex. GC ou carga
+
+
+class PhiAccrualFailureDetector:
+    """Detector de falhas phi accrual (Hayashibara et al.).
+
+    Aprende a distribuição dos intervalos entre heartbeats e calcula phi, o
+    nível de suspeita de que o tracker caiu dado o tempo desde o último
+    heartbeat. Em uma rede estável a suspeita surge logo após o intervalo
+    esperado; com atrasos variáveis o desvio padrão cresce e o detector
+    espera mais antes de suspeitar.
+    """
+
+    def __init__(
+        self,
+        first_interval,
+        threshold=PHI_THRESHOLD,
+        max_sample_size=MAX_SAMPLE_SIZE,
+        min_std_deviation=MIN_STD_DEVIATION,
+        acceptable_pause=ACCEPTABLE_HEARTBEAT_PAUSE,
+    ):
+        self.threshold = threshold
+        self.min_std_deviation = min_std_deviation
+        self.acceptable_pause = acceptable_pause
+        self.intervals = deque(maxlen=max_sample_size)
+        self.lock = threading.Lock()
+        self._sum = 0.0
+        self._squared_sum = 0.0
+        # Sem heartbeats a contagem começa na criação, para suspeitar de um tracker que nunca respondeu
+        self.last_heartbeat = time.monotonic()
+        self.sampling = False  # O intervalo desde o início ou reset não é uma amostra
+        # Sem histórico, assume o intervalo configurado com desvio de 1/4 dele
+        self._add_interval(first_interval - first_interval / 4)
+        self._add_interval(first_interval + first_interval / 4)
+
+    def _add_interval(self, interval):
+        if len(self.intervals) == self.intervals.maxlen:
+            dropped = self.intervals[0]
+            self._sum -= dropped
+            self._squared_sum -= dropped * dropped
+        self.intervals.append(interval)
+        self._sum += interval
+        self._squared_sum += interval * interval
+
+    def heartbeat(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            if self.sampling:
+                self._add_interval(now - self.last_heartbeat)
+            self.last_heartbeat = now
+            self.sampling = True
+
+    def reset(self, now=None):
+        """Recomeça a contagem, usado quando o tracker muda."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self.last_heartbeat = now
+            self.sampling = False
+
+    def _stats(self):
+        n = len(self.intervals)
+        mean = self._sum / n
+        variance = max(self._squared_sum / n - mean * mean, 0.0)
+        std = max(math.sqrt(variance), self.min_std_deviation)
+        return mean + self.acceptable_pause, std
+
+    @staticmethod
+    def _phi(elapsed, mean, std):
+        # Aproximação logística da CDF normal, como no Akka/Cassandra
+        y = (elapsed - mean) / std
+        e = math.exp(-y * (1.5976 + 0.070566 * y * y))
+        if elapsed > mean:
+            p_later = e / (1.0 + e)
+        else:
+            p_later = 1.0 - 1.0 / (1.0 + e)
+        return -math.log10(max(p_later, 1e-300))
+
+    def phi(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            mean, std = self._stats()
+            return self._phi(now - self.last_heartbeat, mean, std)
+
+    def is_available(self, now=None):
+        return self.phi(now) < self.threshold
+
+    def time_until_suspect(self, now=None):
+        """Segundos até phi atingir o limiar, contados a partir de agora."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            mean, std = self._stats()
+            last = self.last_heartbeat
+        # phi cresce com o tempo decorrido, então basta uma busca binária
+        low, high = 0.0, mean + 50 * std
+        for _ in range(50):
+            middle = (low + high) / 2
+            if self._phi(middle, mean, std) < self.threshold:
+                low = middle
+            else:
+                high = middle
+        return max(0.0, last + high - now)
@@ -0,0 +1,279 @@
+import heapq
+import bisect
+import threading
+
+from contextlib import ExitStack
+from collections import deque
+
+INDEX_SHARDS = 16  # Quantidade de partições do índice do tracker
+REPLICATION_LOG_SIZE = 4096  # Alterações mantidas para réplicas que ficaram para trás
+PAGE_SIZE = 50  # Arquivos por página na listagem
+MAX_PAGE_SIZE = 500
+
+
+def file_ref(manifest):
+    """Parte do manifesto replicada: nome e hash raiz, sem os hashes dos pedaços."""
+    return {"name": manifest["name"], "root": manifest["root"]}
+
+
+class _Shard:
+    """Partição do índice. Só é alterada com 'lock'; os valores são imutáveis (frozenset),
+    então leituras pontuais não precisam do lock."""
+
+    __slots__ = ("lock", "files", "roots", "content", "manifests", "names")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.files = {}  # Arquivo -> frozenset(peers)
+        self.roots = {}  # Arquivo -> hash raiz
+        self.content = {}  # Hash raiz -> frozenset((peer, arquivo))
+        self.manifests = {}  # Hash raiz -> manifesto (sem nome), só dos registrados diretamente no tracker
+        self.names = ()  # Nomes ordenados para listagem, None quando precisa ser refeito
+
+
+class TrackerIndex:
+    """Índice do tracker particionado por hash do nome do arquivo ou do conteúdo.
+
+    Escritas adquirem só os locks das partições envolvidas (em ordem, para
+    evitar deadlock), e os deltas de um mesmo peer são serializados por um
+    lock do peer. Consultas leem valores imutáveis sem lock, e a listagem usa
+    um snapshot ordenado por partição, refeito apenas quando a partição muda.
+
+    Cada alteração recebe uma posição (época, sequência) e fica em um log
+    limitado, usado para replicar o índice nos demais peers. Uma réplica que
+    reaplica o log na mesma ordem chega ao mesmo estado do tracker. O log só
+    guarda nome, hash raiz e peer de cada arquivo, não os hashes dos pedaços;
+    uma réplica responde com essa referência e quem baixa pede o manifesto a
+    um dos peers que possuem o arquivo.
+    """
+
+    def __init__(self, shard_count=INDEX_SHARDS):
+        self.shards = [_Shard() for _ in range(shard_count)]
+        self.peer_files = {}  # Peer -> {arquivo: hash raiz}, substituído a cada delta
+        self.peer_versions = {}  # Peer -> versão do índice aplicada
+        self._peer_locks = {}
+        self._peer_locks_lock = threading.Lock()
+        self.position = (0, 0)  # (época, sequência) da última alteração aplicada
+        self.stream_epoch = 0  # Época usada nas posições de novas alterações
+        self.log = deque(maxlen=REPLICATION_LOG_SIZE)  # (posição, alteração)
+        self.log_base = self.position  # Posição anterior à primeira alteração do log
+        self._log_lock = threading.Lock()
+
+    def _shard_id(self, key):
+        return hash(key) % len(self.shards)
+
+    def _shard(self, key):
+        return self.shards[self._shard_id(key)]
+
+    def _peer_lock(self, peer_name):
+        with self._peer_locks_lock:
+            return self._peer_locks.setdefault(peer_name, threading.Lock())
+
+    # Escrita
+    def apply_delta(self, peer_name, base_version, version, added, removed):
+        """Aplica um delta de um peer. Retorna False se base_version não é a última versão aplicada."""
+        with self._peer_lock(peer_name):
+            if self.peer_versions.get(peer_name) != base_version:
+                return False
+            op = ("delta", peer_name, version, [file_ref(manifest) for manifest in added], removed)
+            self._apply(peer_name, version, added, removed, op)
+            return True
+
+    def sync_peer(self, peer_name, version, manifests):
+        """Substitui todos os arquivos registrados por um peer."""
+        with self._peer_lock(peer_name):
+            op = ("sync", peer_name, version, [file_ref(manifest) for manifest in manifests])
+            self._sync(peer_name, version, manifests, op)
+
+    def _sync(self, peer_name, version, manifests, op, position=None):
+        current = {manifest["name"] for manifest in manifests}
+        removed = [filename for filename in self.peer_files.get(peer_name, {}) if filename not in current]
+        self._apply(peer_name, version, manifests, removed, op, position)
+
+    def _apply(self, peer_name, version, added, removed, op, position=None):
+        owned = dict(self.peer_files.get(peer_name, {}))
+        keys = set(removed)
+        keys.update(owned[filename] for filename in removed if filename in owned)
+        for manifest in added:
+            keys.update((manifest["name"], manifest["root"]))
+            if manifest["name"] in owned:
+                keys.add(owned[manifest["name"]])
+
+        with ExitStack() as stack:
+            for shard_id in sorted({self._shard_id(key) for key in keys}):
+                stack.enter_context(self.shards[shard_id].lock)
+            for filename in removed:
+                if filename in owned:
+                    self._unindex(peer_name, filename, owned.pop(filename))
+            for manifest in added:
+                filename, root = manifest["name"], manifest["root"]
+                if filename in owned and owned[filename] != root:
+                    self._unindex(peer_name, filename, owned[filename])
+                self._index(peer_name, manifest)
+                owned[filename] = root
+
+            # Registrada ainda com os locks das partições, para o log seguir a ordem de aplicação
+            with self._log_lock:
+                if owned:
+                    self.peer_files[peer_name] = owned
+                else:
+                    self.peer_files.pop(peer_name, None)
+                self.peer_versions[peer_name] = version
+                if op is not None:
+                    if len(self.log) == self.log.maxlen:
+                        self.log_base = self.log[0][0]
+                    self.position = position or (self.stream_epoch, self.position[1] + 1)
+                    self.log.append((self.position, op))
+
+    def _index(self, peer_name, manifest):
+        filename, root = manifest["name"], manifest["root"]
+        shard = self._shard(filename)
+        if filename not in shard.files:
+            shard.names = None
+        shard.files[filename] = shard.files.get(filename, frozenset()) | {peer_name}
+        shard.roots[filename] = root
+
+        shard = self._shard(root)
+        shard.content[root] = shard.content.get(root, frozenset()) | {(peer_name, filename)}
+        if root not in shard.manifests and "pieces" in manifest:
+            shard.manifests[root] = {key: value for key, value in manifest.items() if key != "name"}
+
+    def _unindex(self, peer_name, filename, root):
+        shard = self._shard(filename)
+        holders = shard.files.get(filename, frozenset()) - {peer_name}
+        if holders:
+            shard.files[filename] = holders
+        elif filename in shard.files:
+            del shard.files[filename]
+            shard.roots.pop(filename, None)
+            shard.names = None
+
+        shard = self._shard(root)
+        content = shard.content.get(root, frozenset()) - {(peer_name, filename)}
+        if content:
+            shard.content[root] = content
+        else:
+            shard.content.pop(root, None)
+            shard.manifests.pop(root, None)
+
+    # Replicação
+    def start_epoch(self, epoch):
+        """Novas alterações passam a ser numeradas na época do novo tracker."""
+        with self._log_lock:
+            self.stream_epoch = epoch
+
+    def changes_since(self, base):
+        """Retorna (posição atual, alterações após 'base'), ou alterações None se 'base' saiu do log."""
+        base = tuple(base)
+        with self._log_lock:
+            if base == self.position:
+                return self.position, []
+            entries = list(self.log)
+            position = self.position
+            if base == self.log_base:
+                return position, entries
+        for i, (entry_position, _) in enumerate(entries):
+            if entry_position == base:
+                return position, entries[i + 1:]
+        return position, None
+
+    def replay(self, entries):
+        """Reaplica, em ordem, alterações recebidas do tracker mantendo suas posições."""
+        for position, op in entries:
+            kind, peer_name, version = op[0], op[1], op[2]
+            with self._peer_lock(peer_name):
+                if kind == "delta":
+                    self._apply(peer_name, version, op[3], op[4], op, tuple(position))
+                else:
+                    self._sync(peer_name, version, op[3], op, tuple(position))
+        with self._log_lock:
+            self.stream_epoch = self.position[0]
+
+    def snapshot(self):
+        """Estado completo e consistente do índice, para réplicas com lacuna no log."""
+        with ExitStack() as stack:
+            for shard in self.shards:
+                stack.enter_context(shard.lock)
+            stack.enter_context(self._log_lock)
+            peers = {}
+            for peer_name, version in self.peer_versions.items():
+                owned = self.peer_files.get(peer_name, {})
+                files = [{"name": filename, "root": root} for filename, root in owned.items()]
+                peers[peer_name] = {"version": version, "files": files}
+            return {"position": self.position, "peers": peers}
+
+    @classmethod
+    def from_snapshot(cls, snapshot, shard_count=INDEX_SHARDS):
+        index = cls(shard_count)
+        for peer_name, data in snapshot["peers"].items():
+            index._sync(peer_name, data["version"], data["files"], None)
+        index.position = index.log_base = tuple(snapshot["position"])
+        index.stream_epoch = index.position[0]
+        return index
+
+    # Leitura
+    def _names(self, shard):
+        names = shard.names
+        if names is None:
+            with shard.lock:
+                if shard.names is None:
+                    shard.names = tuple(sorted(shard.files))
+                names = shard.names
+        return names
+
+    def list_files(self):
+        """Nomes de todos os arquivos, em ordem alfabética."""
+        return list(heapq.merge(*(self._names(shard) for shard in self.shards)))
+
+    def page(self, cursor=None, limit=PAGE_SIZE, prefix="", contains=""):
+        """Uma página da listagem ordenada: ([(arquivo, quantidade de peers)], cursor da próxima página).
+
+        'cursor' é o último arquivo da página anterior. O início da página e o
+        prefixo são localizados por busca binária em cada partição, então o custo
+        depende do tamanho da página e não do catálogo; o filtro 'contains' só
+        percorre os nomes a partir do cursor até completar a página.
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+        def from_start(names):
+            if cursor is not None and cursor >= prefix:
+                start = bisect.bisect_right(names, cursor)
+            else:
+                start = bisect.bisect_left(names, prefix)
+            return (names[i] for i in range(start, len(names)))
+
+        files = []
+        for filename in heapq.merge(*(from_start(self._names(shard)) for shard in self.shards)):
+            if not filename.startswith(prefix):
+                break  # Nomes ordenados: acabou o intervalo do prefixo
+            if contains and contains not in filename:
+                continue
+            files.append((filename, len(self.holders(filename))))
+            if len(files) > limit:
+                break
+
+        if len(files) > limit:
+            return files[:limit], files[limit - 1][0]
+        return files, None
+
+    def holders(self, filename):
+        """Peers que possuem o arquivo, inclusive os que têm o mesmo conteúdo com outro nome."""
+        shard = self._shard(filename)
+        peers = set(shard.files.get(filename, ()))
+        root = shard.roots.get(filename)
+        if root is not None:
+            peers.update(peer_name for peer_name, _ in self._shard(root).content.get(root, ()))
+        return peers
+
+    def manifest(self, filename):
+        """Manifesto do arquivo, ou só {"name", "root"} se o conteúdo chegou por replicação."""
+        root = self._shard(filename).roots.get(filename)
+        if root is None:
+            return None
+        manifest = self._shard(root).manifests.get(root)
+        if manifest is None:
+            return {"name": filename, "root": root}
+        return dict(manifest, name=filename)
+
+    def __contains__(self, filename):
+        return filename in self._shard(filename).files
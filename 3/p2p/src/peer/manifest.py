@@ -0,0 +1,38 @@
+import hashlib
+
+from .transfer import BLOCK_SIZE
+
+PIECE_SIZE = BLOCK_SIZE  # Um pedaço do manifesto corresponde a um bloco da transferência
+
+
+def piece_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def root_digest(size, piece_size, pieces):
+    """Hash do arquivo inteiro, calculado sobre o tamanho e os hashes dos pedaços."""
+    h = hashlib.sha256(f"{size}:{piece_size}:".encode())
+    for digest in pieces:
+        h.update(bytes.fromhex(digest))
+    return h.hexdigest()
+
+
+def build_manifest(path, name, piece_size=PIECE_SIZE):
+    """Calcula o manifesto de um arquivo: tamanho dos pedaços, SHA-256 de cada pedaço e hash raiz."""
+    pieces = []
+    size = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(piece_size):
+            pieces.append(piece_digest(chunk))
+            size += len(chunk)
+    return {
+        "name": name,
+        "size": size,
+        "piece_size": piece_size,
+        "pieces": pieces,
+        "root": root_digest(size, piece_size, pieces),
+    }
+
+
+def verify_piece(manifest, index, data):
+    return 0 <= index < len(manifest["pieces"]) and piece_digest(data) == manifest["pieces"][index]
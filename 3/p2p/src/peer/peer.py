@@ -1,16 +1,30 @@
 import os
 import sys
+import heapq
+import math
+import time
+import random
 import socket
-import inquirer
 import threading
 
 import Pyro5.api
 import Pyro5.errors
 
-from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 
 from .logging import logger
 from .utils import generate_random_text_file
+from .transfer import BLOCK_SIZE, PartialDownload
+from .store import ContentStore
+from .swarm import SwarmDownload
+from .manifest import root_digest, verify_piece
+from .pool import ProxyPool, NameServerCache
+from .index import PAGE_SIZE, TrackerIndex
+from .dht import REPUBLISH_INTERVAL, DHTNode
+from .scheduler import Scheduler
+from .ratelimit import UploadBusy, UploadLimiter
+from .sharding import TRACKER_SHARDS, HashRing, TrackerShard, tracker_ns_name, parse_tracker_name
 
 def get_my_ip():
     s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -25,177 +39,269 @@ def get_my_ip():
 
 PEER_HOSTNAME = get_my_ip()  # ou o IP do peer
 NAMESERVER_HOSTNAME = os.getenv("PYRO_NS_HOSTNAME")
+LOOKUP_MODE = os.getenv("LOOKUP_MODE", "tracker")  # "tracker" ou "dht" (sem tracker, busca pela DHT)
+DHT_BOOTSTRAP = [uri for uri in os.getenv("DHT_BOOTSTRAP", "").split(",") if uri]  # URIs de entrada na DHT
 
 TRACKER_HEARTBEAT_INTERVAL = 1  # 100ms
-# RAND_TIME_INTERVAL = [15, 30]  # 150ms - 300ms
+ELECTION_BACKOFF_SLOT = 0.15  # Janela base (s) da espera aleatória antes de uma eleição
+MAX_BACKOFF_EXPONENT = 4  # A janela dobra a cada eleição falha, até 2^4 vezes
 
-TIME_MAP = {
-    "peer-1": 1.5,
-    "peer-2": 2.0,
-    "peer-3": 2.5,
-    "peer-4": 3.0,
-    "peer-5": 3.5,
-}
+FANOUT_WORKERS = 32  # Threads para contatar peers em paralelo
+HEARTBEAT_ROUND_DEADLINE = TRACKER_HEARTBEAT_INTERVAL / 2  # Tempo máximo de uma rodada de heartbeats
+ELECTION_ROUND_DEADLINE = 0.5  # Tempo máximo esperando votos em uma eleição
+
+SWARM_MEMBER_TTL = 10  # Segundos que um peer baixando um arquivo continua sendo indicado a outros
+RANDOM_FILES = int(os.getenv("RANDOM_FILES", "3"))  # Arquivos fictícios criados ao iniciar o peer
+RANDOM_FILE_SIZE = int(os.getenv("RANDOM_FILE_SIZE", "128"))  # Tamanho (bytes) de cada arquivo fictício
 
 Pyro5.config.COMMTIMEOUT = 0.1  # Timeout for Pyro calls
+# No servidor padrão cada conexão aberta ocupa uma thread do daemon até fechar, e os proxies
+# guardados no ProxyPool de ~80 peers esgotariam o pool de threads; o multiplexado atende
+# todas as conexões em uma thread (chamadas oneway, como os heartbeats, ganham thread própria)
+Pyro5.config.SERVERTYPE = "multiplex"
 
 
 class Peer:
     def __init__(self, name):
         self.name = name
-        self.files_index = defaultdict(set)  # Usado para rastrear arquivos, apenas tracker o possui
-        self.files = set() # Usado para rastrear arquivos, apenas o peer possui
-        self.current_tracker_uri = None
+        self.ring = HashRing()  # Partição responsável por cada arquivo
+        self.trackers = [TrackerShard(i, TRACKER_HEARTBEAT_INTERVAL) for i in range(TRACKER_SHARDS)]
+        self.local_store = ContentStore(os.path.join(os.getcwd(), name))  # Arquivos locais, apenas o peer possui
         self.uri = None
-        self.tracker_epoch = 0
-        self.voted_in_epoch = -1
-        self.election_in_progress = False
+        self.daemon = None
         self.peers = {}
-        self.heartbeat_timer = None
         self.election_timer = None
-        # self.lock = threading.Lock()
+        self.pool = ProxyPool()  # Conexões reutilizadas com outros peers e o serviço de nomes
+        self.ns = NameServerCache(self.pool, NAMESERVER_HOSTNAME)
+        self.fanout_executor = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix=f"{name}-fanout")
+        self.scheduler = Scheduler(name)  # Timers de eleição, heartbeats e republicação em um único event loop
+        self.dht = None  # Nó da DHT, apenas no modo "dht"
+        self.active_downloads = {}  # Chave (hash raiz ou nome) -> SwarmDownload em andamento
+        self.swarm_members = {}  # Chave -> {peer: (uri, expira em)} que pediram o mapa de pedaços
+        self.swarm_lock = threading.Lock()
+        self.upload_limiter = UploadLimiter()
+        self.republish_timer = None
+
+    def shard_of(self, filename):
+        return self.trackers[self.ring.owner(filename)]
 
     def get_tracker_proxy(self, uri):
-        return Pyro5.api.Proxy(uri)
+        """Retorna um proxy do pool, para ser usado com 'with'"""
+        return self.pool.proxy(uri)
 
-    def get_tracker_uri(self, epoch):
-        with Pyro5.api.locate_ns(NAMESERVER_HOSTNAME) as ns:
-            try:
-                return ns.lookup(f"Tracker_Epoca_{epoch}")
-            except Pyro5.errors.NamingError:
-                logger.error("Falha ao localizar o tracker no serviço de nomes")
-                return None
+    def tracker_for(self, filename):
+        """Proxy do tracker da partição que indexa o arquivo, para ser usado com 'with'"""
+        return self.pool.proxy(self.shard_of(filename).tracker_uri)
+
+    def get_tracker_uri(self, epoch, shard_id=0):
+        try:
+            return self.ns.lookup(tracker_ns_name(shard_id, epoch))
+        except Pyro5.errors.NamingError:
+            logger.error("Falha ao localizar o tracker no serviço de nomes")
+            return None
 
     def register_with_nameserver(self, uri, name):
         try:
-            with Pyro5.api.locate_ns(NAMESERVER_HOSTNAME) as ns:
-                ns.register(name, uri)
-                logger.info(f"Peer {name} registrado no serviço de nomes")
+            self.ns.register(name, uri)
+            logger.info(f"Peer {name} registrado no serviço de nomes")
         except Pyro5.errors.NamingError:
             logger.error("Serviço de nomes não encontrado.")
 
     def find_current_tracker(self):
         try:
-            with Pyro5.api.locate_ns(NAMESERVER_HOSTNAME) as ns:
-                tracker_list = ns.list(prefix="Tracker_Epoca")
-                if tracker_list:
-                    # Pegar o tracker com a época mais recente
-                    latest_epoch = max(int(name.split("_")[-1]) for name in tracker_list.keys())
-                    self.current_tracker_uri = ns.lookup(f"Tracker_Epoca_{latest_epoch}")
-                    self.tracker_epoch = latest_epoch
-                    logger.info(f"Tracker encontrado (Época {self.tracker_epoch})")
-
-                    # Registrar arquivos no tracker
-                    self.register_files_with_tracker()
+            tracker_list = self.ns.list(prefix="Tracker_", fresh=True)
+            # Pegar o tracker com a época mais recente de cada partição
+            latest = {}
+            for name, uri in tracker_list.items():
+                parsed = parse_tracker_name(name)
+                if parsed and parsed[1] > latest.get(parsed[0], (0, None))[0]:
+                    latest[parsed[0]] = (parsed[1], uri)
+            for shard_id, (epoch, uri) in latest.items():
+                shard = self.trackers[shard_id]
+                shard.tracker_uri = uri
+                shard.election.advance_epoch(epoch)
+                logger.info(f"Tracker encontrado (Partição {shard_id} | Época {shard.election.tracker_epoch})")
+
+                # Registrar arquivos no tracker
+                self.register_files_with_tracker(shard)
         except Pyro5.errors.NamingError:
             logger.error("Nenhum tracker encontrado no serviço de nomes")
 
-    def register_files_with_tracker(self):
-        if self.current_tracker_uri:
+    def register_files_with_tracker(self, shard):
+        """Sincroniza o índice local com o tracker; envia tudo apenas se o tracker pedir"""
+        if shard.tracker_uri:
             try:
-                tracker_proxy = self.get_tracker_proxy(self.current_tracker_uri)
-                tracker_proxy.register_files(self.name, list(self.files))
-                #logger.info(f"Arquivos registrados no tracker: {self.files}")
+                self.flush_index(shard)
+                #logger.info(f"Arquivos registrados no tracker: {self.local_store.names()}")
             except Pyro5.errors.CommunicationError:
                 logger.error("Falha ao registrar arquivos no tracker")
-                self.current_tracker_uri = None
-
-    def add_file(self, filename):
-        # with self.lock:
-        self.files.add(filename)
-        if self.current_tracker_uri:
-            try:
-                tracker_proxy = self.get_tracker_proxy(self.current_tracker_uri)
-                tracker_proxy.register_files(self.name, [filename])
-            except Pyro5.errors.CommunicationError:
-                logger.error("Falha ao registrar arquivo no tracker")
-
-    def remove_peer_files(self):
-        # with self.lock:
-        for filename in list(self.files):
-            self.files.remove(filename)
-            if self.current_tracker_uri:
+                shard.tracker_uri = None
+
+    def get_manifests(self, shard):
+        return [manifest for filename, manifest in self.local_store.items() if self.shard_of(filename) is shard]
+
+    def flush_index(self, shard):
+        """Envia ao tracker, em um único delta, as mudanças do índice local desde a última versão confirmada"""
+        with shard.delta_lock:
+            added = [manifest for manifest in shard.pending_delta.values() if manifest is not None]
+            removed = [filename for filename, manifest in shard.pending_delta.items() if manifest is None]
+            version = shard.index_version + 1
+            with self.get_tracker_proxy(shard.tracker_uri) as tracker_proxy:
+                result = tracker_proxy.apply_index_delta(
+                    self.name, shard.index_version, version, added, removed, shard.id
+                )
+                if result == "resync":
+                    # O tracker não conhece a versão base, então recebe o índice completo
+                    logger.info(f"Tracker pediu ressincronização do índice de {self.name} | Partição {shard.id}")
+                    tracker_proxy.sync_index(self.name, version, self.get_manifests(shard), shard.id)
+            shard.index_version = version
+            shard.pending_delta.clear()
+
+    def flush_all(self):
+        """Envia os deltas pendentes de todas as partições com tracker conhecido"""
+        if self.dht:
+            self.publish_to_dht()
+            return
+        for shard in self.trackers:
+            if shard.tracker_uri and shard.pending_delta:
                 try:
-                    tracker_proxy = self.get_tracker_proxy(self.current_tracker_uri)
-                    tracker_proxy.remove_file(self.name, filename)
+                    self.flush_index(shard)
                 except Pyro5.errors.CommunicationError:
-                    logger.error("Falha ao remover arquivo no tracker")
+                    logger.error(f"Falha ao enviar alterações de arquivos ao tracker da partição {shard.id}")
+
+    def _record_change(self, filename, manifest, flush):
+        shard = self.shard_of(filename)
+        with shard.delta_lock:
+            shard.pending_delta[filename] = manifest
+        if flush and self.dht:
+            self.publish_to_dht()
+        elif flush and shard.tracker_uri:
+            try:
+                self.flush_index(shard)
+            except Pyro5.errors.CommunicationError:
+                logger.error("Falha ao enviar alterações de arquivos ao tracker")
 
-    def get_random_timeout(self):
-        return TIME_MAP.get(self.name)
+    def add_file(self, filename, manifest=None, flush=True):
+        manifest = self.local_store.add(filename, manifest)
+        self._record_change(filename, manifest, flush)
 
-    def reset_tracker_timer(self):
-        if self.heartbeat_timer:
-            self.heartbeat_timer.cancel()
-        self.heartbeat_timer = threading.Timer(self.get_random_timeout(), self.initiate_election)
-        self.heartbeat_timer.start()
+    def announce_stored_files(self):
+        """Anuncia os arquivos guardados em execuções anteriores, sem recalcular os manifestos"""
+        for filename, manifest in self.local_store.items():
+            self._record_change(filename, manifest, flush=False)
 
-    def voted_in_election_check(self):
-        return self.voted_in_epoch > self.tracker_epoch
+    def remove_peer_files(self):
+        """Retira os arquivos do peer do índice da rede; o armazenamento local é mantido para a próxima execução"""
+        for filename in self.local_store.names():
+            self._record_change(filename, None, flush=False)
+        # Todas as remoções de cada partição vão em um único delta
+        self.flush_all()
+
+    def get_random_timeout(self, shard):
+        """Espera aleatória antes de uma eleição, maior em redes grandes e após eleições falhas (evita empates)"""
+        try:
+            cluster_size = len(self.ns.list(prefix="Peer"))
+        except Pyro5.errors.PyroError:
+            cluster_size = 1
+        window = ELECTION_BACKOFF_SLOT * max(1.0, math.log2(cluster_size + 1))
+        window *= 2 ** min(shard.failed_elections, MAX_BACKOFF_EXPONENT)
+        # Quem já é tracker de outras partições espera mais, espalhando as partições entre os peers
+        window *= 1 + sum(1 for other in self.trackers if other is not shard and other.tracker_uri == self.uri)
+        return random.uniform(0, window)
+
+    def reset_tracker_timer(self, shard):
+        if shard.heartbeat_timer:
+            shard.heartbeat_timer.cancel()
+        # Com o tracker já suspeito a espera seria ~0; o piso dá tempo à eleição em andamento de terminar
+        timeout = max(shard.failure_detector.time_until_suspect(), ELECTION_ROUND_DEADLINE)
+        timeout += self.get_random_timeout(shard)
+        shard.heartbeat_timer = self.scheduler.call_later(timeout, self.check_tracker, shard)
+
+    def check_tracker(self, shard):
+        """Inicia uma eleição apenas se o detector de falhas suspeitar do tracker"""
+        if shard.failure_detector.is_available():
+            self.reset_tracker_timer(shard)
+            return
+        self.initiate_election(shard)
 
-    def initiate_election(self):
-        # with self.lock:
-        if self.election_in_progress:
-            logger.warning(f"{self.name} | Eleição já em andamento. Ignorando nova eleição.")
-            self.reset_tracker_timer()
+    def initiate_election(self, shard):
+        epoch, reason = shard.election.begin_election()
+        if reason == "in_progress":
+            logger.debug(f"{self.name} | Eleição já em andamento. Ignorando nova eleição.")
+            self.reset_tracker_timer(shard)
             return
-        elif self.voted_in_election_check():
-            logger.warning(f"{self.name} | Época {self.voted_in_epoch} já votada. Ignorando eleição.")
-            self.reset_tracker_timer()
+        elif reason == "voted":
+            logger.debug(f"{self.name} | Época {shard.election.voted_in_epoch} já votada. Ignorando eleição.")
+            self.reset_tracker_timer(shard)
             return
 
-        self.election_in_progress = True
-        self.tracker_epoch += 1
-        self.voted_in_epoch = self.tracker_epoch
         votes_received = 0
         total_votes = 0
 
         votes_received += 1  # Vota em si mesmo
         total_votes += 1
 
-        logger.info(f"Iniciando eleição para Época {self.tracker_epoch}")
+        logger.info(f"Iniciando eleição para Época {epoch} | Partição {shard.id}")
 
         try:
-            with Pyro5.api.locate_ns(NAMESERVER_HOSTNAME) as ns:
-                peer_list = ns.list(prefix="Peer")
-                for name, uri in peer_list.items():
-                    if name != f"Peer_{self.name}":
-                        match self.request_vote(uri):
-                            case "accepted":
-                                total_votes += 1
-                                votes_received += 1
-                            case "refused":
-                                total_votes += 1
-                            case _:
-                                logger.warning(f"{self.name} falhou ao solicitar voto de {name}")
-
-            if self.is_elected(total_votes, votes_received):
-                self.become_tracker()
-            else:
+            peer_list = self.ns.list(prefix="Peer")
+            # Com a maioria de todos os peers registrados a eleição termina sem esperar os demais
+            quorum = len(peer_list.keys() | {f"Peer_{self.name}"}) // 2 + 1
+            futures = self.fan_out(peer_list, self.request_vote, epoch, shard.id)
+            try:
+                for future in as_completed(futures, timeout=ELECTION_ROUND_DEADLINE):
+                    match future.result():
+                        case "accepted":
+                            total_votes += 1
+                            votes_received += 1
+                        case "refused":
+                            total_votes += 1
+                        case _:
+                            logger.warning(f"{self.name} falhou ao solicitar voto de {futures[future]}")
+                    if votes_received >= quorum:
+                        break
+            except FuturesTimeoutError:
+                logger.warning(f"{self.name} | Prazo da eleição esgotado, ignorando peers sem resposta")
+
+            if not self.is_elected(total_votes, votes_received):
                 logger.warning(f"Eleição falhou. Votos recebidos: {votes_received}/{total_votes}")
-                self.election_in_progress = False
-                self.voted_in_epoch = -1
-                self.tracker_epoch -= 1
-                self.reset_tracker_timer()
+                shard.election.abort_election(epoch)
+                shard.failed_elections += 1
+                self.reset_tracker_timer(shard)
+            elif shard.election.win_election(epoch):
+                self.become_tracker(shard)
+            else:
+                logger.warning(
+                    f"{self.name} | Época {shard.election.tracker_epoch} assumida por outro tracker durante a eleição"
+                )
+                self.reset_tracker_timer(shard)
 
         except Pyro5.errors.NamingError:
             logger.error("Serviço de nomes não disponível durante eleição")
+            shard.election.abort_election(epoch)
 
-    def request_vote(self, uri):
-        with self.get_tracker_proxy(uri) as peer:
-            try:
-                return peer.vote(self.tracker_epoch, self.name)
-            except Exception as e:
-                logger.error(f"{e} :: Falha ao solicitar voto de {uri}")
+    def fan_out(self, peer_list, call, *args):
+        """Chama 'call(uri, *args)' em paralelo para cada peer, exceto este. Retorna futuro -> nome do peer"""
+        return {
+            self.fanout_executor.submit(call, uri, *args): name
+            for name, uri in peer_list.items()
+            if name != f"Peer_{self.name}"
+        }
+
+    def request_vote(self, uri, epoch, shard_id=0):
+        try:
+            with self.get_tracker_proxy(uri) as peer:
+                return peer.vote(epoch, self.name, shard_id)
+        except Exception as e:
+            logger.error(f"{e} :: Falha ao solicitar voto de {uri}")
 
     @Pyro5.api.expose
-    def vote(self, epoch, candidate_name):
-        # with self.lock:
-        if epoch > self.voted_in_epoch:
-            self.voted_in_epoch = epoch
-            logger.info(f"{self.name} votou em {candidate_name} | Época {epoch}")
+    def vote(self, epoch, candidate_name, shard_id=0):
+        election = self.trackers[shard_id].election
+        if election.try_vote(epoch):
+            logger.info(f"{self.name} votou em {candidate_name} | Época {epoch} | Partição {shard_id}")
             return "accepted"
-        logger.warning(f"{self.name} negou voto para {candidate_name}. Época {self.voted_in_epoch} já votada")
+        logger.warning(f"{self.name} negou voto para {candidate_name}. Época {election.voted_in_epoch} já votada")
         return "refused"
 
     def is_elected(self, total_votes, votes_received):
@@ -204,190 +310,560 @@ class Peer:
             return True
         return False
 
-    def become_tracker(self):
-        logger.info(f"Eleito: {self.name} | Época: {self.tracker_epoch}")
-        self.current_tracker_uri = self.uri
-        self.election_in_progress = False
+    def become_tracker(self, shard):
+        epoch = shard.election.tracker_epoch
+        logger.info(f"Eleito: {self.name} | Época: {epoch} | Partição {shard.id}")
+        shard.tracker_uri = self.uri
+
+        # O índice replicado já está completo; novas alterações são numeradas na nova época
+        shard.files_index.start_epoch(epoch)
+        shard.replicated_position = shard.files_index.position
 
         # Registrar como tracker no serviço de nomes
         try:
-            self.register_with_nameserver(self.uri, f"Tracker_Epoca_{self.tracker_epoch}")
-            logger.info(f"{self.name} registrado como tracker no serviço de nomes | Época: {self.tracker_epoch}")
+            self.register_with_nameserver(self.uri, tracker_ns_name(shard.id, epoch))
+            logger.info(f"{self.name} registrado como tracker no serviço de nomes | Época: {epoch}")
         except Pyro5.errors.NamingError:
             logger.error("Falha ao registrar como tracker no serviço de nomes")
 
         # Registrar arquivos do peer no tracker
-        for file in self.files:
-            self.files_index[file].add(self.name)
+        with shard.delta_lock:
+            shard.index_version += 1
+            self.sync_index(self.name, shard.index_version, self.get_manifests(shard), shard.id)
+            shard.pending_delta.clear()
 
         # Iniciar envio de heartbeats
         logger.debug("Iniciando envio de heartbeats para peers")
-        self.start_heartbeat_sender()
+        self.start_heartbeat_sender(shard)
 
-    def start_heartbeat_sender(self):
-        if hasattr(self, "heartbeat_sender") and self.heartbeat_sender.is_alive():
-            self.heartbeat_sender.cancel()
+    def start_heartbeat_sender(self, shard, delay=TRACKER_HEARTBEAT_INTERVAL):
+        if shard.heartbeat_sender:
+            shard.heartbeat_sender.cancel()
 
-        self.heartbeat_sender = threading.Timer(TRACKER_HEARTBEAT_INTERVAL, self.send_heartbeat)
-        self.heartbeat_sender.start()
+        shard.heartbeat_sender = self.scheduler.call_later(delay, self.send_heartbeat, shard)
 
-    def send_heartbeat(self):
+    def send_heartbeat(self, shard):
+        started = time.monotonic()
         try:
-            with Pyro5.api.locate_ns(NAMESERVER_HOSTNAME) as ns:
-                peer_list = ns.list(prefix="Peer")
-                for name, uri in peer_list.items():
-                    if name != f"Peer_{self.name}":
-                        peer = Pyro5.api.Proxy(uri)
-                        try:
-                            peer.heartbeat_received(self.name, self.tracker_epoch)
-                        except Pyro5.errors.CommunicationError:
-                            pass
+            peer_list = self.ns.list(prefix="Peer")
+            # As alterações do índice desde a última rodada vão junto com o heartbeat
+            position, changes = shard.files_index.changes_since(shard.replicated_position)
+            replication = {"base": shard.replicated_position, "position": position, "changes": changes}
+            shard.replicated_position = position
+            # Peers lentos ou mortos não atrasam a próxima rodada além do prazo
+            futures = self.fan_out(
+                peer_list, self.send_heartbeat_to, shard.election.tracker_epoch, replication, shard.id
+            )
+            _, not_done = wait(futures, timeout=HEARTBEAT_ROUND_DEADLINE)
+            if not_done:
+                logger.debug(f"{len(not_done)} heartbeats não concluídos no prazo")
         except Pyro5.errors.NamingError:
             logger.error("Serviço de nomes não disponível para enviar heartbeats")
 
-        self.start_heartbeat_sender()
+        # Período fixo: o tempo da rodada é descontado da espera até a próxima
+        self.start_heartbeat_sender(shard, max(0.0, TRACKER_HEARTBEAT_INTERVAL - (time.monotonic() - started)))
+
+    def send_heartbeat_to(self, uri, epoch, replication=None, shard_id=0):
+        try:
+            with self.pool.proxy(uri) as peer:
+                peer.heartbeat_received(self.name, epoch, replication, shard_id)
+        except Pyro5.errors.CommunicationError:
+            pass
 
     @Pyro5.api.expose
     @Pyro5.api.oneway
-    def heartbeat_received(self, tracker_name, epoch):
+    def heartbeat_received(self, tracker_name, epoch, replication=None, shard_id=0):
         # logger.debug(
-        #     f"Heartbeat received from {tracker_name} | Época {epoch} | Época do meu tracker: {self.tracker_epoch}"
+        #     f"Heartbeat received from {tracker_name} | Época {epoch} | Partição {shard_id}"
         # )
-        if epoch > self.tracker_epoch:
-            self.tracker_epoch = epoch
-            self.voted_in_epoch = -1
-            with Pyro5.api.locate_ns(NAMESERVER_HOSTNAME) as ns:
-                tracker_uri = ns.lookup(f"Tracker_Epoca_{epoch}")
-                self.current_tracker_uri = tracker_uri
-            logger.info(f"Atualizando tracker para {tracker_name} | Época {epoch}")
-            self.register_files_with_tracker()
+        shard = self.trackers[shard_id]
+        # Também readota o tracker da época atual se o registro dos arquivos nele falhou
+        retry = epoch == shard.election.tracker_epoch and shard.tracker_uri is None
+        if shard.election.advance_epoch(epoch) or retry:
+            shard.failure_detector.reset()  # O intervalo até o primeiro heartbeat do novo tracker não conta
+            shard.tracker_uri = self.ns.lookup(tracker_ns_name(shard_id, epoch))
+            logger.info(f"Atualizando tracker para {tracker_name} | Época {epoch} | Partição {shard_id}")
+            self.register_files_with_tracker(shard)
             #threading.Thread(target=self.register_files_with_tracker).start()
 
-        self.reset_tracker_timer()
+        if replication is not None and epoch == shard.election.tracker_epoch:
+            self.apply_replication(shard, replication)
+
+        shard.failure_detector.heartbeat()
+        shard.failed_elections = 0
+        self.reset_tracker_timer(shard)
+
+    def apply_replication(self, shard, replication):
+        """Aplica na réplica local as alterações do índice enviadas pelo tracker"""
+        base, position = tuple(replication["base"]), tuple(replication["position"])
+        with shard.replication_lock:
+            current = shard.files_index.position
+            if current == position:
+                return
+            if current == base and replication["changes"] is not None:
+                shard.files_index.replay(replication["changes"])
+                return
+        # Lacuna na réplica: busca as alterações que faltam ou o índice completo
+        with shard.replication_lock:
+            if shard.snapshot_pending:
+                return
+            shard.snapshot_pending = True
+        self.fanout_executor.submit(self.fetch_index_from_tracker, shard)
+
+    def fetch_index_from_tracker(self, shard):
+        try:
+            with self.get_tracker_proxy(shard.tracker_uri) as tracker:
+                current = shard.files_index.position
+                _, changes = tracker.get_index_changes(current, shard.id)
+                if changes is None:
+                    snapshot = tracker.get_index_snapshot(shard.id)
+            with shard.replication_lock:
+                if changes is not None and shard.files_index.position == current:
+                    shard.files_index.replay(changes)
+                elif changes is None:
+                    shard.files_index = TrackerIndex.from_snapshot(snapshot)
+                    logger.debug(
+                        f"Réplica do índice recarregada | Partição {shard.id} | Posição {shard.files_index.position}"
+                    )
+        except Pyro5.errors.PyroError as e:
+            logger.error(f"Falha ao atualizar réplica do índice: {e}")
+        finally:
+            shard.snapshot_pending = False
 
     # Métodos do tracker
     # For tracker functionality (when peer becomes tracker)
     @Pyro5.api.expose
-    def register_files(self, peer_name, files):
-        """Tracker method to register files from a peer"""
-        # with self.lock:
-        logger.debug(f"Registrando arquivos do peer {peer_name}")
-        for filename in files:
-            if filename not in self.files_index:  # files_index is a defaultdict(set)
-                self.files_index[filename] = set()
-            self.files_index[filename].add(peer_name)
-
-    # @Pyro5.api.expose
-    # def add_file(self, peer_name, filename):
-    #     """Tracker method to add a single file from a peer"""
-    #     # with self.lock:
-    #     self.files_index[filename].add(peer_name)
+    def apply_index_delta(self, peer_name, base_version, version, added, removed, shard_id=0):
+        """Tracker method to apply a batch of added manifests and removed files from a peer.
+
+        Returns "resync" when base_version is not the last version applied for the peer.
+        """
+        if not self.trackers[shard_id].files_index.apply_delta(peer_name, base_version, version, added, removed):
+            return "resync"
+        if added or removed:
+            logger.debug(f"Delta do peer {peer_name} aplicado: +{len(added)} -{len(removed)} | Versão {version}")
+        return "ok"
+
+    @Pyro5.api.expose
+    def sync_index(self, peer_name, version, files, shard_id=0):
+        """Tracker method to replace every file registered by a peer with a full list of manifests"""
+        self.trackers[shard_id].files_index.sync_peer(peer_name, version, files)
+        logger.debug(f"Índice do peer {peer_name} sincronizado | Versão {version} | Partição {shard_id}")
 
     @Pyro5.api.expose
-    def remove_file(self, peer_name, filename):
-        # with self.lock:
-        if filename in self.files_index and peer_name in self.files_index[filename]:
-            self.files_index[filename].remove(peer_name)
-            if not self.files_index[filename]:
-                del self.files_index[filename]
+    def get_index_changes(self, since, shard_id=0):
+        """Tracker method returning (position, changes after 'since'), or changes None if no longer logged"""
+        return self.trackers[shard_id].files_index.changes_since(since)
+
+    @Pyro5.api.expose
+    def get_index_snapshot(self, shard_id=0):
+        """Tracker method returning the full index, for replicas that fell behind the change log"""
+        return self.trackers[shard_id].files_index.snapshot()
 
     @Pyro5.api.expose
     def get_file_locations(self, filename):
-        # with self.lock:
-        return list(self.files.get(filename, set()))
+        return list(self.shard_of(filename).files_index.holders(filename))
+
+    # Modo DHT
+    def start_dht(self):
+        """Entra na DHT pelos nós de DHT_BOOTSTRAP ou, sem eles, pelos peers registrados no serviço de nomes"""
+        self.dht = DHTNode(self.name, self.uri, self.pool)
+        uris = DHT_BOOTSTRAP
+        if not uris:
+            try:
+                uris = list(self.ns.list(prefix="Peer_").values())
+            except Pyro5.errors.PyroError:
+                logger.error("Serviço de nomes não disponível para entrar na DHT")
+                uris = []
+        self.dht.bootstrap(uris)
+
+    def publish_to_dht(self):
+        """Publica na DHT as mudanças pendentes de arquivos locais"""
+        changes = {}
+        for shard in self.trackers:
+            with shard.delta_lock:
+                changes.update(shard.pending_delta)
+                shard.pending_delta.clear()
+        if changes:
+            self.dht.publish(changes, self.name, self.uri)
+
+    def start_republisher(self):
+        self.republish_timer = self.scheduler.call_later(REPUBLISH_INTERVAL, self.republish_files)
+
+    def republish_files(self):
+        """Renova os registros dos arquivos locais antes que expirem nos nós da DHT"""
+        self.dht.expire()
+        try:
+            self.dht.publish(dict(self.local_store.items()), self.name, self.uri)
+        except Exception as e:
+            logger.error(f"Falha ao republicar arquivos na DHT: {e}")
+        self.start_republisher()
+
+    @Pyro5.api.expose
+    def dht_ping(self, sender):
+        return self.dht.handle_ping(sender)
+
+    @Pyro5.api.expose
+    def find_node(self, sender, target):
+        """Contatos mais próximos (XOR) do id 'target' conhecidos por este nó"""
+        return self.dht.handle_find_node(sender, target)
+
+    @Pyro5.api.expose
+    def find_value(self, sender, key):
+        """{"value": peers que possuem o arquivo} se este nó o guarda, senão {"nodes": contatos mais próximos}"""
+        return self.dht.handle_find_value(sender, key)
+
+    @Pyro5.api.expose
+    def store(self, sender, key, filename, holder, uri, manifest):
+        self.dht.handle_store(sender, key, filename, holder, uri, manifest)
+
+    def locate_file(self, filename):
+        """Peers que possuem o arquivo ({nome: uri}) e o manifesto, pelo tracker ou pela DHT.
+
+        Retorna None se não houver tracker da partição do arquivo.
+        """
+        if self.dht:
+            holders = self.dht.find_holders(filename)
+            manifests = [holder["manifest"] for holder in holders.values() if holder["manifest"]]
+            providers = {name: holder["uri"] for name, holder in holders.items() if name != self.name}
+            return providers, manifests[0] if manifests else None
+
+        if not self.shard_of(filename).tracker_uri:
+            return None
+        with self.tracker_for(filename) as tracker:
+            holders = [name for name in tracker.list_peers_with_file(filename) if name != self.name]
+            manifest = tracker.get_manifest(filename)
+        peer_list = self.ns.list(prefix="Peer_") if holders else {}
+        providers = {name: peer_list[f"Peer_{name}"] for name in holders if f"Peer_{name}" in peer_list}
+        if manifest is not None and "pieces" not in manifest:
+            # Tracker que recebeu o arquivo por replicação só conhece o hash raiz
+            manifest = self.fetch_manifest(manifest, providers)
+        return providers, manifest
+
+    def fetch_manifest(self, ref, providers):
+        """Busca o manifesto com os hashes dos pedaços em um dos peers que possuem o arquivo.
+
+        Só é aceito o manifesto cujo hash raiz confere com o do tracker.
+        """
+        for name, uri in providers.items():
+            try:
+                with self.pool.proxy(uri) as provider:
+                    manifest = provider.get_local_manifest(ref["root"])
+            except Pyro5.errors.CommunicationError:
+                logger.warning(f"Peer {name} indisponível para enviar o manifesto de {ref['name']}")
+                continue
+            if manifest and root_digest(manifest["size"], manifest["piece_size"], manifest["pieces"]) == ref["root"]:
+                return dict(manifest, name=ref["name"])
+        return None
 
     # Métodos P2P
+    def get_file_path(self, filename):
+        return self.local_store.path(filename)
+
     @Pyro5.api.expose
-    def request_file(self, filename, peer_name):
-        """Método chamado por outro peer para solicitar um arquivo"""
-        if filename in list(self.files):
-            filepath = os.path.join(os.getcwd(), self.name, filename)
-            if not os.path.isfile(filepath):
-                logger.warning(f"Arquivo {filename} não encontrado no peer {self.name}")
-                return None
-            # Simular transferência de arquivo
-            logger.info(f"Enviando arquivo {filename} de {peer_name}")
-            with open(filepath, "r") as f:
-                content = f.read()
-            return content
-        raise Pyro5.errors.CommunicationError(f"Arquivo {filename} não encontrado")
+    def get_local_manifest(self, key):
+        """Manifesto de um arquivo local, pelo nome ou pelo hash raiz"""
+        return self.local_store.manifest(key)
+
+    @Pyro5.api.expose
+    def get_file_size(self, filename):
+        """Retorna o tamanho em bytes de um arquivo local, usado para dividir o download em blocos"""
+        return self.local_store.size(filename)
+
+    @Pyro5.api.expose
+    def request_block(self, key, offset, length, peer_name):
+        """Método chamado por outro peer para solicitar um intervalo de bytes de um arquivo (nome ou hash raiz).
+
+        Retorna None quando a taxa de envio está esgotada; quem pediu tenta mais tarde.
+        """
+        length = min(length, BLOCK_SIZE)
+        try:
+            self.upload_limiter.reserve(peer_name, length)
+        except UploadBusy as e:
+            logger.debug(f"Pedido de {peer_name} recusado: {e}")
+            return None
+        data = self.local_store.read(key, offset, length)
+        if data is None and key in self.active_downloads:
+            # Arquivo ainda sendo baixado: serve os blocos já recebidos
+            partial = self.active_downloads[key].partial
+            if offset % partial.block_size == 0:
+                data = partial.read_block(offset // partial.block_size)
+        if data is None:
+            raise Pyro5.errors.CommunicationError(f"Arquivo {key} não encontrado")
+        if offset == 0:
+            logger.info(f"Enviando arquivo {key} para {peer_name}")
+        return data
 
     @Pyro5.api.expose
-    def list_files(self):
+    def get_piece_map(self, key, peer_name=None, peer_uri=None):
+        """Pedaços do arquivo que este peer pode servir e outros peers baixando o mesmo arquivo.
+
+        Retorna {"pieces": None se o arquivo está completo ou a lista de pedaços recebidos,
+        "peers": {nome: uri}}. Quem pergunta passa a ser indicado aos próximos.
+        """
+        now = time.monotonic()
+        with self.swarm_lock:
+            members = self.swarm_members.setdefault(key, {})
+            for name in [name for name, (_, expires) in members.items() if expires <= now]:
+                del members[name]
+            peers = {name: uri for name, (uri, _) in members.items() if name != peer_name}
+            if peer_name and peer_uri:
+                members[peer_name] = (peer_uri, now + SWARM_MEMBER_TTL)
+        if self.local_store.resolve(key) is not None:
+            return {"pieces": None, "peers": peers}
+        download = self.active_downloads.get(key)
+        if download is None:
+            return {"pieces": [], "peers": peers}
+        with download.partial.lock:
+            pieces = sorted(download.partial.completed)
+        return {"pieces": pieces, "peers": peers}
+
+    @Pyro5.api.expose
+    def list_files(self, shard_id=0):
         """Método para listar arquivos disponíveis no peer"""
-        return list(self.files_index.keys())
+        return self.trackers[shard_id].files_index.list_files()
+
+    @Pyro5.api.expose
+    def list_files_page(self, cursor=None, limit=PAGE_SIZE, prefix="", contains="", shard_id=0):
+        """Método para listar uma página de arquivos da partição, com filtro por prefixo ou trecho do nome.
+
+        Retorna {"files": [(arquivo, quantidade de peers)], "next_cursor": cursor da próxima página ou None}
+        """
+        files, next_cursor = self.trackers[shard_id].files_index.page(cursor, limit, prefix, contains)
+        return {"files": files, "next_cursor": next_cursor}
+
+    def browse_files(self, cursor=None, limit=PAGE_SIZE, prefix="", contains=""):
+        """Página da listagem de todas as partições, no mesmo formato de list_files_page.
+
+        Cada tracker devolve sua página ordenada a partir do mesmo cursor; as
+        páginas são intercaladas e cortadas no limite.
+        """
+        futures = [
+            self.fanout_executor.submit(self._list_shard_page, shard, cursor, limit, prefix, contains)
+            for shard in self.trackers
+            if shard.tracker_uri
+        ]
+        pages = [page for page in (future.result() for future in futures) if page is not None]
+        files = list(heapq.merge(*(page["files"] for page in pages)))
+        if len(files) > limit or any(page["next_cursor"] for page in pages):
+            files = files[:limit]
+            return {"files": files, "next_cursor": files[-1][0]}
+        return {"files": files, "next_cursor": None}
+
+    def _list_shard_page(self, shard, cursor, limit, prefix, contains):
+        try:
+            with self.get_tracker_proxy(shard.tracker_uri) as tracker:
+                return tracker.list_files_page(cursor, limit, prefix, contains, shard.id)
+        except Pyro5.errors.CommunicationError:
+            logger.error(f"Falha ao listar arquivos da partição {shard.id}")
+            return None
 
     @Pyro5.api.expose
     def list_peers_with_file(self, filename):
-        """Método para listar peers que possuem um arquivo específico"""
-        if filename in self.files_index:
-            return list(self.files_index[filename])
-        return []
+        """Método para listar peers que possuem um arquivo específico, inclusive com outro nome"""
+        return list(self.shard_of(filename).files_index.holders(filename))
+
+    @Pyro5.api.expose
+    def get_manifest(self, filename):
+        """Método para obter o manifesto de um arquivo; só nome e hash raiz se veio por replicação"""
+        return self.shard_of(filename).files_index.manifest(filename)
+
+    def _open_partial(self, filename, manifest, size):
+        """Prepara o arquivo temporário do download, verificando os pedaços pelo manifesto se houver"""
+        filepath = self.get_file_path(filename)
+        if manifest is None:
+            return PartialDownload(filepath, size)
+        return PartialDownload(
+            filepath,
+            manifest["size"],
+            manifest["piece_size"],
+            verify=lambda index, data: verify_piece(manifest, index, data),
+        )
 
     def download_file(self, filename, peer_name):
         """Método para baixar um arquivo da rede P2P"""
-        if not self.current_tracker_uri:
-            logger.warning("Nenhum tracker disponível")
+        if filename in self.local_store:
+            logger.warning("Você já possui este arquivo")
             return
 
         try:
-            if filename in self.files:
-                logger.warning("Você já possui este arquivo")
+            located = self.locate_file(filename)
+            if located is None:
+                logger.warning("Nenhum tracker disponível")
                 return
+            providers, manifest = located
+            if peer_name not in providers:
+                logger.warning(f"Peer {peer_name} não possui o arquivo {filename}")
+                return None
+            # Um único peer, mas com várias requisições em pipeline
+            return self._download(filename, {peer_name: providers[peer_name]}, manifest)
+        except (Pyro5.errors.CommunicationError, Pyro5.errors.NamingError, ValueError) as e:
+            logger.error(f"Falha ao baixar arquivo: {e}")
 
-            # Conectar ao peer e solicitar arquivo
-            with Pyro5.api.locate_ns(NAMESERVER_HOSTNAME) as ns:
-                provider_uri = ns.lookup(f"Peer_{peer_name}")
-                provider = Pyro5.api.Proxy(provider_uri)
-                content = provider.request_file(filename, self.name)
+    def download_file_swarm(self, filename):
+        """Baixa um arquivo em pedaços, em paralelo, de todos os peers que o possuem"""
+        if filename in self.local_store:
+            logger.warning("Você já possui este arquivo")
+            return
 
-                # Salvar arquivo localmente
-                self.add_file(filename)
-                logger.info(f"Arquivo {filename} baixado com sucesso de {peer_name}")                return content
-        except Pyro5.errors.CommunicationError as e:
+        try:
+            located = self.locate_file(filename)
+            if located is None:
+                logger.warning("Nenhum tracker disponível")
+                return
+            providers, manifest = located
+            if not providers:
+                logger.warning(f"Nenhum peer possui o arquivo {filename}")
+                return None
+            return self._download(filename, providers, manifest)
+        except (Pyro5.errors.CommunicationError, Pyro5.errors.NamingError, ValueError) as e:
             logger.error(f"Falha ao baixar arquivo: {e}")
 
+    def _download(self, filename, providers, manifest):
+        if manifest is None:
+            key = filename
+            size = None
+            for name, uri in providers.items():
+                try:
+                    with self.pool.proxy(uri) as provider:
+                        size = provider.get_file_size(filename)
+                    if size is not None:
+                        break
+                except Pyro5.errors.CommunicationError:
+                    logger.warning(f"Peer {name} indisponível para {filename}")
+            if size is None:
+                logger.warning(f"Arquivo {filename} indisponível na rede")
+                return None
+        else:
+            key = manifest["root"]
+            size = manifest["size"]
+
+        partial = self._open_partial(filename, manifest, size)
+        download = SwarmDownload(self.pool, filename, key, providers, partial, self.name, self.uri)
+        self.active_downloads[key] = download  # Pedaços já recebidos podem ser servidos a outros peers
+        try:
+            completed = download.run()
+        finally:
+            # Salva os blocos recebidos para retomar em caso de falha dos provedores
+            partial.close()
+            self.active_downloads.pop(key, None)
+        if not completed:
+            logger.error(f"Download de {filename} incompleto, pode ser retomado depois")
+            return None
+        partial.finalize()
+
+        # Registrar arquivo localmente
+        self.add_file(filename, manifest)
+        logger.info(f"Arquivo {filename} baixado com sucesso de {len(download.providers)} peers")
+        return partial.path
+
+    def download_progress(self):
+        """Progresso e vazão de cada download em andamento"""
+        return [download.progress() for download in list(self.active_downloads.values())]
+
     def start_random_files(self):
-        for i in range(3):
+        for i in range(RANDOM_FILES):
             filename = f"arquivo_{self.name}_{i}.txt"
-            filepath = os.path.join(os.getcwd(), self.name, filename)
+            if filename in self.local_store:
+                continue  # Criado em uma execução anterior
+            filepath = self.get_file_path(filename)
             os.makedirs(os.path.dirname(filepath), exist_ok=True)
-            generate_random_text_file(filepath, size=128)
-            self.add_file(filename) # Add file index
+            generate_random_text_file(filepath, size=RANDOM_FILE_SIZE)
+            self.add_file(filename, flush=False) # Add file index
+        self.flush_all()
 
     def start_peer(self):
         """Inicia o peer e registra no serviço de nomes"""
         # Adicionar alguns arquivos fictícios
 
-        daemon = Pyro5.api.Daemon(host=PEER_HOSTNAME)
+        daemon = self.daemon = Pyro5.api.Daemon(host=PEER_HOSTNAME)
         self.uri = daemon.register(self)
         logger.info(f"Peer {self.name} iniciado com URI: {self.uri}")
         self.register_with_nameserver(self.uri, f"Peer_{self.name}")  # Registrar no serviço de nomes
 
+        if LOOKUP_MODE == "dht":
+            # Sem tracker: o daemon precisa atender a DHT antes de publicar os arquivos
+            t = threading.Thread(target=daemon.requestLoop, daemon=True)
+            t.start()
+            self.start_dht()
+            self.announce_stored_files()
+            self.start_random_files()
+            self.start_republisher()
+            return
+
+        self.announce_stored_files()
         self.start_random_files()
 
         self.find_current_tracker()
 
-        self.reset_tracker_timer()  # Iniciar o timer de heartbeat
+        for shard in self.trackers:
+            self.reset_tracker_timer(shard)  # Iniciar o timer de heartbeat de cada partição
 
         t = threading.Thread(target=daemon.requestLoop, daemon=True)
         t.start()
 
+    def stop(self):
+        """Para o peer sem avisar a rede, como em uma falha: timers, daemon e conexões são encerrados"""
+        for shard in self.trackers:
+            for timer in (shard.heartbeat_sender, shard.heartbeat_timer):
+                if timer:
+                    timer.cancel()
+        if self.republish_timer:
+            self.republish_timer.cancel()
+        self.scheduler.close()
+        if self.daemon:
+            self.daemon.shutdown()
+        if self.dht:
+            self.dht.close()
+        self.fanout_executor.shutdown(wait=False, cancel_futures=True)
+        self.pool.close()
+        self.local_store.close()
+
+SWARM_CHOICE = "Todos os peers (swarm)"
+
+
 def interactive_cli(peer: Peer):
+    import inquirer  # Apenas a CLI interativa depende dele
+
     files = []
+    search = ""
+    next_cursor = None
     try:
         while True:
+            choices = ["Atualizar lista de arquivos", "Buscar arquivos", "Baixar Arquivo"]
+            if peer.dht:
+                # A DHT não tem listagem global, apenas busca pelo nome exato
+                choices = ["Buscar arquivos", "Baixar Arquivo"]
+            if next_cursor:
+                choices.insert(1, "Próxima página")
             choice = inquirer.list_input(
                 message="O que deseja fazer?",
-                choices=["Atualizar lista de arquivos", "Baixar Arquivo"],
+                choices=choices,
             )
-            tracker = Pyro5.api.Proxy(peer.current_tracker_uri)
-            if choice == "Atualizar lista de arquivos":
-                files = tracker.list_files()
+            if choice == "Buscar arquivos" and peer.dht:
+                filename = inquirer.text(message="Nome do arquivo")
+                holders = peer.dht.find_holders(filename)
+                if holders:
+                    files = [filename]
+                    print(f"{filename} ({len(holders)} peers)")
+                else:
+                    print("Nenhum arquivo disponível.")
+            elif choice in ("Atualizar lista de arquivos", "Buscar arquivos", "Próxima página"):
+                if choice == "Atualizar lista de arquivos":
+                    search, cursor = "", None
+                elif choice == "Buscar arquivos":
+                    search, cursor = inquirer.text(message="Trecho do nome do arquivo"), None
+                else:
+                    cursor = next_cursor
+                page = peer.browse_files(cursor, PAGE_SIZE, "", search)
+                files = [filename for filename, _ in page["files"]]
+                next_cursor = page["next_cursor"]
                 if files:
                     print("Arquivos disponíveis:")
-                    for i, file in enumerate(files):
-                        print(f"{i + 1}. {file}")
+                    for i, (file, holders) in enumerate(page["files"]):
+                        print(f"{i + 1}. {file} ({holders} peers)")
+                    if next_cursor:
+                        print("Há mais arquivos na próxima página.")
                 else:
                     print("Nenhum arquivo disponível.")
             elif choice == "Baixar Arquivo":
@@ -395,17 +871,18 @@ def interactive_cli(peer: Peer):
                     message="Selecione um arquivo para baixar",
                     choices=files,
                 )
-                peers_with_file = tracker.list_peers_with_file(file_to_download)
+                located = peer.locate_file(file_to_download)
+                peers_with_file = list(located[0]) if located else []
                 download_from_peer = inquirer.list_input(
                     message="Selecione de qual peer baixar",
-                    choices=peers_with_file,
+                    choices=[SWARM_CHOICE] + peers_with_file,
                 )
-                content = peer.download_file(file_to_download, download_from_peer)
-                if content:
-                    filepath = os.path.join(os.getcwd(), peer.name, file_to_download)
-                    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-                    with open(filepath, "w") as f:
-                        f.write(content)
+                if download_from_peer == SWARM_CHOICE:
+                    filepath = peer.download_file_swarm(file_to_download)
+                else:
+                    filepath = peer.download_file(file_to_download, download_from_peer)
+                if filepath:
+                    print(f"Arquivo salvo em {filepath}")
                 else:
                     print(f"Falha ao baixar o arquivo {file_to_download} de {download_from_peer}")
     except KeyboardInterrupt:
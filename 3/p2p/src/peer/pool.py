@@ -0,0 +1,189 @@
+import time
+import select
+import threading
+
+import Pyro5.api
+import Pyro5.errors
+
+from contextlib import contextmanager
+from collections import defaultdict
+
+from .logging import logger
+
+PROXY_IDLE_TIMEOUT = 30  # Segundos até um proxy ocioso ser fechado
+MAX_IDLE_PER_URI = 4  # Proxies ociosos mantidos por URI
+NS_CACHE_TTL = 2  # Segundos de validade das consultas ao serviço de nomes
+
+
+def is_connection_alive(proxy):
+    """Verifica sem round-trip se a conexão de um proxy ocioso ainda está aberta.
+
+    Em uma conexão ociosa não deve haver nada para ler; se o socket estiver
+    legível é porque o outro lado fechou (EOF) ou a conexão está corrompida.
+    """
+    connection = proxy._pyroConnection
+    if connection is None:
+        return True  # Ainda não conectado, o bind acontece na primeira chamada
+    try:
+        readable, _, _ = select.select([connection.sock], [], [], 0)
+    except (OSError, ValueError):
+        return False
+    return not readable
+
+
+class ProxyPool:
+    """Cache de proxies Pyro por URI, reutilizando a conexão TCP entre chamadas.
+
+    Proxies do Pyro pertencem a uma única thread, então cada checkout toma
+    posse do proxy e o devolve ao final; proxies com erro são descartados.
+    As conexões ociosas ficam abertas no outro lado, por isso os daemons dos
+    peers e o serviço de nomes usam o servidor multiplexado, em que uma
+    conexão aberta não ocupa uma thread.
+    """
+
+    def __init__(self, idle_timeout=PROXY_IDLE_TIMEOUT, max_idle_per_uri=MAX_IDLE_PER_URI):
+        self.idle_timeout = idle_timeout
+        self.max_idle_per_uri = max_idle_per_uri
+        self._idle = defaultdict(list)  # uri -> [(proxy, último uso)]
+        self._last_sweep = time.monotonic()
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def proxy(self, uri):
+        proxy = self._checkout(str(uri))
+        try:
+            yield proxy
+        except BaseException as e:
+            # Exceções remotas (com _pyroTraceback) não afetam a conexão; as demais podem
+            # ter deixado uma resposta pendente no socket, então o proxy é descartado
+            if isinstance(e, Pyro5.errors.CommunicationError) or not hasattr(e, "_pyroTraceback"):
+                self._discard(proxy)
+            else:
+                self._checkin(str(uri), proxy)
+            raise
+        self._checkin(str(uri), proxy)
+
+    def _checkout(self, uri):
+        while True:
+            with self.lock:
+                self._sweep()
+                idle = self._idle.get(uri)
+                if not idle:
+                    break
+                proxy, _ = idle.pop()
+            proxy._pyroClaimOwnership()
+            if is_connection_alive(proxy):
+                return proxy
+            self._discard(proxy)
+        return Pyro5.api.Proxy(uri)
+
+    def _checkin(self, uri, proxy):
+        with self.lock:
+            idle = self._idle[uri]
+            if len(idle) < self.max_idle_per_uri:
+                idle.append((proxy, time.monotonic()))
+                return
+        self._discard(proxy)
+
+    def _sweep(self):
+        # Fecha proxies ociosos há mais de idle_timeout; chamado com o lock adquirido
+        now = time.monotonic()
+        if now - self._last_sweep < 1:
+            return
+        self._last_sweep = now
+        for uri in list(self._idle):
+            alive = []
+            for proxy, last_used in self._idle[uri]:
+                if now - last_used > self.idle_timeout:
+                    self._discard(proxy)
+                else:
+                    alive.append((proxy, last_used))
+            if alive:
+                self._idle[uri] = alive
+            else:
+                del self._idle[uri]
+
+    def _discard(self, proxy):
+        try:
+            proxy._pyroClaimOwnership()
+            proxy._pyroRelease()
+        except Exception as e:
+            logger.debug(f"Falha ao fechar proxy: {e}")
+
+    def invalidate(self, uri):
+        with self.lock:
+            idle = self._idle.pop(str(uri), [])
+        for proxy, _ in idle:
+            self._discard(proxy)
+
+    def close(self):
+        with self.lock:
+            idle, self._idle = self._idle, defaultdict(list)
+        for proxies in idle.values():
+            for proxy, _ in proxies:
+                self._discard(proxy)
+
+
+class NameServerCache:
+    """Consultas ao serviço de nomes com cache TTL, usando um proxy do pool.
+
+    O serviço de nomes é localizado uma única vez; as listas de peers e as
+    URIs dos trackers ficam em cache por 'ttl' segundos.
+    """
+
+    def __init__(self, pool, host=None, ttl=NS_CACHE_TTL):
+        self.pool = pool
+        self.host = host
+        self.ttl = ttl
+        self.ns_uri = None
+        self._cache = {}  # chave -> (expira em, valor)
+        self.lock = threading.Lock()
+
+    def _get_ns_uri(self):
+        if self.ns_uri is None:
+            with Pyro5.api.locate_ns(self.host) as ns:
+                self.ns_uri = ns._pyroUri
+        return self.ns_uri
+
+    @contextmanager
+    def connect(self):
+        uri = self._get_ns_uri()
+        try:
+            with self.pool.proxy(uri) as ns:
+                yield ns
+        except Pyro5.errors.CommunicationError:
+            # O serviço de nomes pode ter reiniciado em outro endereço
+            self.ns_uri = None
+            raise
+
+    def _cached(self, key, fetch, fresh=False):
+        now = time.monotonic()
+        with self.lock:
+            entry = self._cache.get(key)
+        if entry and not fresh and entry[0] > now:
+            return entry[1]
+        value = fetch()
+        with self.lock:
+            self._cache[key] = (now + self.ttl, value)
+        return value
+
+    def list(self, prefix, fresh=False):
+        def fetch():
+            with self.connect() as ns:
+                return ns.list(prefix=prefix)
+        return self._cached(("list", prefix), fetch, fresh)
+
+    def lookup(self, name, fresh=False):
+        def fetch():
+            with self.connect() as ns:
+                return ns.lookup(name)
+        return self._cached(("lookup", name), fetch, fresh)
+
+    def register(self, name, uri):
+        with self.connect() as ns:
+            ns.register(name, uri)
+        self.invalidate()
+
+    def invalidate(self):
+        with self.lock:
+            self._cache.clear()
@@ -0,0 +1,79 @@
+import os
+import time
+import threading
+
+from .transfer import BLOCK_SIZE
+
+UPLOAD_RATE_LIMIT = int(os.getenv("UPLOAD_RATE_LIMIT", "0"))  # Bytes/s enviados no total, 0 = sem limite
+UPLOAD_RATE_PER_PEER = int(os.getenv("UPLOAD_RATE_PER_PEER", "0"))  # Bytes/s enviados a cada peer, 0 = sem limite
+
+
+class UploadBusy(Exception):
+    """Taxa de envio esgotada; quem pediu deve tentar mais tarde ou outro peer."""
+
+
+class TokenBucket:
+    """Balde de fichas: permite rajadas de até 'burst' bytes e, na média, 'rate' bytes/s.
+
+    O balde comporta ao menos um bloco; com taxas abaixo de BLOCK_SIZE por
+    segundo ele nunca juntaria fichas para um bloco inteiro e nada seria enviado.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(rate, BLOCK_SIZE)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, amount, max_wait):
+        """Reserva 'amount' fichas se estiverem disponíveis em até 'max_wait' segundos.
+
+        Retorna os segundos de espera, ou None sem reservar nada se a espera fosse maior.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            wait = max(0.0, (amount - self.tokens) / self.rate)
+            if wait > max_wait:
+                return None
+            self.tokens -= amount
+            return wait
+
+    def refund(self, amount):
+        with self.lock:
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class UploadLimiter:
+    """Limita a taxa de envio de blocos para outros peers.
+
+    O daemon do peer é multiplexado: atende uma requisição por vez, alternando
+    entre as conexões prontas, então os envios já são servidos em rodízio
+    entre os peers. Nenhuma espera pode acontecer durante o atendimento, pois
+    atrasaria votos e heartbeats de todos; por isso um envio acima do limite
+    por peer ou do total é recusado na hora como "ocupado", e o cliente tenta
+    de novo pouco depois, o que mantém a taxa média.
+    """
+
+    def __init__(self, total_rate=UPLOAD_RATE_LIMIT, per_peer_rate=UPLOAD_RATE_PER_PEER):
+        self.per_peer_rate = per_peer_rate
+        self.total_bucket = TokenBucket(total_rate) if total_rate else None
+        self.peer_buckets = {}  # Peer -> TokenBucket
+        self.lock = threading.Lock()
+
+    def reserve(self, peer_name, size):
+        """Reserva a taxa para enviar 'size' bytes ao peer. Levanta UploadBusy se ela estiver esgotada"""
+        bucket = None
+        if self.per_peer_rate:
+            with self.lock:
+                bucket = self.peer_buckets.get(peer_name)
+                if bucket is None:
+                    bucket = self.peer_buckets[peer_name] = TokenBucket(self.per_peer_rate)
+            if bucket.reserve(size, 0) is None:
+                raise UploadBusy(f"Taxa de envio para {peer_name} excedida")
+        if self.total_bucket is not None and self.total_bucket.reserve(size, 0) is None:
+            if bucket is not None:
+                bucket.refund(size)
+            raise UploadBusy("Taxa total de envio excedida")
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .logging import logger
+
+SCHEDULER_WORKERS = 8  # Threads que executam os callbacks dos timers
+
+
+class ScheduledCall:
+    """Chamada agendada no Scheduler; pode ser cancelada de qualquer thread."""
+
+    __slots__ = ("scheduler", "callback", "args", "cancelled", "handle")
+
+    def __init__(self, scheduler, callback, args):
+        self.scheduler = scheduler
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+        self.handle = None  # asyncio.TimerHandle, criado na thread do loop
+
+    def cancel(self):
+        self.cancelled = True
+        self.scheduler.loop.call_soon_threadsafe(self._cancel_handle)
+
+    def _cancel_handle(self):
+        if self.handle is not None:
+            self.handle.cancel()
+
+
+class Scheduler:
+    """Event loop asyncio em uma única thread para os timers do peer.
+
+    Substitui um threading.Timer (uma thread do SO) por timeout: os timers
+    ficam no heap do loop e, quando vencem, o callback roda em um pool
+    limitado de threads, já que as chamadas Pyro são bloqueantes. Reagendar
+    um timer a cada heartbeat custa duas operações no loop, sem criar threads.
+    """
+
+    def __init__(self, name, workers=SCHEDULER_WORKERS):
+        self.loop = asyncio.new_event_loop()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{name}-timer")
+        self.thread = threading.Thread(target=self._run, name=f"{name}-scheduler", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def call_later(self, delay, callback, *args):
+        """Agenda 'callback(*args)' para daqui a 'delay' segundos. Retorna um ScheduledCall"""
+        call = ScheduledCall(self, callback, args)
+        self.loop.call_soon_threadsafe(self._schedule, call, delay)
+        return call
+
+    def _schedule(self, call, delay):
+        if not call.cancelled:
+            call.handle = self.loop.call_later(max(0.0, delay), self._dispatch, call)
+
+    def _dispatch(self, call):
+        if not call.cancelled:
+            self.executor.submit(self._execute, call)
+
+    def _execute(self, call):
+        if call.cancelled:
+            return
+        try:
+            call.callback(*call.args)
+        except Exception:
+            logger.exception(f"Falha no timer {getattr(call.callback, '__name__', call.callback)}")
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,87 @@
+import os
+import bisect
+import hashlib
+import threading
+
+from .index import TrackerIndex
+from .election import ElectionState
+from .failure_detector import PhiAccrualFailureDetector
+
+TRACKER_SHARDS = int(os.getenv("TRACKER_SHARDS", "1"))  # Partições do índice, cada uma com seu tracker
+RING_VNODES = 64  # Pontos de cada partição no anel, equilibram a divisão das chaves
+
+
+def stable_hash(key):
+    # hash() muda entre processos; o anel precisa ser igual em todos os peers
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+def tracker_ns_name(shard_id, epoch, shard_count=TRACKER_SHARDS):
+    """Nome do tracker da partição no serviço de nomes; com uma partição mantém o nome original"""
+    if shard_count == 1:
+        return f"Tracker_Epoca_{epoch}"
+    return f"Tracker_Particao_{shard_id}_Epoca_{epoch}"
+
+
+def parse_tracker_name(name, shard_count=TRACKER_SHARDS):
+    """Retorna (partição, época) de um nome de tracker, ou None se for de outro modo ou inválido"""
+    parts = name.split("_")
+    try:
+        if shard_count == 1 and len(parts) == 3 and parts[1] == "Epoca":
+            return 0, int(parts[2])
+        if shard_count > 1 and len(parts) == 5 and parts[1] == "Particao" and parts[3] == "Epoca":
+            shard_id = int(parts[2])
+            if shard_id < shard_count:
+                return shard_id, int(parts[4])
+    except ValueError:
+        pass
+    return None
+
+
+class HashRing:
+    """Anel de hash consistente que associa cada nome de arquivo a uma partição.
+
+    Cada partição ocupa RING_VNODES pontos do anel; uma chave pertence ao
+    primeiro ponto no sentido horário. Mudar a quantidade de partições move
+    só as chaves dos pontos afetados, e não o índice inteiro.
+    """
+
+    def __init__(self, shard_count=TRACKER_SHARDS, vnodes=RING_VNODES):
+        self.shard_count = shard_count
+        points = sorted(
+            (stable_hash(f"particao-{shard_id}-{vnode}"), shard_id)
+            for shard_id in range(shard_count)
+            for vnode in range(vnodes)
+        )
+        self.hashes = [point for point, _ in points]
+        self.shards = [shard_id for _, shard_id in points]
+
+    def owner(self, key):
+        if self.shard_count == 1:
+            return 0
+        i = bisect.bisect(self.hashes, stable_hash(key)) % len(self.hashes)
+        return self.shards[i]
+
+
+class TrackerShard:
+    """Estado do peer em relação a uma partição: tracker atual, eleição, réplica do índice e delta pendente.
+
+    Cada partição tem sua própria época e eleição, usando o mesmo mecanismo
+    de votos e heartbeats do tracker único.
+    """
+
+    def __init__(self, shard_id, heartbeat_interval):
+        self.id = shard_id
+        self.tracker_uri = None
+        self.election = ElectionState()  # Época, voto e eleição em andamento
+        self.failure_detector = PhiAccrualFailureDetector(heartbeat_interval)
+        self.failed_elections = 0  # Eleições falhas desde o último heartbeat, aumenta a espera
+        self.files_index = TrackerIndex()  # Índice da partição; réplica quando outro peer é o tracker
+        self.replicated_position = (0, 0)  # Posição do índice já enviada nos heartbeats, apenas tracker usa
+        self.replication_lock = threading.Lock()
+        self.snapshot_pending = False
+        self.index_version = 0  # Versão do índice local confirmada pelo tracker da partição
+        self.pending_delta = {}  # Arquivo -> manifesto (adição) ou None (remoção) ainda não enviados
+        self.delta_lock = threading.Lock()
+        self.heartbeat_timer = None
+        self.heartbeat_sender = None
@@ -0,0 +1,191 @@
+import os
+import json
+import mmap
+import shutil
+import threading
+
+from collections import OrderedDict
+
+from .logging import logger
+from .manifest import build_manifest
+
+STORE_DIR = ".store"  # Pasta do armazenamento dentro da pasta do peer
+MAX_MAPPED_BLOBS = 64  # Blobs mantidos mapeados em memória para servir blocos
+
+
+class ContentStore:
+    """Armazenamento local endereçado pelo hash raiz do conteúdo.
+
+    Cada conteúdo é guardado uma única vez em .store/blobs/<hash raiz>, e os
+    arquivos com nome na pasta do peer são hard links para o blob, então
+    nomes diferentes com o mesmo conteúdo não ocupam espaço extra. O índice
+    (arquivo -> manifesto) fica em .store/index.json, e ao reiniciar o peer
+    anuncia os arquivos sem recalcular os hashes. Os blobs mais usados ficam
+    mapeados (mmap), e cada bloco servido é só um recorte do mapa, sem abrir
+    ou ler o arquivo por requisição.
+    """
+
+    def __init__(self, directory, max_mapped=MAX_MAPPED_BLOBS):
+        self.directory = directory
+        self.blob_dir = os.path.join(directory, STORE_DIR, "blobs")
+        self.index_path = os.path.join(directory, STORE_DIR, "index.json")
+        self.max_mapped = max_mapped
+        self.manifests = {}  # Arquivo -> manifesto
+        self.roots = {}  # Hash raiz -> arquivo, para servir conteúdo idêntico com outro nome
+        self.lock = threading.RLock()
+        self._mapped = OrderedDict()  # Hash raiz -> mmap, do menos para o mais usado
+
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self._load_index()
+
+    def path(self, filename):
+        return os.path.join(self.directory, filename)
+
+    def blob_path(self, root):
+        return os.path.join(self.blob_dir, root[:2], root)
+
+    # Índice
+    def _load_index(self):
+        if not os.path.isfile(self.index_path):
+            return
+        try:
+            with open(self.index_path, "r") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Índice do armazenamento ilegível, ignorando: {e}")
+            return
+        for filename, entry in entries.items():
+            manifest = entry["manifest"]
+            try:
+                stat = os.stat(self.blob_path(manifest["root"]))
+            except OSError:
+                continue
+            # Blob alterado ou truncado fora do peer: o arquivo sai do índice
+            if stat.st_size != manifest["size"] or stat.st_mtime_ns != entry["mtime_ns"]:
+                logger.warning(f"Arquivo {filename} alterado em disco, removido do armazenamento")
+                continue
+            if not os.path.isfile(self.path(filename)):
+                continue
+            self.manifests[filename] = manifest
+            self.roots[manifest["root"]] = filename
+
+    def _save_index(self):
+        # Chamado com o lock adquirido
+        entries = {}
+        for filename, manifest in self.manifests.items():
+            try:
+                mtime_ns = os.stat(self.blob_path(manifest["root"])).st_mtime_ns
+            except OSError:
+                continue
+            entries[filename] = {"manifest": manifest, "mtime_ns": mtime_ns}
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.index_path)
+
+    # Escrita
+    def add(self, filename, manifest=None):
+        """Guarda o arquivo da pasta do peer no armazenamento. Retorna o manifesto"""
+        path = self.path(filename)
+        if manifest is None:
+            manifest = build_manifest(path, filename)
+        root = manifest["root"]
+        blob = self.blob_path(root)
+        with self.lock:
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            if not os.path.exists(blob):
+                try:
+                    os.link(path, blob)
+                except OSError:
+                    shutil.copyfile(path, blob)
+            elif not os.path.samefile(path, blob):
+                # Conteúdo já guardado com outro nome: o arquivo passa a apontar para o mesmo blob
+                tmp_path = f"{path}.link"
+                try:
+                    os.link(blob, tmp_path)
+                    os.replace(tmp_path, path)
+                except OSError:
+                    pass
+            self.manifests[filename] = manifest
+            self.roots[root] = filename
+            self._save_index()
+        return manifest
+
+    def remove(self, filename):
+        """Remove o arquivo do armazenamento; o blob é apagado se nenhum outro nome o usa"""
+        with self.lock:
+            manifest = self.manifests.pop(filename, None)
+            if manifest is None:
+                return
+            root = manifest["root"]
+            others = [name for name, m in self.manifests.items() if m["root"] == root]
+            if others:
+                self.roots[root] = others[0]
+            else:
+                self.roots.pop(root, None)
+                self._mapped.pop(root, None)
+                try:
+                    os.remove(self.blob_path(root))
+                except OSError:
+                    pass
+            self._save_index()
+
+    # Leitura
+    def __contains__(self, filename):
+        return filename in self.manifests
+
+    def names(self):
+        with self.lock:
+            return list(self.manifests)
+
+    def items(self):
+        with self.lock:
+            return list(self.manifests.items())
+
+    def resolve(self, key):
+        """Hash raiz de um arquivo pedido pelo nome ou pelo próprio hash raiz"""
+        manifest = self.manifests.get(key)
+        if manifest is not None:
+            return manifest["root"]
+        return key if key in self.roots else None
+
+    def manifest(self, key):
+        """Manifesto de um arquivo pelo nome ou pelo hash raiz"""
+        with self.lock:
+            filename = self.roots.get(self.resolve(key))
+            return self.manifests.get(filename) if filename else None
+
+    def size(self, key):
+        root = self.resolve(key)
+        try:
+            return self.manifests[self.roots[root]]["size"]
+        except KeyError:
+            return None  # Inexistente ou removido durante a consulta
+
+    def _map(self, root):
+        with self.lock:
+            mm = self._mapped.get(root)
+            if mm is not None:
+                self._mapped.move_to_end(root)
+                return mm
+            with open(self.blob_path(root), "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapped[root] = mm
+            if len(self._mapped) > self.max_mapped:
+                # Não fecha o mapa: leituras em andamento ainda o usam, e ele é liberado com a última referência
+                self._mapped.popitem(last=False)
+            return mm
+
+    def read(self, key, offset, length):
+        """Intervalo de bytes de um arquivo (nome ou hash raiz), lido do blob mapeado. None se não existir"""
+        root = self.resolve(key)
+        size = self.size(root) if root is not None else None
+        if size is None:
+            return None
+        if offset < 0 or offset >= size or length <= 0:
+            return b""
+        return self._map(root)[offset:offset + length]
+
+    def close(self):
+        with self.lock:
+            self._mapped.clear()
@@ -0,0 +1,265 @@
+import time
+import random
+import threading
+
+import serpent
+import Pyro5.errors
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .logging import logger
+
+MAX_SWARM_WORKERS = 16  # Limite de requisições de pedaços simultâneas
+MAX_IN_FLIGHT_PER_PROVIDER = 4  # Requisições em pipeline por peer, escondem a latência de cada RPC
+MAX_PROVIDER_FAILURES = 3  # Falhas até um peer ser descartado do swarm
+MAX_PIECE_ATTEMPTS = 3  # Tentativas de um pedaço no mesmo peer (ex. pedaço corrompido) antes de trocar de peer
+SLOW_PIECE_SECONDS = 1.0  # Pedaços acima desse tempo reduzem a prioridade do peer
+PIECE_MAP_REFRESH = 2.0  # Intervalo para atualizar quais pedaços cada peer possui
+PROGRESS_LOG_INTERVAL = 1.0  # Intervalo entre logs de progresso
+BUSY_BACKOFF_SECONDS = 0.1  # Pausa nos pedidos a um peer que respondeu "ocupado"
+STALL_SECONDS = 20.0  # Tempo máximo esperando peers parciais sem receber nenhum pedaço
+
+
+class ProviderBusy(Exception):
+    """O peer recusou o pedido por estar ocupado; não conta como falha."""
+
+
+class SwarmDownload:
+    """Baixa os pedaços de um arquivo em paralelo de todos os peers que o possuem.
+
+    Os pedaços mais raros (presentes em menos peers) são pedidos primeiro, com
+    desempate aleatório, para que novas cópias de cada pedaço surjam logo no
+    swarm. A disponibilidade começa pela quantidade de peers que o tracker
+    indica e é atualizada com o mapa de pedaços de cada peer, que também
+    apresenta outros peers baixando o mesmo arquivo. Cada peer recebe até
+    'max_in_flight' requisições em pipeline; pedaços que falham são pedidos
+    novamente, e peers que falham repetidamente saem do swarm.
+    """
+
+    def __init__(
+        self,
+        pool,
+        filename,
+        key,
+        providers,
+        partial,
+        requester,
+        requester_uri=None,
+        max_workers=MAX_SWARM_WORKERS,
+        max_in_flight=MAX_IN_FLIGHT_PER_PROVIDER,
+    ):
+        self.pool = pool  # Proxies reutilizados entre os workers
+        self.filename = filename
+        self.key = key  # Nome ou hash raiz usado para pedir os blocos
+        self.providers = dict(providers)  # nome do peer -> uri
+        self.partial = partial
+        self.requester = requester
+        self.requester_uri = str(requester_uri) if requester_uri else None
+        self.max_workers = max_workers
+        self.max_in_flight = max_in_flight
+        self.piece_maps = {name: None for name in self.providers}  # nome -> pedaços que possui, None = todos
+        self.in_flight = {name: 0 for name in self.providers}
+        self.failures = {name: 0 for name in self.providers}
+        self.slow = {name: 0 for name in self.providers}
+        self.busy_until = {}  # nome -> instante em que volta a receber pedidos
+        self.attempts = {}  # (pedaço, peer) -> tentativas
+        self.requested = set()  # Pedaços com requisição em andamento
+        self.tiebreak = list(range(partial.total_blocks))
+        random.shuffle(self.tiebreak)  # Downloads diferentes começam por pedaços diferentes
+        self.order = deque()  # Pedaços faltantes, do mais raro para o mais comum
+        self.availability = {}
+        self.started = time.monotonic()
+        self.bytes_received = 0
+        self.lock = threading.Lock()
+        self._recount()
+
+    # Disponibilidade
+    def _recount(self):
+        # Chamado com o lock adquirido (ou antes de iniciar)
+        maps = [self.piece_maps[name] for name in self.providers if self._usable(name)]
+        missing = self.partial.missing_blocks()
+        self.availability = {
+            index: sum(1 for pieces in maps if pieces is None or index in pieces) for index in missing
+        }
+        self.order = deque(sorted(missing, key=lambda index: (self.availability[index], self.tiebreak[index])))
+
+    def _usable(self, name):
+        return self.failures[name] < MAX_PROVIDER_FAILURES
+
+    def _available(self, name, now):
+        return self._usable(name) and self.busy_until.get(name, 0) <= now
+
+    def refresh_piece_maps(self, executor):
+        """Pergunta a cada peer quais pedaços ele possui; peers que também baixam o arquivo entram no swarm"""
+        futures = {executor.submit(self._fetch_piece_map, name, uri): name for name, uri in list(self.providers.items())}
+        done, _ = wait(futures, timeout=PIECE_MAP_REFRESH)
+        with self.lock:
+            for future in done:
+                name = futures[future]
+                try:
+                    result = future.result()
+                except (Pyro5.errors.PyroError, OSError) as e:
+                    logger.debug(f"Falha ao obter pedaços de {name}: {e}")
+                    self.failures[name] += 1
+                    continue
+                if result is None:
+                    continue
+                pieces = result.get("pieces")
+                self.piece_maps[name] = None if pieces is None else set(pieces)
+                for peer_name, uri in result.get("peers", {}).items():
+                    if peer_name != self.requester and peer_name not in self.providers:
+                        self.providers[peer_name] = uri
+                        self.piece_maps[peer_name] = set()  # Conhecido no próximo refresh
+                        self.in_flight[peer_name] = 0
+                        self.failures[peer_name] = 0
+                        self.slow[peer_name] = 0
+            self._recount()
+
+    def _fetch_piece_map(self, name, uri):
+        with self.pool.proxy(uri) as proxy:
+            return proxy.get_piece_map(self.key, self.requester, self.requester_uri)
+
+    # Escalonamento
+    def _has(self, name, index):
+        pieces = self.piece_maps[name]
+        return pieces is None or index in pieces
+
+    def _pick_piece(self, name):
+        # Descarta do início da fila os pedaços já concluídos
+        while self.order and self.order[0] in self.partial.completed:
+            self.order.popleft()
+        for index in self.order:
+            if index in self.requested or index in self.partial.completed:
+                continue
+            if self._has(name, index) and self.attempts.get((index, name), 0) < MAX_PIECE_ATTEMPTS:
+                return index
+        return None
+
+    def _assign(self):
+        """Distribui pedaços aos peers com vagas no pipeline. Retorna [(pedaço, peer)]"""
+        assignments = []
+        now = time.monotonic()
+        with self.lock:
+            providers = sorted(
+                (name for name in self.providers if self._available(name, now)),
+                key=lambda name: (self.in_flight[name], self.failures[name], self.slow[name]),
+            )
+            for name in providers:
+                while self.in_flight[name] < self.max_in_flight and len(self.requested) < self.max_workers:
+                    index = self._pick_piece(name)
+                    if index is None:
+                        break
+                    self.requested.add(index)
+                    self.in_flight[name] += 1
+                    assignments.append((index, name))
+        return assignments
+
+    def _fetch_piece(self, index, provider):
+        offset, length = self.partial.block_range(index)
+        started = time.monotonic()
+        with self.pool.proxy(self.providers[provider]) as proxy:
+            data = proxy.request_block(self.key, offset, length, self.requester)
+        if data is None:
+            raise ProviderBusy(provider)
+        self.partial.write_block(index, serpent.tobytes(data))
+        if time.monotonic() - started > SLOW_PIECE_SECONDS:
+            with self.lock:
+                self.slow[provider] += 1
+            logger.warning(f"Peer {provider} lento no pedaço {index} de {self.filename}")
+        return length
+
+    def _any_busy(self, now):
+        # Peers ocupados voltam a receber pedidos após a pausa
+        with self.lock:
+            return any(self._usable(name) and self.busy_until.get(name, 0) > now for name in self.providers)
+
+    def _waiting_for_partials(self):
+        # Peers que ainda estão baixando podem receber os pedaços que faltam
+        return any(self._usable(name) and self.piece_maps[name] is not None for name in self.providers)
+
+    def run(self):
+        """Baixa todos os pedaços faltantes. Retorna True se o arquivo foi completado."""
+        futures = {}
+        # Vagas extras para as consultas de mapas de pedaços não esperarem os downloads
+        with ThreadPoolExecutor(max_workers=self.max_workers + 4) as executor:
+            self.refresh_piece_maps(executor)
+            next_refresh = time.monotonic() + PIECE_MAP_REFRESH
+            next_log = time.monotonic() + PROGRESS_LOG_INTERVAL
+            last_piece = time.monotonic()
+
+            while not self.partial.is_complete():
+                now = time.monotonic()
+                if now >= next_refresh:
+                    self.refresh_piece_maps(executor)
+                    next_refresh = now + PIECE_MAP_REFRESH
+                if now >= next_log:
+                    self.log_progress()
+                    next_log = now + PROGRESS_LOG_INTERVAL
+
+                for index, provider in self._assign():
+                    futures[executor.submit(self._fetch_piece, index, provider)] = (index, provider)
+
+                if not futures:
+                    if now - last_piece > STALL_SECONDS:
+                        logger.error(f"Nenhum pedaço de {self.filename} recebido em {STALL_SECONDS:.0f}s")
+                        break
+                    if self._any_busy(now):
+                        time.sleep(BUSY_BACKOFF_SECONDS)
+                        continue
+                    if not self._waiting_for_partials():
+                        logger.error(f"Nenhum peer disponível para os pedaços restantes de {self.filename}")
+                        break
+                    time.sleep(max(0.0, next_refresh - time.monotonic()))
+                    continue
+
+                done, _ = wait(futures, timeout=PROGRESS_LOG_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, provider = futures.pop(future)
+                    with self.lock:
+                        self.requested.discard(index)
+                        self.in_flight[provider] -= 1
+                    try:
+                        received = future.result()
+                    except ProviderBusy:
+                        with self.lock:
+                            self.busy_until[provider] = time.monotonic() + BUSY_BACKOFF_SECONDS
+                        continue
+                    except (Pyro5.errors.PyroError, ValueError, OSError) as e:
+                        logger.warning(f"Falha ao baixar pedaço {index} de {provider}: {e}")
+                        with self.lock:
+                            self.failures[provider] += 1
+                            self.attempts[(index, provider)] = self.attempts.get((index, provider), 0) + 1
+                        continue
+                    with self.lock:
+                        self.bytes_received += received
+                    last_piece = time.monotonic()
+
+            # Pedaços ainda em andamento após uma falha geral
+            wait(futures)
+
+        self.log_progress()
+        return self.partial.is_complete()
+
+    # Progresso
+    def progress(self):
+        with self.lock:
+            completed = len(self.partial.completed)
+            total = self.partial.total_blocks
+            elapsed = time.monotonic() - self.started
+            return {
+                "filename": self.filename,
+                "completed": completed,
+                "total": total,
+                "percent": 100.0 * completed / total if total else 100.0,
+                "bytes": self.bytes_received,
+                "throughput": self.bytes_received / elapsed if elapsed > 0 else 0.0,
+                "providers": sum(1 for name in self.providers if self._usable(name)),
+            }
+
+    def log_progress(self):
+        progress = self.progress()
+        logger.info(
+            f"{progress['filename']}: {progress['completed']}/{progress['total']} pedaços "
+            f"({progress['percent']:.0f}%) | {progress['throughput'] / 1024:.1f} KB/s | {progress['providers']} peers"
+        )
@@ -0,0 +1,128 @@
+import os
+import json
+import threading
+
+BLOCK_SIZE = 64 * 1024  # 64KB por bloco
+CHECKPOINT_INTERVAL = 16  # Blocos gravados entre cada checkpoint do estado
+
+
+def block_count(size, block_size=BLOCK_SIZE):
+    """Quantidade de blocos necessária para cobrir 'size' bytes."""
+    return (size + block_size - 1) // block_size
+
+
+class PartialDownload:
+    """Arquivo temporário (.part) que registra os blocos já gravados em disco.
+
+    O estado fica em um arquivo ao lado (.part.json) e só lista blocos que já
+    passaram por fsync, então um download interrompido pode ser retomado a
+    partir do último bloco confirmado, inclusive de outro peer. Se 'verify'
+    for informado, cada bloco é conferido antes de ser aceito.
+    """
+
+    def __init__(self, path, size, block_size=BLOCK_SIZE, verify=None):
+        self.path = path
+        self.part_path = f"{path}.part"
+        self.state_path = f"{path}.part.json"
+        self.size = size
+        self.block_size = block_size
+        self.total_blocks = block_count(size, block_size)
+        self.verify = verify
+        self.completed = set()
+        self._pending = 0
+        self.lock = threading.Lock()  # Blocos podem ser gravados por várias threads
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._load_state()
+        self.fd = os.open(self.part_path, os.O_RDWR | os.O_CREAT)
+        os.ftruncate(self.fd, size)
+        if self.verify and self.completed:
+            self._verify_completed()
+
+    def _load_state(self):
+        if not os.path.isfile(self.state_path) or not os.path.isfile(self.part_path):
+            self.completed = set()
+            return
+        try:
+            with open(self.state_path, "r") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        if state.get("size") == self.size and state.get("block_size") == self.block_size:
+            self.completed = {i for i in state.get("blocks", []) if 0 <= i < self.total_blocks}
+        else:
+            # Estado de outro arquivo/versão, recomeça do zero
+            self.completed = set()
+
+    def _verify_completed(self):
+        # Descarta blocos retomados que não conferem com o esperado
+        for index in sorted(self.completed):
+            offset, length = self.block_range(index)
+            if not self.verify(index, os.pread(self.fd, length, offset)):
+                self.completed.discard(index)
+
+    def block_range(self, index):
+        offset = index * self.block_size
+        return offset, min(self.block_size, self.size - offset)
+
+    def missing_blocks(self):
+        return [i for i in range(self.total_blocks) if i not in self.completed]
+
+    def is_complete(self):
+        return len(self.completed) == self.total_blocks
+
+    def write_block(self, index, data):
+        offset, length = self.block_range(index)
+        if len(data) != length:
+            raise ValueError(f"Bloco {index} com tamanho inválido: {len(data)} != {length}")
+        if self.verify and not self.verify(index, data):
+            raise ValueError(f"Bloco {index} corrompido")
+        os.pwrite(self.fd, data, offset)
+        with self.lock:
+            self.completed.add(index)
+            self._pending += 1
+            if self._pending >= CHECKPOINT_INTERVAL:
+                self._checkpoint()
+
+    def read_block(self, index):
+        """Bloco já gravado, para servir a outros peers durante o download. None se ainda não foi recebido."""
+        with self.lock:
+            if index not in self.completed or self.fd is None:
+                return None
+            offset, length = self.block_range(index)
+            try:
+                return os.pread(self.fd, length, offset)
+            except OSError:
+                return None  # Download finalizado durante a leitura
+
+    def checkpoint(self):
+        """Persiste os blocos concluídos, após garantir que estão em disco."""
+        with self.lock:
+            self._checkpoint()
+
+    def _checkpoint(self):
+        os.fsync(self.fd)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"size": self.size, "block_size": self.block_size, "blocks": sorted(self.completed)}, f)
+        os.replace(tmp_path, self.state_path)
+        self._pending = 0
+
+    def close(self):
+        if self.fd is None:
+            return
+        self.checkpoint()
+        os.close(self.fd)
+        self.fd = None
+
+    def finalize(self):
+        """Move o arquivo temporário para o destino final e descarta o estado."""
+        if not self.is_complete():
+            raise ValueError(f"Download incompleto: {len(self.completed)}/{self.total_blocks} blocos")
+        if self.fd is not None:
+            os.fsync(self.fd)
+            os.close(self.fd)
+            self.fd = None
+        os.replace(self.part_path, self.path)
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
@@ -1,9 +1,64 @@
+import os
 import string
 import random
 
-def generate_random_text_file(path, size=1024):
+from .transfer import BLOCK_SIZE
+
+CHUNK_SIZE = 4 * 1024 * 1024  # Bytes gerados e gravados por vez
+SPARSE_STAMP_SIZE = 16  # Bytes aleatórios no início de cada bloco de um arquivo esparso
+SPARSE_BLOCK_SIZE = BLOCK_SIZE  # Um trecho aleatório por bloco, então cada pedaço tem hash próprio
+
+TEXT_CHARS = (string.ascii_letters + string.digits + ' ').encode()
+# Converte cada byte aleatório em um caractere de TEXT_CHARS (distribuição quase uniforme)
+TEXT_TABLE = bytes(TEXT_CHARS[i % len(TEXT_CHARS)] for i in range(256))
+
+
+def random_source(seed=None):
+    """Função n -> n bytes aleatórios; com 'seed' a sequência é sempre a mesma"""
+    if seed is None:
+        return os.urandom
+    return random.Random(seed).randbytes
+
+
+def generate_random_file(path, size, seed=None, text=False, sparse=False, chunk_size=CHUNK_SIZE):
+    """Gera um arquivo com 'size' bytes aleatórios, gravados em blocos de 'chunk_size'.
+
+    Com 'text', os bytes são letras, dígitos e espaços. Com 'sparse', o
+    arquivo é criado com buracos e só os primeiros bytes de cada bloco são
+    aleatórios: ocupa em disco uma página por bloco (cerca de 6% do
+    tamanho), mas cada bloco continua com conteúdo (e hash) próprio.
+    """
+    randbytes = random_source(seed)
+    with open(path, 'wb') as f:
+        if sparse:
+            f.truncate(size)
+            for offset in range(0, size, SPARSE_BLOCK_SIZE):
+                stamp = randbytes(min(SPARSE_STAMP_SIZE, size - offset))
+                f.seek(offset)
+                f.write(stamp.translate(TEXT_TABLE) if text else stamp)
+            return
+        for offset in range(0, size, chunk_size):
+            chunk = randbytes(min(chunk_size, size - offset))
+            f.write(chunk.translate(TEXT_TABLE) if text else chunk)
+
+
+def generate_random_text_file(path, size=1024, seed=None):
     """Gera um arquivo em disk com 'size' bytes aleatórios (letras e dígitos)."""
-    chars = string.ascii_letters + string.digits + ' '
-    with open(path, 'w') as f:
-        f.write(''.join(random.choice(chars) for _ in range(size)))
+    generate_random_file(path, size, seed=seed, text=True)
+
+
+def generate_random_files(directory, count, size, prefix="arquivo", seed=None, sparse=False):
+    """Gera 'count' arquivos de 'size' bytes em 'directory'. Retorna os nomes dos arquivos.
 
+    Com 'seed', o arquivo i usa a semente seed + i, então o mesmo comando gera
+    sempre os mesmos arquivos, e arquivos diferentes nunca têm o mesmo conteúdo.
+    """
+    os.makedirs(directory, exist_ok=True)
+    filenames = []
+    for i in range(count):
+        filename = f"{prefix}_{i}.bin"
+        generate_random_file(
+            os.path.join(directory, filename), size, seed=None if seed is None else seed + i, sparse=sparse
+        )
+        filenames.append(filename)
+    return filenames
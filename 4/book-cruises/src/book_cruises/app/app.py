@@ -9,7 +9,7 @@ from pika.exceptions import ChannelWrongStateError
 
 from book_cruises.commons.utils import config, logger
 from book_cruises.commons.domains import Itinerary
-from book_cruises.commons.messaging import Producer, Consumer
+from book_cruises.commons.messaging import Producer, Consumer, codec
 from .di import configure_dependencies, get_producer, get_consumer
 
 # Initialize Flask app
@@ -210,7 +210,9 @@ def subscribe_to_promotions(destination):
                 method, props, body = consumer.basic_consume(queue_name)
                 if method:
                     logger.info(f"Sending promotion to {destination} for client {consumer_id}")
-                    yield f"data: {body.decode()}\n\n"
+                    # Promotions may be encoded with any codec; the browser always gets JSON
+                    promotion = codec.decode(body, props.content_type, props.headers)
+                    yield f"data: {json.dumps(promotion)}\n\n"
                     consumer.channel.basic_ack(delivery_tag=method.delivery_tag)
                 else:
                     time.sleep(1)  # No message, wait a bit before checking again
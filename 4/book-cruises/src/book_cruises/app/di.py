@@ -8,6 +8,7 @@ def __configure_dependencies(binder: inject.Binder) -> None:
         host=config.RABBITMQ_HOST,
         username=config.RABBITMQ_USERNAME,
         password=config.RABBITMQ_PASSWORD,
+        content_type=config.MESSAGE_CONTENT_TYPE,
     )
 
     consumer = Consumer(
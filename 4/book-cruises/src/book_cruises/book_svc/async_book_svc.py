@@ -0,0 +1,485 @@
+"""asyncio implementation of the Book Service.
+
+Serves the same routes as the Flask app in `book_svc.py`, but every
+reservation flow and SSE stream is a coroutine instead of a thread: the
+database is reached through asyncpg, RabbitMQ through aio-pika and the other
+services through a shared aiohttp client session.
+
+Requires the optional `async` dependencies (`pip install book-cruises[async]`)
+and is started with `book-svc-async`.
+"""
+
+import asyncio
+import json
+from typing import Awaitable, Callable, Dict
+
+import aio_pika
+import inject
+from aiohttp import ClientSession, ClientTimeout, TCPConnector, web
+
+from book_cruises.commons.utils import config, logger
+from book_cruises.commons.database.async_database import AsyncDatabase
+from book_cruises.commons.messaging import codec
+from book_cruises.commons.domains import (
+    Reservation,
+    ReservationDTO,
+    Payment,
+    Ticket,
+)
+from book_cruises.commons.domains.repositories.async_itinerary_repository import (
+    AsyncItineraryRepository,
+)
+from book_cruises.commons.domains.repositories.async_reservation_repository import (
+    AsyncReservationRepository,
+)
+from .async_di import configure_dependencies
+
+RESERVATION_STATUS_INTERVAL = 5  # Seconds between reservation status events
+
+
+class AsyncBookSvc:
+
+    @inject.autoparams()
+    def __init__(self, database: AsyncDatabase):
+
+        self.__database: AsyncDatabase = database
+
+        self.__reservation_repository = AsyncReservationRepository()
+        self.__itinerary_repository = AsyncItineraryRepository()
+
+        self.__cached_reservations: Dict[str, Reservation] = {}
+
+        self.__clients_promotions_queue: Dict[str, asyncio.Queue] = {}
+
+        self.__connection: aio_pika.abc.AbstractRobustConnection = None
+        self.__channel: aio_pika.abc.AbstractChannel = None
+        self.__http: ClientSession = None
+
+    async def start(self) -> None:
+        logger.info("Book Service initialized (async)")
+        await self.__database.initialize()
+
+        self.__http = ClientSession(
+            timeout=ClientTimeout(total=config.REQUEST_TIMEOUT),
+            connector=TCPConnector(limit=config.HTTP_CLIENT_MAX_CONNECTIONS),
+        )
+
+        # A robust connection reconnects and restores its queues and consumers by itself
+        self.__connection = await aio_pika.connect_robust(
+            host=config.RABBITMQ_HOST,
+            login=config.RABBITMQ_USERNAME,
+            password=config.RABBITMQ_PASSWORD,
+        )
+        self.__channel = await self.__connection.channel()
+        await self.__channel.set_qos(prefetch_count=config.ASYNC_CONSUMER_PREFETCH_COUNT)
+
+        await self.__config_broker()
+
+        await self.__register_callback(config.REFUSED_PAYMENT_QUEUE, self.__process_payment)
+        await self.__register_callback(
+            config.APPROVED_PAYMENT_BOOK_SVC_QUEUE, self.__process_payment
+        )
+        await self.__register_callback(config.TICKET_GENERATED_QUEUE, self.__process_ticket)
+        await self.__register_callback(config.PROMOTIONS_QUEUE, self.__process_promotion)
+
+    async def stop(self) -> None:
+        if self.__connection:
+            await self.__connection.close()
+        if self.__http:
+            await self.__http.close()
+        await self.__database.close_connection()
+
+    async def get_itineraries(self, itinerary_data: dict) -> tuple[dict, int]:
+        async with self.__http.post(
+            f"http://{config.ITINERARY_SVC_WEB_SERVER_HOST}:{config.ITINERARY_SVC_WEB_SERVER_PORT}/itinerary/get-itineraries",
+            json=itinerary_data,
+        ) as response:
+            body = await response.json()
+        logger.debug(f"Itinerary service response: {body}")
+        return body, response.status
+
+    async def create_reservation(self, reservation_dto: ReservationDTO) -> dict:
+        reservation: Reservation = await self.__reservation_repository.create_reservation(
+            reservation_dto
+        )
+
+        # Store the reservation status
+        self.__add_new_reservation(reservation)
+
+        # Publish the reservation data to the RESERVE_CREATED_QUEUE
+        await self.__publish(config.RESERVE_CREATED_QUEUE, reservation.model_dump())
+
+        logger.debug(
+            f"Published reservation {reservation.model_dump()} to {config.RESERVE_CREATED_QUEUE}"
+        )
+
+        # Solicita link de pagamento ao MS Pagamento
+        async with self.__http.post(
+            f"http://{config.PAYMENT_SVC_WEB_SERVER_HOST}:{config.PAYMENT_SVC_WEB_SERVER_PORT}/payment/link",
+            json=reservation.model_dump(),
+        ) as payment_res:
+            payment = await payment_res.json()
+
+        logger.debug(f"Payment service response: {payment}")
+
+        return payment
+
+    def get_payment_status(self, reservation_id):
+        if not reservation_id in self.__cached_reservations:
+            return {"status": "error", "message": "Reservation ID not found"}
+
+        reservation = self.__cached_reservations[reservation_id]
+
+        match reservation.payment_status:
+            case Payment.APPROVED:
+                return {"status": Payment.APPROVED, "message": "Payment approved"}
+            case Payment.REFUSED:
+                return {"status": Payment.REFUSED, "message": "Payment refused"}
+            case Payment.PENDING:
+                return {"status": Payment.PENDING, "message": "Waiting for payment"}
+            case _:
+                return {"status": "error", "message": "Unknown status"}
+
+    def get_ticket_status(self, reservation_id):
+        if not reservation_id in self.__cached_reservations:
+            return {"status": "error", "message": "Reservation ID not found"}
+
+        reservation = self.__cached_reservations[reservation_id]
+
+        match reservation.ticket_status:
+            case Ticket.GENERATED:
+                return {"status": Ticket.GENERATED, "message": "Ticket generated"}
+            case Ticket.PENDING:
+                return {"status": Ticket.PENDING, "message": "Waiting for ticket"}
+            case _:
+                return {"status": "error", "message": "Unknown status"}
+
+    async def cancel_reservation(self, reservation_id: str) -> None:
+        """
+        Cancels a reservation by its ID.
+        This method updates the reservation status to 'cancelled' and notifies the user.
+        """
+        if reservation_id not in self.__cached_reservations:
+            logger.error(f"Reservation ID {reservation_id} not found.")
+            return
+        reservation = self.__cached_reservations[reservation_id]
+        # Returning the cabinets and cancelling the reservation must succeed or fail together
+        async with self.__database.transaction():
+            if reservation.payment_status == Payment.APPROVED:
+                await self.__itinerary_repository.update_remaining_cabinets(
+                    reservation.itinerary_id,
+                    -1*reservation.number_of_cabinets,
+                    -1*reservation.number_of_passengers,
+                )
+            await self.__reservation_repository.update_status(reservation_id, Reservation.CANCELLED)
+        reservation.reservation_status = Reservation.CANCELLED
+
+        logger.info(f"Reservation with id '{reservation_id}' has been '{Reservation.CANCELLED}'.")
+
+    def create_client_promotion_queue(self, client_id: str) -> asyncio.Queue:
+        """
+        Creates a queue for client promotions if it doesn't already exist.
+        This allows the service to send promotions to specific clients.
+        """
+        if client_id not in self.__clients_promotions_queue:
+            self.__clients_promotions_queue[client_id] = asyncio.Queue()
+            logger.info(f"Created promotion queue for client '{client_id}'")
+        else:
+            logger.warning(f"Promotion queue for client '{client_id}' already exists")
+
+        return self.__clients_promotions_queue[client_id]
+
+    def remove_client_promotion_queue(self, client_id: str) -> None:
+        """
+        Removes the client's promotion queue.
+        This is useful when a client no longer needs to receive promotions.
+        """
+        if client_id in self.__clients_promotions_queue:
+            del self.__clients_promotions_queue[client_id]
+            logger.info(f"Removed promotion queue for client '{client_id}'")
+        else:
+            logger.warning(f"No promotion queue found for client '{client_id}'")
+
+    def __add_new_reservation(self, reservation: Reservation) -> None:
+        # Store with string key for consistent access
+        reservation_key = str(reservation.id)
+        self.__cached_reservations[reservation_key] = reservation
+        logger.info(f"Added new reservation: {reservation_key}")
+
+    def __update_reservation_payment_status(self, payment: Payment) -> None:
+        reservation_key = str(payment.reservation_id)
+        if not reservation_key in self.__cached_reservations:
+            logger.error(
+                f"Reservation ID '{reservation_key}' not found in cached reservations: {self.__cached_reservations.keys()}"
+            )
+            return
+        self.__cached_reservations[reservation_key].payment_status = payment.status
+        logger.debug(
+            f"Update payment status with reservation_id '{reservation_key}' -> '{payment.status}'"
+        )
+
+    async def __process_ticket(self, ticket_data: dict) -> None:
+        ticket: Ticket = Ticket(**ticket_data)
+        reservation_key = str(ticket.payment.reservation_id)
+        if reservation_key not in self.__cached_reservations:
+            logger.error(
+                f"Reservation ID '{reservation_key}' not found in cached reservations: {self.__cached_reservations.keys()}"
+            )
+            return
+        self.__cached_reservations[reservation_key].ticket_status = ticket.status
+        logger.info(
+            f"Update ticket status with reservation_id '{reservation_key}' -> '{ticket.status}'"
+        )
+
+    async def __process_payment(self, payment_data: dict) -> None:
+        payment: Payment = Payment(**payment_data)
+        reservation = self.__cached_reservations.get(str(payment.reservation_id))
+        if reservation is None:
+            logger.error(
+                f"Reservation ID '{payment.reservation_id}' not found in cached reservations: {self.__cached_reservations.keys()}"
+            )
+            return
+        match payment.status:
+            case Payment.APPROVED:
+                self.__update_reservation_payment_status(payment)
+                async with self.__database.transaction():
+                    await self.__reservation_repository.update_status(
+                        payment.reservation_id, Reservation.APPROVED
+                    )
+                    await self.__itinerary_repository.update_remaining_cabinets(
+                        payment.itinerary_id,
+                        reservation.number_of_cabinets,
+                        reservation.number_of_passengers,
+                    )
+            case Payment.REFUSED:
+                self.__update_reservation_payment_status(payment)
+                await self.cancel_reservation(str(payment.reservation_id))
+            case _:
+                logger.error(f"Unknown status: '{payment.status}'")
+
+    async def __process_promotion(self, promotion_data: dict) -> None:
+        """
+        Process a promotion message and send it each client that has subscribed to promotions.
+        """
+        logger.info(f"Promotion received: {promotion_data}")
+
+        for client_id, queue in self.__clients_promotions_queue.items():
+            queue.put_nowait(promotion_data)
+            logger.info(f"Promotion sent to client {client_id}")
+
+    async def __publish(self, routing_key: str, message: dict, exchange: str = "") -> None:
+        target = (
+            self.__channel.default_exchange
+            if not exchange
+            else await self.__channel.get_exchange(exchange, ensure=False)
+        )
+        await target.publish(
+            aio_pika.Message(
+                body=codec.encode(message, config.MESSAGE_CONTENT_TYPE),
+                content_type=config.MESSAGE_CONTENT_TYPE,
+                headers=codec.headers(),
+                delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+            ),
+            routing_key=routing_key,
+        )
+
+    async def __register_callback(
+        self, queue_name: str, callback: Callable[[dict], Awaitable[dict]]
+    ) -> None:
+        """Consumes an existing queue; each message is handled in its own task."""
+        queue = await self.__channel.get_queue(queue_name, ensure=False)
+
+        async def wrapper(message: aio_pika.abc.AbstractIncomingMessage):
+            try:
+                message_decoded = codec.decode(message.body, message.content_type, message.headers)
+            except codec.CodecError as e:
+                logger.error(f"Failed to decode message: {e}")
+                await message.ack()
+                return
+
+            try:
+                response = await callback(message_decoded)
+            except Exception:
+                logger.error(f"Error processing message from '{queue_name}'", exc_info=True)
+                # Same policy as the sync consumer: one more attempt, then drop (or dead-letter)
+                if message.redelivered:
+                    logger.error(f"Message from '{queue_name}' failed again after redelivery, rejecting it")
+                await message.reject(requeue=not message.redelivered)
+                return
+
+            if message.reply_to and message.correlation_id:
+                await self.__channel.default_exchange.publish(
+                    aio_pika.Message(
+                        body=codec.encode(response, message.content_type),
+                        correlation_id=message.correlation_id,
+                        content_type=message.content_type,
+                        headers=codec.headers(),
+                    ),
+                    routing_key=message.reply_to,
+                )
+
+            await message.ack()
+
+        await queue.consume(wrapper)
+
+    async def __config_broker(self) -> None:
+        app_exchange = await self.__channel.declare_exchange(
+            config.APP_EXCHANGE, aio_pika.ExchangeType.DIRECT
+        )
+        promotions_exchange = await self.__channel.declare_exchange(
+            config.PROMOTIONS_EXCHANGE, aio_pika.ExchangeType.TOPIC
+        )
+
+        for queue_name in (
+            config.RESERVE_CREATED_QUEUE,
+            config.APPROVED_PAYMENT_TICKET_QUEUE,
+            config.APPROVED_PAYMENT_BOOK_SVC_QUEUE,
+            config.REFUSED_PAYMENT_QUEUE,
+            config.TICKET_GENERATED_QUEUE,
+            config.QUERY_RESERVATION_QUEUE,
+            config.PROMOTIONS_QUEUE,
+        ):
+            await self.__channel.declare_queue(queue_name)
+
+        approved_book_queue = await self.__channel.get_queue(
+            config.APPROVED_PAYMENT_BOOK_SVC_QUEUE
+        )
+        await approved_book_queue.bind(
+            app_exchange, routing_key=config.APPROVED_PAYMENT_ROUTING_KEY
+        )
+        approved_ticket_queue = await self.__channel.get_queue(
+            config.APPROVED_PAYMENT_TICKET_QUEUE
+        )
+        await approved_ticket_queue.bind(
+            app_exchange, routing_key=config.APPROVED_PAYMENT_ROUTING_KEY
+        )
+        promotions_queue = await self.__channel.get_queue(config.PROMOTIONS_QUEUE)
+        await promotions_queue.bind(
+            promotions_exchange,
+            routing_key="#",  # Bind to all routing keys
+        )
+
+
+def create_web_app(book_svc: AsyncBookSvc) -> web.Application:
+    routes = web.RouteTableDef()
+
+    async def open_event_stream(request: web.Request) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        return response
+
+    @routes.post("/book/get-itineraries")
+    async def get_itineraries(request: web.Request):
+        """Retrieves available itineraries from the itinerary service."""
+        itinerary_data = await request.json()
+        logger.info(f"Received itinerary request: {itinerary_data}")
+        body, status = await book_svc.get_itineraries(itinerary_data)
+        return web.json_response(body, status=status)
+
+    @routes.post("/book/create-reservation")
+    async def create_reservation(request: web.Request):
+        """Creates a reservation and returns the payment link from the payment service."""
+        data = await request.json()
+        logger.debug(f"Creating reservation with data: {data}")
+        reservation_dto = ReservationDTO(
+            client_id=data["client_id"],
+            number_of_passengers=data["num_of_passengers"],
+            number_of_cabinets=data["num_of_cabinets"],
+            itinerary_id=data["itinerary_id"],
+            total_price=data["total_price"],
+        )
+        result = await book_svc.create_reservation(reservation_dto)
+        return web.json_response(result, status=200)
+
+    @routes.get("/book/reservation-status")
+    async def get_reservation_status(request: web.Request):
+        """Streams the payment and ticket status of a reservation as Server-Sent Events."""
+        reservation_id = request.query.get("reservation_id")
+        if not reservation_id:
+            return web.json_response(
+                {"status": "error", "message": "Reservation ID is required"}, status=400
+            )
+
+        reservation_id_str = str(reservation_id)
+        response = await open_event_stream(request)
+        try:
+            while True:
+                payment_status = book_svc.get_payment_status(reservation_id_str)
+                ticket_status = book_svc.get_ticket_status(reservation_id_str)
+                logger.info(
+                    f"Payment status for reservation {reservation_id_str}: {payment_status}")
+                await response.write(json.dumps({
+                    "payment_status": payment_status,
+                    "ticket_status": ticket_status
+                }).encode())
+
+                await asyncio.sleep(RESERVATION_STATUS_INTERVAL)
+        except ConnectionResetError:
+            pass
+        finally:
+            # aiohttp cancels the handler when the client goes away
+            logger.info(f"Client disconnected from reservation status stream for {reservation_id_str}")
+        return response
+
+    @routes.delete("/book/cancel-reservation")
+    async def cancel_reservation(request: web.Request):
+        """Cancels a reservation by its ID."""
+        reservation_id = (await request.json()).get("reservation_id")
+        if not reservation_id:
+            return web.json_response(
+                {"status": "error", "message": "Reservation ID is required"}, status=400
+            )
+
+        await book_svc.cancel_reservation(reservation_id)
+        return web.json_response({"status": "success", "message": "Reservation cancelled"}, status=200)
+
+    @routes.get("/book/promotions-stream")
+    async def get_promotions(request: web.Request):
+        """Streams every promotion received to the client as Server-Sent Events."""
+        client_id = request.query.get("client_id")
+        if not client_id:
+            return web.json_response(
+                {"status": "error", "message": "Client ID is required"}, status=400
+            )
+
+        queue = book_svc.create_client_promotion_queue(client_id)
+        response = await open_event_stream(request)
+        try:
+            while True:
+                await response.write(json.dumps(await queue.get()).encode())
+        except ConnectionResetError:
+            pass
+        finally:
+            logger.info(f"Client {client_id} disconnected from promotions stream")
+            book_svc.remove_client_promotion_queue(client_id)
+        return response
+
+    @routes.get("/health")
+    async def health_check(request: web.Request):
+        return web.json_response({"status": "ok"}, status=200)
+
+    app = web.Application()
+    app.add_routes(routes)
+
+    async def on_startup(app: web.Application) -> None:
+        await book_svc.start()
+
+    async def on_cleanup(app: web.Application) -> None:
+        await book_svc.stop()
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+def main() -> None:
+    configure_dependencies()
+
+    book_svc = AsyncBookSvc()
+
+    app = create_web_app(book_svc)
+    web.run_app(
+        app,
+        port=config.BOOK_SVC_WEB_SERVER_PORT,
+        host=config.BOOK_SVC_WEB_SERVER_HOST,
+    )
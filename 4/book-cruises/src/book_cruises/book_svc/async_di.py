@@ -0,0 +1,23 @@
+import inject
+from book_cruises.commons.database.async_database import AsyncDatabase
+from book_cruises.commons.utils import logger, config
+
+def __configure_dependencies(binder: inject.Binder) -> None:
+
+    database = AsyncDatabase(
+        host=config.DB_HOST,
+        database=config.DB_NAME,
+        user=config.DB_USER,
+        password=config.DB_PASSWORD,
+        port=config.DB_PORT,
+        min_connections=config.DB_POOL_MIN_SIZE,
+        max_connections=config.DB_POOL_MAX_SIZE,
+        pool_timeout=config.DB_POOL_TIMEOUT,
+    )
+
+    binder.bind(AsyncDatabase, database)
+
+def configure_dependencies():
+    # The pool is opened by AsyncBookSvc.start(), inside the server's event loop
+    inject.configure(__configure_dependencies)
+    logger.info("Dependencies initialized")
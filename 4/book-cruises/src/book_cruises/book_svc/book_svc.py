@@ -10,6 +10,7 @@ from flask import Flask, Response, request, jsonify, stream_with_context
 
 from book_cruises.commons.utils import config, logger
 from book_cruises.commons.messaging import Consumer, Producer
+from book_cruises.commons.database import Database
 from book_cruises.commons.domains import (
     Reservation,
     ReservationDTO,
@@ -26,10 +27,11 @@ from .di import configure_dependencies
 class BookSvc:
 
     @inject.autoparams()
-    def __init__(self, consumer: Consumer, producer: Producer):
+    def __init__(self, consumer: Consumer, producer: Producer, database: Database):
 
         self.__consumer: Consumer = consumer
         self.__producer: Producer = producer
+        self.__database: Database = database
 
         self.__reservation_repository: ReservationRepository = ReservationRepository()
         self.__itinerary_repository: ItineraryRepository = ItineraryRepository()
@@ -44,14 +46,23 @@ class BookSvc:
         logger.info("Book Service initialized")
         self.__config_broker()
 
+        # Messages about the same reservation are processed in order, others in parallel
         self.__consumer.register_callback(
-            config.REFUSED_PAYMENT_QUEUE, self.__process_payment
+            config.REFUSED_PAYMENT_QUEUE,
+            self.__process_payment,
+            order_key=lambda routing_key, payment: str(payment.get("reservation_id")),
         )
-        self.__consumer.register_callback(
-            config.APPROVED_PAYMENT_BOOK_SVC_QUEUE, self.__process_payment
+        # Approvals are written in batches: one transaction for many payments
+        self.__consumer.register_batch_callback(
+            config.APPROVED_PAYMENT_BOOK_SVC_QUEUE,
+            self.__process_approved_payments,
+            max_batch_size=config.CONSUMER_BATCH_SIZE,
+            max_wait_ms=config.CONSUMER_BATCH_WAIT_MS,
         )
         self.__consumer.register_callback(
-            config.TICKET_GENERATED_QUEUE, self.__process_ticket
+            config.TICKET_GENERATED_QUEUE,
+            self.__process_ticket,
+            order_key=lambda routing_key, ticket: str(ticket.get("payment", {}).get("reservation_id")),
         )
         self.__consumer.register_callback(
             config.PROMOTIONS_QUEUE, self.__process_promotion
@@ -123,15 +134,17 @@ class BookSvc:
         if reservation_id not in self.__cached_reservations:
             logger.error(f"Reservation ID {reservation_id} not found.")
             return
-        if self.__cached_reservations[reservation_id].payment_status == Payment.APPROVED:
-            num_cabinets_to_update = -1*self.__cached_reservations[reservation_id].number_of_cabinets
-            num_passengers_to_update = -1*self.__cached_reservations[reservation_id].number_of_passengers
-            self.__itinerary_repository.update_remaining_cabinets(
-                self.__cached_reservations[reservation_id].itinerary_id,
-                num_cabinets_to_update,
-                num_passengers_to_update,
-            )
-        self.__reservation_repository.update_status(reservation_id, Reservation.CANCELLED)
+        # Returning the cabinets and cancelling the reservation must succeed or fail together
+        with self.__database.transaction():
+            if self.__cached_reservations[reservation_id].payment_status == Payment.APPROVED:
+                num_cabinets_to_update = -1*self.__cached_reservations[reservation_id].number_of_cabinets
+                num_passengers_to_update = -1*self.__cached_reservations[reservation_id].number_of_passengers
+                self.__itinerary_repository.update_remaining_cabinets(
+                    self.__cached_reservations[reservation_id].itinerary_id,
+                    num_cabinets_to_update,
+                    num_passengers_to_update,
+                )
+            self.__reservation_repository.update_status(reservation_id, Reservation.CANCELLED)
         self.__cached_reservations[reservation_id].reservation_status = Reservation.CANCELLED
 
         logger.info(f"Reservation with id '{reservation_id}' has been '{Reservation.CANCELLED}'.")
@@ -223,25 +236,77 @@ class BookSvc:
                 num_passengers_to_update = self.__cached_reservations[
                     reservation_key
                 ].number_of_passengers
-                self.__reservation_repository.update_status(
-                    payment.reservation_id, Reservation.APPROVED
-                )
-                self.__itinerary_repository.update_remaining_cabinets(
-                    payment.itinerary_id, num_cabinets_to_update, num_passengers_to_update
-                )
+                with self.__database.transaction():
+                    self.__reservation_repository.update_status(
+                        payment.reservation_id, Reservation.APPROVED
+                    )
+                    self.__itinerary_repository.update_remaining_cabinets(
+                        payment.itinerary_id, num_cabinets_to_update, num_passengers_to_update
+                    )
             case Payment.REFUSED:
                 self.__update_reservation_payment_status(payment)
                 self.cancel_reservation(str(payment.reservation_id))
             case _:
                 logger.error(f"Unknown status: '{payment.status}'")
 
+    def __process_approved_payments(self, payments_data: list[dict]) -> None:
+        """
+        Approves a batch of reservations and takes their cabinets from the itineraries
+        in a single transaction. Only reservations that got their cabinets are approved.
+        """
+        approved: dict[int, Payment] = {}
+        cabinet_requests: list[tuple[int, int, int, int]] = []
+        for payment_data in payments_data:
+            payment: Payment = Payment(**payment_data)
+            if payment.status != Payment.APPROVED:
+                # Only approvals are routed here. Nothing is written for anything else: the batch
+                # must leave no changes behind when it raises, and items are retried one by one
+                logger.error(
+                    f"Payment for reservation ID '{payment.reservation_id}' with status '{payment.status}' "
+                    f"on the approved payments queue; dropped"
+                )
+                continue
+            if payment.reservation_id in approved:
+                continue  # Redelivered duplicate: its cabinets are already requested in this batch
+            reservation = self.__cached_reservations.get(str(payment.reservation_id))
+            if reservation is None:
+                logger.error(
+                    f"Reservation ID '{payment.reservation_id}' not found in cached reservations: {self.__cached_reservations.keys()}"
+                )
+                continue
+            approved[payment.reservation_id] = payment
+            cabinet_requests.append(
+                (
+                    payment.reservation_id,
+                    payment.itinerary_id,
+                    reservation.number_of_cabinets,
+                    reservation.number_of_passengers,
+                )
+            )
+
+        if not approved:
+            return
+        with self.__database.transaction():
+            granted = self.__itinerary_repository.update_remaining_cabinets_many(cabinet_requests)
+            if granted:
+                self.__reservation_repository.update_statuses(
+                    {reservation_id: Reservation.APPROVED for reservation_id in granted}
+                )
+        # The cache only reflects what was committed
+        for reservation_id in granted:
+            self.__update_reservation_payment_status(approved[reservation_id])
+        for reservation_id in approved.keys() - set(granted):
+            logger.error(f"Reservation ID '{reservation_id}' not approved: not enough cabinets left")
+        logger.info(f"Approved {len(granted)} of {len(approved)} reservation(s) in one transaction")
+
     def __process_promotion(self, promotion_data: dict) -> None:
         """
         Process a promotion message and send it each client that has subscribed to promotions.
         """
         logger.info(f"Promotion received: {promotion_data}")
 
-        for client_id, queue in self.__clients_promotions_queue.items():
+        # Copied because request threads add and remove clients concurrently
+        for client_id, queue in list(self.__clients_promotions_queue.items()):
             if queue:
                 queue.put(promotion_data)
                 logger.info(f"Promotion sent to client {client_id}")
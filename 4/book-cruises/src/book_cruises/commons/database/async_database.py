@@ -0,0 +1,116 @@
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+
+import asyncpg
+from book_cruises.commons.utils import logger
+
+MAX_INACTIVE_CONNECTION_LIFETIME = 300  # Seconds before an idle pooled connection is closed
+
+
+class AsyncDatabase:
+    """asyncio counterpart of `Database`, backed by an asyncpg connection pool.
+
+    Queries use asyncpg placeholders ($1, $2, ...). Inside `transaction()` every
+    query of the current task runs on the same connection; outside it each query
+    borrows a connection just for itself.
+    """
+
+    def __init__(
+        self,
+        host="localhost",
+        database="book-cruises",
+        user="user",
+        password="password",
+        port=5432,
+        min_connections=1,
+        max_connections=10,
+        pool_timeout=5,
+    ):
+        self.host = host
+        self.database = database
+        self.user = user
+        self.password = password
+        self.port = port
+        self.min_connections = min_connections
+        self.max_connections = max_connections
+        self.pool_timeout = pool_timeout
+        self.pool: asyncpg.Pool = None
+        self.__connection: ContextVar = ContextVar("connection", default=None)
+
+    async def initialize(self):
+        try:
+            self.pool = await asyncpg.create_pool(
+                host=self.host,
+                database=self.database,
+                user=self.user,
+                password=self.password,
+                port=self.port,
+                min_size=self.min_connections,
+                max_size=self.max_connections,
+                max_inactive_connection_lifetime=MAX_INACTIVE_CONNECTION_LIFETIME,
+            )
+            logger.info(
+                f"PostgreSQL initialized with database: {self.database} "
+                f"(async pool of {self.min_connections}-{self.max_connections} connections)"
+            )
+        except Exception as e:
+            logger.error(f"Failed to initialize PostgreSQL: {e}")
+            raise e
+
+    @asynccontextmanager
+    async def transaction(self):
+        """Runs the block in one transaction on a connection owned by the current task.
+
+        Commits when the block ends and rolls back if it raises. Nested calls
+        join the outer transaction.
+        """
+        connection = self.__connection.get()
+        if connection is not None:
+            yield connection
+            return
+
+        async with self.pool.acquire(timeout=self.pool_timeout) as connection:
+            token = self.__connection.set(connection)
+            try:
+                async with connection.transaction():
+                    yield connection
+            finally:
+                self.__connection.reset(token)
+
+    @asynccontextmanager
+    async def __acquire(self):
+        connection = self.__connection.get()
+        if connection is not None:
+            yield connection
+            return
+        async with self.pool.acquire(timeout=self.pool_timeout) as connection:
+            yield connection
+
+    async def fetch(self, query: str, *params) -> list[dict]:
+        """Runs a query that returns rows and gives them back as dicts."""
+        try:
+            async with self.__acquire() as connection:
+                rows = await connection.fetch(query, *params)
+            logger.debug(f"Query returned data: {len(rows)} row(s).")
+            return [dict(row) for row in rows]
+        except Exception as e:
+            logger.error(f"Failed to execute query: {e}")
+            raise
+
+    async def execute(self, query: str, *params) -> int:
+        """Runs a statement without result rows and returns the number of affected rows."""
+        try:
+            async with self.__acquire() as connection:
+                status = await connection.execute(query, *params)
+        except Exception as e:
+            logger.error(f"Failed to execute query: {e}")
+            raise
+        # asyncpg returns the command tag, e.g. "UPDATE 3"
+        rowcount = int(status.split()[-1]) if status.split()[-1].isdigit() else 0
+        logger.debug(f"Query executed: {rowcount} row(s) affected (no data returned).")
+        return rowcount
+
+    async def close_connection(self):
+        if self.pool:
+            await self.pool.close()
+            logger.info("PostgreSQL connection pool closed.")
@@ -1,9 +1,27 @@
+import time
+import threading
+from contextlib import contextmanager
+
 import psycopg2
+import psycopg2.extras
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import PoolError, ThreadedConnectionPool
 from book_cruises.commons.utils import logger
 
+HEALTH_CHECK_INTERVAL = 30  # Seconds a pooled connection may sit idle before it is pinged on checkout
+CONNECTION_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
 
 class Database:
+    """Thread-safe PostgreSQL access backed by a connection pool.
+
+    Every thread works on its own connection. Inside `transaction()` all
+    queries of the calling thread share one checked-out connection, committed
+    at the end of the block or rolled back on error. Outside a transaction each
+    `execute_query` checks out a connection, runs as a single transaction and
+    gives the connection back. Broken connections are dropped and replaced.
+    """
+
     def __init__(
         self,
         host="localhost",
@@ -11,32 +29,141 @@ class Database:
         user="user",
         password="password",
         port=5432,
+        min_connections=1,
+        max_connections=10,
+        pool_timeout=5,
     ):
         self.host = host
         self.database = database
         self.user = user
         self.password = password
         self.port = port
-        self.connection = None
+        self.min_connections = min_connections
+        self.max_connections = max_connections
+        self.pool_timeout = pool_timeout
+        self.pool = None
+        # ThreadedConnectionPool fails instead of waiting when it is exhausted
+        self.__slots = threading.BoundedSemaphore(max_connections)
+        self.__last_used = {}  # connection -> time it was given back to the pool
+        self.__local = threading.local()
 
     def initialize(self):
         try:
-            # Establish connection to PostgreSQL
-            self.connection = psycopg2.connect(
+            self.pool = ThreadedConnectionPool(
+                self.min_connections,
+                self.max_connections,
                 host=self.host,
                 database=self.database,
                 user=self.user,
                 password=self.password,
                 port=self.port,
             )
-            logger.info(f"PostgreSQL initialized with database: {self.database}")
+            logger.info(
+                f"PostgreSQL initialized with database: {self.database} "
+                f"(pool of {self.min_connections}-{self.max_connections} connections)"
+            )
         except Exception as e:
             logger.error(f"Failed to initialize PostgreSQL: {e}")
             raise e
 
+    def __is_healthy(self, connection) -> bool:
+        if connection.closed:
+            return False
+        last_used = self.__last_used.get(connection)
+        if last_used is not None and time.monotonic() - last_used < HEALTH_CHECK_INTERVAL:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connection.rollback()
+            return True
+        except CONNECTION_ERRORS:
+            return False
+
+    def __checkout(self):
+        if not self.__slots.acquire(timeout=self.pool_timeout):
+            raise PoolError(f"No database connection available after {self.pool_timeout}s")
+        try:
+            connection = self.pool.getconn()
+            if not self.__is_healthy(connection):
+                logger.warning("Discarding broken database connection.")
+                self.__last_used.pop(connection, None)
+                self.pool.putconn(connection, close=True)
+                connection = self.pool.getconn()
+            return connection
+        except Exception:
+            self.__slots.release()
+            raise
+
+    def __release(self, connection, broken=False):
+        try:
+            if broken or connection.closed:
+                self.__last_used.pop(connection, None)
+                self.pool.putconn(connection, close=True)
+            else:
+                self.__last_used[connection] = time.monotonic()
+                self.pool.putconn(connection)
+        finally:
+            self.__slots.release()
+
+    @contextmanager
+    def transaction(self):
+        """Runs the block in one transaction on a connection owned by the calling thread.
+
+        Commits when the block ends and rolls back if it raises. Nested calls
+        join the outer transaction.
+        """
+        connection = getattr(self.__local, "connection", None)
+        if connection is not None:
+            yield connection
+            return
+
+        connection = self.__checkout()
+        self.__local.connection = connection
+        broken = False
+        try:
+            yield connection
+            connection.commit()
+            logger.debug("Transaction committed.")
+        except Exception:
+            # Errors such as serialization failures or cancelled statements leave the connection
+            # usable; only a connection that is closed or cannot roll back is discarded
+            try:
+                if not connection.closed:
+                    connection.rollback()
+                    logger.debug("Transaction rolled back.")
+            except CONNECTION_ERRORS:
+                broken = True
+            raise
+        finally:
+            self.__local.connection = None
+            self.__release(connection, broken)
+
     def execute_query(self, query: str, params=None):
+        if getattr(self.__local, "connection", None) is not None:
+            return self.__execute(self.__local.connection, query, params)
+
+        # Outside a transaction the query is its own transaction. If no connection could be
+        # checked out, or the one checked out turns out to be dropped by the server (restart,
+        # idle timeout) before the commit, nothing was applied and the query is retried once.
+        # Other operational errors, and any failure during the commit, are raised as they are.
+        for attempt in range(2):
+            connection = None
+            committing = False
+            try:
+                with self.transaction() as connection:
+                    result = self.__execute(connection, query, params)
+                    committing = True
+                return result
+            except CONNECTION_ERRORS as e:
+                lost = connection is None or (connection.closed and not committing)
+                if attempt or not lost:
+                    raise
+                logger.warning(f"Lost database connection, reconnecting: {e}")
+
+    def __execute(self, connection, query: str, params=None):
         try:
-            with self.connection.cursor(cursor_factory=RealDictCursor) as cursor:
+            with connection.cursor(cursor_factory=RealDictCursor) as cursor:
                 cursor.execute(query, params)
 
                 if cursor.description:
@@ -48,39 +175,57 @@ class Database:
                     return cursor.rowcount
         except Exception as e:
             logger.error(f"Failed to execute query: {e}")
-            self.connection.rollback()
             raise
 
     def commit(self):
-        """Commits the current transaction."""
+        """Commits the calling thread's open transaction, if any.
+
+        Queries run outside `transaction()` are already committed.
+        """
+        connection = getattr(self.__local, "connection", None)
+        if connection is None:
+            return
         try:
-            self.connection.commit()
+            connection.commit()
             logger.debug("Transaction committed.")
         except Exception as e:
             logger.error(f"Failed to commit transaction: {e}")
             raise
-    
+
     def rollback(self):
-        """Rolls back the current transaction."""
+        """Rolls back the calling thread's open transaction, if any."""
+        connection = getattr(self.__local, "connection", None)
+        if connection is None:
+            return
         try:
-            self.connection.rollback()
+            connection.rollback()
             logger.debug("Transaction rolled back.")
         except Exception as e:
             logger.error(f"Failed to roll back transaction: {e}")
             raise
 
-    def execute_many(self, query: str, data: list):
+    def execute_many(self, query: str, data: list, template: str = None, fetch: bool = False):
+        """Expands `data` into the query's single `VALUES %s` and runs it as one statement.
+
+        Joins the calling thread's transaction if one is open. Returns the
+        number of affected rows or, with `fetch`, the rows the query returns.
+        """
+        if not data:
+            return [] if fetch else 0
         try:
-            with self.connection.cursor() as cursor:
-                psycopg2.extras.execute_values(cursor, query, data)
-                self.connection.commit()
+            with self.transaction() as connection:
+                with connection.cursor(cursor_factory=RealDictCursor) as cursor:
+                    result = psycopg2.extras.execute_values(
+                        cursor, query, data, template=template, page_size=len(data), fetch=fetch
+                    )
+                    rowcount = cursor.rowcount
         except Exception as e:
             logger.error(f"Failed to execute many queries: {e}")
-            self.connection.rollback()
             raise e
-        logger.info("Data inserted successfully.")
+        logger.debug(f"Batch executed: {rowcount} row(s) affected.")
+        return result if fetch else rowcount
 
     def close_connection(self):
-        if self.connection:
-            self.connection.close()
-            logger.info("PostgreSQL connection closed.")
+        if self.pool:
+            self.pool.closeall()
+            logger.info("PostgreSQL connection pool closed.")
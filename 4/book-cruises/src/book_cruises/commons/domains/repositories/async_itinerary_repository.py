@@ -0,0 +1,70 @@
+import inject
+
+from book_cruises.commons.domains import Itinerary, ItineraryDTO
+from book_cruises.commons.database.async_database import AsyncDatabase
+from book_cruises.commons.utils import logger
+
+
+class AsyncItineraryRepository:
+    @inject.autoparams()
+    def __init__(self, database: AsyncDatabase):
+        self.__database = database
+
+    async def get_itineraries(self, itinerary_dto: ItineraryDTO) -> list[Itinerary]:
+        query = """
+            SELECT * FROM itineraries
+            WHERE LOWER(arrival_harbor) = LOWER($1)
+                AND departure_date = TO_DATE($2, 'YYYY-MM-DD')
+                AND LOWER(departure_harbor) = LOWER($3)
+        """
+        results = await self.__database.fetch(
+            query,
+            itinerary_dto.arrival_harbor,
+            str(itinerary_dto.departure_date),
+            itinerary_dto.departure_harbor,
+        )
+        if not results:
+            return []
+
+        logger.debug(f"Results: '{results}'")
+
+        return [Itinerary(**row) for row in results]
+
+    async def get_by_id(self, itinerary_id: int) -> Itinerary | None:
+        result = await self.__database.fetch(
+            "SELECT * FROM itineraries WHERE id = $1", itinerary_id
+        )
+
+        if not result:
+            logger.error(f"Itinerary with ID '{itinerary_id}' not found.")
+            return
+
+        itinerary = Itinerary(**result[0])
+
+        logger.debug(f"Retrieved itinerary: '{itinerary}'")
+
+        return itinerary
+
+    async def update_remaining_cabinets(
+        self, itinerary_id: int, requested_cabinets: int, requested_passengers: int
+    ) -> None:
+        query = """
+            UPDATE itineraries
+            SET remaining_cabinets = remaining_cabinets - $2,
+                remaining_passengers = remaining_passengers - $3,
+                updated_at = transaction_timestamp()
+            WHERE id = $1 AND remaining_cabinets >= $2 AND
+                remaining_passengers >= $3
+        """
+        rows_affected = await self.__database.execute(
+            query, itinerary_id, requested_cabinets, requested_passengers
+        )
+
+        if rows_affected == 0:
+            logger.error(
+                f"Failed to update remaining cabinets for itinerary ID '{itinerary_id}'."
+            )
+        else:
+            logger.debug(
+                f"Successfully updated remaining cabinets for itinerary ID '{itinerary_id}'."
+            )
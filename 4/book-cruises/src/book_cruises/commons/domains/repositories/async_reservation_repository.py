@@ -0,0 +1,86 @@
+from decimal import Decimal
+
+import inject
+
+from book_cruises.commons.domains import Reservation, ReservationDTO
+from book_cruises.commons.database.async_database import AsyncDatabase
+from book_cruises.commons.utils import logger
+
+from .async_itinerary_repository import AsyncItineraryRepository
+
+RESERVATION_COLUMNS = """
+    id,
+    client_id,
+    number_of_passengers,
+    number_of_cabinets,
+    itinerary_id,
+    total_price,
+    reservation_status,
+    ticket_status,
+    payment_status
+"""
+
+
+class AsyncReservationRepository:
+    @inject.autoparams()
+    def __init__(self, database: AsyncDatabase):
+        self.__database = database
+        self.__itinerary_repository = AsyncItineraryRepository(database)
+
+    async def __to_reservation(self, row: dict) -> Reservation:
+        # Loading the itinerary here keeps Reservation's validator from querying it synchronously
+        itinerary = await self.__itinerary_repository.get_by_id(row["itinerary_id"])
+        if not itinerary:
+            raise ValueError(f"Itinerary with id {row['itinerary_id']} not found.")
+        return Reservation(**row, itinerary=itinerary)
+
+    async def create_reservation(self, reservation_dto: ReservationDTO) -> Reservation:
+        query = f"""
+            INSERT INTO reservations (
+                client_id,
+                number_of_passengers,
+                number_of_cabinets,
+                itinerary_id,
+                total_price
+            )
+            VALUES ($1, $2, $3, $4, $5)
+            RETURNING {RESERVATION_COLUMNS}
+        """
+        try:
+            rows = await self.__database.fetch(
+                query,
+                reservation_dto.client_id,
+                reservation_dto.number_of_passengers,
+                reservation_dto.number_of_cabinets,
+                reservation_dto.itinerary_id,
+                Decimal(str(reservation_dto.total_price)),  # asyncpg encodes NUMERIC from Decimal
+            )
+            reservation = await self.__to_reservation(rows[0])
+
+            logger.debug(f"Reservation created with ID: '{reservation.id}'")
+
+            return reservation
+        except Exception as e:
+            logger.error(f"Failed to create reservation: {e}")
+            raise
+
+    async def update_status(self, reservation_id: int, new_status: str) -> Reservation:
+        query = f"""
+            UPDATE reservations
+            SET
+                reservation_status = $2,
+                updated_at = transaction_timestamp()
+            WHERE
+                id = $1
+            RETURNING {RESERVATION_COLUMNS}
+        """
+        try:
+            rows = await self.__database.fetch(query, int(reservation_id), new_status)
+            reservation = await self.__to_reservation(rows[0])
+
+            logger.debug(f"Reservation with ID '{reservation.id}' has been updated to -> '{new_status}'.")
+
+            return reservation
+        except Exception as e:
+            logger.error(f"Failed to update reservation status: {e}")
+            raise
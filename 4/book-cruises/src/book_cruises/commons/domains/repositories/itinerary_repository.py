@@ -67,4 +67,70 @@ class ItineraryRepository:
             logger.debug(
                 f"Successfully updated remaining cabinets for itinerary ID '{itinerary_id}'."
             )
-            self.__database.commit()
\ No newline at end of file
+
+    def update_remaining_cabinets_many(self, requests: list[tuple[int, int, int, int]]) -> list[int]:
+        """Takes the cabinets of many reservations with a single statement.
+
+        Each request is (reservation_id, itinerary_id, cabinets, passengers).
+        The requests of an itinerary are granted in order while their running
+        total fits in what remains; the first one that does not fit, and every
+        later one for that itinerary, gets nothing. The itineraries are locked
+        first, so concurrent writers cannot make the totals stale. Returns the
+        ids of the reservations whose cabinets were taken.
+        """
+        query = """
+            WITH requests (reservation_id, itinerary_id, cabinets, passengers, position) AS (
+                VALUES %s
+            ),
+            locked AS (
+                SELECT id, remaining_cabinets, remaining_passengers
+                FROM itineraries
+                WHERE id IN (SELECT itinerary_id FROM requests)
+                ORDER BY id
+                FOR UPDATE
+            ),
+            granted AS (
+                SELECT reservation_id, itinerary_id, cabinets, passengers
+                FROM (
+                    SELECT r.*, l.remaining_cabinets, l.remaining_passengers,
+                        SUM(r.cabinets) OVER w AS total_cabinets,
+                        SUM(r.passengers) OVER w AS total_passengers
+                    FROM requests AS r
+                    JOIN locked AS l ON l.id = r.itinerary_id
+                    WINDOW w AS (PARTITION BY r.itinerary_id ORDER BY r.position)
+                ) AS running
+                WHERE total_cabinets <= remaining_cabinets AND total_passengers <= remaining_passengers
+            ),
+            updated AS (
+                UPDATE itineraries AS i
+                SET remaining_cabinets = i.remaining_cabinets - g.cabinets,
+                    remaining_passengers = i.remaining_passengers - g.passengers,
+                    updated_at = transaction_timestamp()
+                FROM (
+                    SELECT itinerary_id, SUM(cabinets) AS cabinets, SUM(passengers) AS passengers
+                    FROM granted
+                    GROUP BY itinerary_id
+                ) AS g
+                WHERE i.id = g.itinerary_id
+            )
+            SELECT reservation_id FROM granted
+        """
+        rows = self.__database.execute_many(
+            query,
+            [
+                (int(reservation_id), int(itinerary_id), cabinets, passengers, position)
+                for position, (reservation_id, itinerary_id, cabinets, passengers) in enumerate(requests)
+            ],
+            template="(%s::int, %s::int, %s::int, %s::int, %s::int)",
+            fetch=True,
+        )
+        granted = [row["reservation_id"] for row in rows]
+
+        if len(granted) < len(requests):
+            logger.error(
+                f"Not enough cabinets left for {len(requests) - len(granted)} of {len(requests)} reservation(s)."
+            )
+        else:
+            logger.debug(f"Successfully updated remaining cabinets for {len(granted)} reservation(s).")
+
+        return granted
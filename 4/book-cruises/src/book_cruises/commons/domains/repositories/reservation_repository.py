@@ -39,7 +39,6 @@ class ReservationRepository:
         """
         try:
             row = self.__database.execute_query(query)[0]
-            self.__database.commit()
 
             reservation = Reservation(**row)
 
@@ -48,7 +47,6 @@ class ReservationRepository:
             return reservation
         except Exception as e:
             logger.error(f"Failed to create reservation: {e}")
-            self.__database.rollback()
             raise
 
     def update_status(self, reservation_id: int, new_status: str) -> Reservation:
@@ -72,7 +70,6 @@ class ReservationRepository:
         """
         try:
             row = self.__database.execute_query(query)[0]
-            self.__database.commit()
 
             reservation = Reservation(**row)
 
@@ -81,5 +78,27 @@ class ReservationRepository:
             return reservation
         except Exception as e:
             logger.error(f"Failed to update reservation status: {e}")
-            self.__database.rollback()
             raise
+
+    def update_statuses(self, statuses: dict[int, str]) -> int:
+        """Sets the status of many reservations with a single UPDATE.
+
+        Returns the number of reservations updated.
+        """
+        query = """
+            UPDATE reservations AS r
+            SET
+                reservation_status = v.status,
+                updated_at = transaction_timestamp()
+            FROM (VALUES %s) AS v(id, status)
+            WHERE r.id = v.id
+        """
+        rows_affected = self.__database.execute_many(
+            query,
+            [(int(reservation_id), status) for reservation_id, status in statuses.items()],
+            template="(%s::int, %s::varchar)",
+        )
+
+        logger.debug(f"{rows_affected} of {len(statuses)} reservation(s) had their status updated.")
+
+        return rows_affected
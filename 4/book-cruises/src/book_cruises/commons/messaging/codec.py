@@ -0,0 +1,160 @@
+"""Message codecs, selected by the AMQP `content_type` property.
+
+The body of a message holds only the encoded payload; its envelope is the
+AMQP properties: `content_type` names the codec and the `x-schema-version`
+header the payload schema. Consumers decode whatever codec a message was
+written with, so producers can switch codec (or schema version) only after
+every consumer of their queues has been upgraded. Messages without the header
+come from producers that predate it and are schema version 0.
+
+orjson and msgpack are optional (`pip install book-cruises[codecs]`); their
+codecs are only available when the package is installed.
+"""
+
+import json
+from typing import Any, Dict
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+SCHEMA_VERSION = 1  # Version of the payloads written by this code
+SCHEMA_VERSION_HEADER = "x-schema-version"
+
+JSON = "application/json"
+ORJSON = "application/x-orjson"  # JSON written by orjson, with integers beyond 64 bits as strings
+MSGPACK = "application/msgpack"
+
+INT64_MIN = -(2**63)
+UINT64_MAX = 2**64 - 1
+BIG_INT_EXT_TYPE = 1  # msgpack extension code for integers beyond 64 bits (payment and ticket ids)
+
+
+class CodecError(ValueError):
+    """A message could not be encoded or decoded."""
+
+
+def replace_big_ints(obj: Any, replace) -> Any:
+    """Copies `obj` with every integer outside the 64-bit range passed through `replace`."""
+    if isinstance(obj, bool):
+        return obj
+    if isinstance(obj, int):
+        return replace(obj) if obj < INT64_MIN or obj > UINT64_MAX else obj
+    if isinstance(obj, dict):
+        return {key: replace_big_ints(value, replace) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [replace_big_ints(value, replace) for value in obj]
+    return obj
+
+
+class Codec:
+    content_type: str = None
+
+    def encode(self, message: Any) -> bytes:
+        raise NotImplementedError
+
+    def decode(self, body: bytes) -> Any:
+        raise NotImplementedError
+
+
+class JsonCodec(Codec):
+    content_type = JSON
+
+    def encode(self, message: Any) -> bytes:
+        return json.dumps(message).encode()
+
+    def decode(self, body: bytes) -> Any:
+        return json.loads(body.decode())
+
+
+class OrjsonCodec(Codec):
+    """JSON through orjson. Integers beyond 64 bits are written as strings,
+    which the pydantic models convert back to int."""
+
+    content_type = ORJSON
+
+    def encode(self, message: Any) -> bytes:
+        try:
+            return orjson.dumps(message)
+        except TypeError:
+            # orjson rejects integers beyond 64 bits; only such messages pay for the copy
+            return orjson.dumps(replace_big_ints(message, str))
+
+    def decode(self, body: bytes) -> Any:
+        return orjson.loads(body)
+
+
+class MsgpackCodec(Codec):
+    """MessagePack. Integers beyond 64 bits travel as an extension type and
+    are decoded back to int."""
+
+    content_type = MSGPACK
+
+    def encode(self, message: Any) -> bytes:
+        try:
+            return msgpack.packb(message)
+        except OverflowError:
+            return msgpack.packb(
+                replace_big_ints(
+                    message, lambda value: msgpack.ExtType(BIG_INT_EXT_TYPE, str(value).encode())
+                )
+            )
+
+    def decode(self, body: bytes) -> Any:
+        return msgpack.unpackb(body, ext_hook=self.__ext_hook, strict_map_key=False)
+
+    @staticmethod
+    def __ext_hook(code: int, data: bytes):
+        if code == BIG_INT_EXT_TYPE:
+            return int(data)
+        return msgpack.ExtType(code, data)
+
+
+CODECS: Dict[str, Codec] = {JSON: JsonCodec()}
+if orjson is not None:
+    CODECS[ORJSON] = OrjsonCodec()
+if msgpack is not None:
+    CODECS[MSGPACK] = MsgpackCodec()
+
+
+def get_codec(content_type: str = None) -> Codec:
+    """Returns the codec for `content_type`; messages without one are JSON."""
+    codec = CODECS.get(content_type or JSON)
+    if codec is None:
+        raise CodecError(f"Unsupported content type '{content_type}'")
+    return codec
+
+
+def encode(message: Any, content_type: str = JSON) -> bytes:
+    try:
+        return get_codec(content_type).encode(message)
+    except CodecError:
+        raise
+    except Exception as e:
+        raise CodecError(f"Failed to encode message as '{content_type}': {e}") from e
+
+
+def decode(body: bytes, content_type: str = None, headers: dict = None) -> Any:
+    """Decodes a message body, checking that its schema version is one this code understands."""
+    version = (headers or {}).get(SCHEMA_VERSION_HEADER, 0)
+    if version > SCHEMA_VERSION:
+        raise CodecError(
+            f"Message schema version {version} is newer than the supported {SCHEMA_VERSION}"
+        )
+    try:
+        return get_codec(content_type).decode(body)
+    except CodecError:
+        raise
+    except Exception as e:
+        raise CodecError(f"Failed to decode '{content_type or JSON}' message: {e}") from e
+
+
+def headers() -> dict:
+    """AMQP headers every encoded message carries."""
+    return {SCHEMA_VERSION_HEADER: SCHEMA_VERSION}
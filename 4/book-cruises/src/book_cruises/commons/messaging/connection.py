@@ -1,8 +1,12 @@
 from pika import BlockingConnection, ConnectionParameters, PlainCredentials
 
 
+def create_parameters(host: str, username: str, password: str) -> ConnectionParameters:
+    """Creates the RabbitMQ connection parameters shared by every connection type."""
+    credentials = PlainCredentials(username, password)
+    return ConnectionParameters(host, credentials=credentials)
+
+
 def create_connection(host: str, username: str, password: str) -> BlockingConnection:
     """Creates and returns a RabbitMQ connection."""
-    credentials = PlainCredentials(username, password)
-    parameters = ConnectionParameters(host, credentials=credentials)
-    return BlockingConnection(parameters)
+    return BlockingConnection(create_parameters(host, username, password))
@@ -1,16 +1,87 @@
-import json
-from typing import Callable, Dict
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Hashable, List, Optional
 from pika import BasicProperties
 from book_cruises.commons.utils import logger
 
+from . import codec
 from .connection import create_connection
 
+OrderKey = Callable[[str, dict], Hashable]  # (routing key, message) -> key whose messages run in order
+
+
+def reject_failed(ch, method) -> None:
+    """Rejects a message whose callback failed.
+
+    The first failure requeues it for one more attempt; a message that fails
+    again after being redelivered is dropped, or dead-lettered if the queue
+    has a dead-letter exchange (e.g. set by a broker policy).
+    """
+    if method.redelivered:
+        logger.error(f"Message routed by '{method.routing_key}' failed again after redelivery, rejecting it")
+    ch.basic_reject(delivery_tag=method.delivery_tag, requeue=not method.redelivered)
+
+
+class OrderedExecutor:
+    """Thread pool that runs tasks sharing a key one after another, in submission order.
+
+    Tasks with different keys (or no key) run in parallel on any worker.
+    """
+
+    def __init__(self, workers: int):
+        self.__executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="consumer")
+        self.__lock = threading.Lock()
+        self.__lanes: Dict[Hashable, deque] = {}  # Key -> tasks waiting for the running one
+
+    def submit(self, task: Callable[[], None], key: Optional[Hashable] = None) -> None:
+        if key is None:
+            self.__executor.submit(task)
+            return
+        with self.__lock:
+            lane = self.__lanes.get(key)
+            if lane is not None:
+                lane.append(task)
+                return
+            self.__lanes[key] = deque()
+        self.__executor.submit(self.__run_lane, key, task)
+
+    def __run_lane(self, key: Hashable, task: Callable[[], None]) -> None:
+        while True:
+            task()
+            with self.__lock:
+                lane = self.__lanes[key]
+                if not lane:
+                    del self.__lanes[key]
+                    return
+                task = lane.popleft()
+
+    def shutdown(self) -> None:
+        self.__executor.shutdown(wait=True)
+
 
 class RabbitMQConsumer:
-    def __init__(self, host: str, username: str, password: str):
+    """Consumes queues on one BlockingConnection.
+
+    With `workers` = 0 callbacks run one at a time on the connection thread.
+    With `workers` > 0 they run on a thread pool, up to `prefetch_count`
+    unacked messages at a time; acks and replies are handed back to the
+    connection thread, the only one allowed to use the channel. Callbacks
+    must then be thread-safe.
+
+    A message whose callback raises is requeued once (see `reject_failed`).
+    """
+
+    def __init__(
+        self, host: str, username: str, password: str, prefetch_count: int = 1, workers: int = 0
+    ):
         self.connection = create_connection(host, username, password)
         self.channel = self.connection.channel()
         self.queue_callbacks: Dict[str, Callable[[dict], dict]] = {}
+        self.prefetch_count = max(prefetch_count, workers, 1)
+        self.executor = OrderedExecutor(workers) if workers > 0 else None
+        self.channel.basic_qos(prefetch_count=self.prefetch_count)
 
     def exchange_declare(
         self, exchange: str, exchange_type: str = "topic", durable: bool = False
@@ -24,33 +95,154 @@ class RabbitMQConsumer:
         """Optionally declare a queue. Can be skipped if queue exists."""
         self.channel.queue_declare(queue=queue_name, durable=durable)
 
-    def register_callback(self, queue_name: str, callback: Callable[[dict], dict]):
-        """Register a callback for an existing queue."""
+    def register_callback(
+        self,
+        queue_name: str,
+        callback: Callable[[dict], dict],
+        order_key: Optional[OrderKey] = None,
+    ):
+        """Register a callback for an existing queue.
+
+        When running with workers, messages with the same `order_key` are
+        processed in the order they arrived; without one they may run in any order.
+        """
         self.queue_callbacks[queue_name] = callback
 
+        def reply_and_ack(ch, method, properties: BasicProperties, response):
+            if properties.reply_to and properties.correlation_id:
+                ch.basic_publish(
+                    exchange="",
+                    routing_key=properties.reply_to,
+                    properties=properties,
+                    body=codec.encode(response, properties.content_type),
+                )
+
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+
+        def work(ch, method, properties: BasicProperties, message_decoded: dict):
+            try:
+                response = callback(message_decoded)
+            except Exception:
+                logger.error(f"Error processing message from '{queue_name}'", exc_info=True)
+                self.__on_connection_thread(partial(reject_failed, ch, method))
+                return
+            self.__on_connection_thread(partial(reply_and_ack, ch, method, properties, response))
+
         def wrapper(ch, method, properties: BasicProperties, body):
             try:
-                message_decoded = json.loads(body.decode())
-            except json.JSONDecodeError as e:
+                message_decoded = codec.decode(body, properties.content_type, properties.headers)
+            except codec.CodecError as e:
                 logger.error(f"Failed to decode message: {e}")
                 ch.basic_ack(delivery_tag=method.delivery_tag)
                 return
 
-            response = callback(message_decoded)
+            if self.executor is None:
+                work(ch, method, properties, message_decoded)
+                return
 
-            if properties.reply_to and properties.correlation_id:
-                ch.basic_publish(
-                    exchange="",
-                    routing_key=properties.reply_to,
-                    properties=properties,
-                    body=json.dumps(response).encode(),
+            key = order_key(method.routing_key, message_decoded) if order_key else None
+            self.executor.submit(partial(work, ch, method, properties, message_decoded), key)
+
+        self.channel.basic_consume(queue=queue_name, on_message_callback=wrapper)
+
+    def register_batch_callback(
+        self,
+        queue_name: str,
+        callback: Callable[[List[dict]], None],
+        max_batch_size: int = 100,
+        max_wait_ms: int = 50,
+    ):
+        """Register a callback that receives the queue's messages in batches.
+
+        A batch is delivered when `max_batch_size` messages have arrived or
+        `max_wait_ms` after the first message of the batch, whichever comes
+        first. Messages are acked only after the callback returns, so a batch
+        written in one transaction is acked after its commit. If it raises,
+        each message is retried as a batch of its own, so one bad message does
+        not fail the others; those that fail alone go to `reject_failed`. The
+        callback must therefore leave no changes behind when it raises.
+        Batches of a queue are processed in order.
+        """
+        self.queue_callbacks[queue_name] = callback
+        batch = []  # (method, message) received since the last flush
+        timer = None
+
+        if self.prefetch_count < max_batch_size:
+            # The broker would stop delivering before a batch could fill up
+            self.prefetch_count = max_batch_size
+            self.channel.basic_qos(prefetch_count=self.prefetch_count)
+
+        def settle(ch, methods, acked: bool):
+            for method in methods:
+                if acked:
+                    ch.basic_ack(delivery_tag=method.delivery_tag)
+                else:
+                    reject_failed(ch, method)
+
+        def run(pending) -> bool:
+            try:
+                callback([message for _, message in pending])
+                return True
+            except Exception:
+                logger.error(
+                    f"Error processing batch of {len(pending)} message(s) from '{queue_name}'",
+                    exc_info=True,
                 )
+                return False
 
-            ch.basic_ack(delivery_tag=method.delivery_tag)
+        def work(ch, pending):
+            if run(pending):
+                outcomes = [(pending, True)]
+            elif len(pending) == 1:
+                outcomes = [(pending, False)]
+            else:
+                # The callback's transaction was rolled back, so each message can be tried alone
+                outcomes = [([item], run([item])) for item in pending]
+            for settled, acked in outcomes:
+                self.__on_connection_thread(
+                    partial(settle, ch, [method for method, _ in settled], acked)
+                )
+
+        def flush(ch, expired=False):
+            nonlocal batch, timer
+            if timer is not None and not expired:
+                self.connection.remove_timeout(timer)
+            timer = None
+            if not batch:
+                return
+            pending, batch = batch, []
+            logger.debug(f"Processing batch of {len(pending)} message(s) from '{queue_name}'")
+            if self.executor is None:
+                work(ch, pending)
+            else:
+                self.executor.submit(partial(work, ch, pending), key=queue_name)
+
+        def wrapper(ch, method, properties: BasicProperties, body):
+            nonlocal timer
+            try:
+                message_decoded = codec.decode(body, properties.content_type, properties.headers)
+            except codec.CodecError as e:
+                logger.error(f"Failed to decode message: {e}")
+                ch.basic_ack(delivery_tag=method.delivery_tag)
+                return
+
+            batch.append((method, message_decoded))
+            if len(batch) >= max_batch_size:
+                flush(ch)
+            elif timer is None:
+                timer = self.connection.call_later(
+                    max_wait_ms / 1000, partial(flush, ch, expired=True)
+                )
 
-        self.channel.basic_qos(prefetch_count=1)
         self.channel.basic_consume(queue=queue_name, on_message_callback=wrapper)
 
+    def __on_connection_thread(self, action: Callable[[], None]) -> None:
+        """Runs a channel operation, handing it to the connection thread when called from a worker."""
+        if self.executor is None:
+            action()
+        else:
+            self.connection.add_callback_threadsafe(action)
+
     def basic_consume(self, queue_name: str, auto_ack: bool = False) -> tuple:
         return self.channel.basic_get(
             queue=queue_name,
@@ -82,5 +274,7 @@ class RabbitMQConsumer:
         return self
 
     def close(self):
+        if self.executor:
+            self.executor.shutdown()
         if self.connection and self.connection.is_open:
             self.connection.close()
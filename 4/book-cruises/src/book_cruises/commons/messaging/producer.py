@@ -1,88 +1,274 @@
 import uuid
-import json
 import threading
 import time
-from pika import BasicProperties
-from pika.exceptions import AMQPConnectionError
+from collections import deque
+from concurrent.futures import Future, wait
+from typing import NamedTuple
+
+from pika import BasicProperties, SelectConnection
+from pika.spec import Basic
 
 from book_cruises.commons.utils import logger
-from .connection import create_connection
+from . import codec
+from .connection import create_parameters
+
+CONFIRM_TIMEOUT = 5  # Seconds to wait for the broker to confirm a publish
+RECONNECT_DELAY = 1  # Seconds between reconnection attempts
+DIRECT_REPLY_TO = "amq.rabbitmq.reply-to"  # Pseudo-queue that routes RPC replies straight to this channel
+
+
+class PublishError(Exception):
+    """The broker refused (nacked) a message or did not confirm it in time."""
+
+
+class Publication(NamedTuple):
+    exchange: str
+    routing_key: str
+    body: bytes
+    properties: BasicProperties
+    future: Future
 
 
 class RabbitMQProducer:
-    def __init__(self, host, username, password):
+    """Thread-safe producer that keeps one connection open for the life of the process.
+
+    The connection is owned by a background I/O thread; `publish` hands the
+    message to that thread and, by default, waits for the broker's publisher
+    confirm. Many threads publishing at once share the round-trip, since the
+    broker confirms several deliveries per frame. Messages published while the
+    connection is down are buffered and sent after reconnecting; messages that
+    were in flight when it dropped are sent again.
+
+    The same channel consumes RabbitMQ's direct reply-to pseudo-queue, so
+    `rpc_publish` calls from any number of threads share it: replies are routed
+    to the waiting caller by correlation id.
+    """
+
+    def __init__(
+        self, host, username, password, confirm_timeout=CONFIRM_TIMEOUT, content_type=codec.JSON
+    ):
         self.host = host
         self.username = username
         self.password = password
-        self.connection = None
+        self.confirm_timeout = confirm_timeout
+        self.content_type = content_type
+        codec.get_codec(content_type)  # Fails now, not on the first publish, if the codec is missing
+        self.connection: SelectConnection = None
         self.channel = None
-        self.responses = {}
-
-    def _ensure_channel(self):
-        if not self.connection or self.connection.is_closed:
-            self.connection = create_connection(self.host, self.username, self.password)
-        if not self.channel or self.channel.is_closed:
-            self.channel = self.connection.channel()
-
-    def publish(self, routing_key: str, message: dict, exchange: str = ""):
-        self._ensure_channel()
-        self.channel.basic_publish(
-            exchange=exchange,
-            routing_key=routing_key,
-            body=json.dumps(message).encode(),
-            properties=BasicProperties(content_type="application/json", delivery_mode=2),
-        )
-        self.close()
 
-    def _on_response(self, ch, method, props, body):
-        self.responses[props.correlation_id] = json.loads(body)
-        ch.basic_ack(delivery_tag=method.delivery_tag)
+        self.__lock = threading.Lock()
+        self.__io_thread: threading.Thread = None
+        self.__closing = False
+        self.__outbox: deque[Publication] = deque()  # Waiting for the I/O thread
+        self.__unconfirmed: dict[int, Publication] = {}  # Delivery tag -> publication
+        self.__delivery_tag = 0
+        self.__ready = threading.Event()
+        self.__pending_replies: dict[str, Future] = {}  # Correlation id -> RPC reply
+
+    def publish(
+        self, routing_key: str, message: dict, exchange: str = "", wait_confirm: bool = True
+    ) -> Future:
+        """Publishes a persistent message, encoded with the producer's codec.
+
+        With `wait_confirm` (the default) blocks until the broker confirms the
+        message and raises PublishError if it is refused or not confirmed within
+        `confirm_timeout`. Otherwise returns a Future resolved on confirmation.
+        """
+        future = self.__enqueue(exchange, routing_key, message)
+        if wait_confirm:
+            self.__wait([future])
+        return future
+
+    def publish_many(self, routing_key: str, messages: list[dict], exchange: str = "") -> None:
+        """Publishes every message and waits once for all of their confirms."""
+        self.__wait([self.__enqueue(exchange, routing_key, message) for message in messages])
+
+    def flush(self, timeout: float = None) -> None:
+        """Waits until every message published so far has been confirmed."""
+        futures = [publication.future for publication in list(self.__outbox)]
+        futures += [publication.future for publication in list(self.__unconfirmed.values())]
+        self.__wait(futures, timeout)
 
     def rpc_publish(self, routing_key: str, message: dict, timeout=5, exchange: str = ""):
-        self._ensure_channel()
+        """Sends a request and waits up to `timeout` seconds for its reply.
+
+        Returns the decoded reply, or None if it does not arrive in time.
+        """
         correlation_id = str(uuid.uuid4())
-        result = self.channel.queue_declare(queue="", exclusive=True, auto_delete=True)
-        callback_queue = result.method.queue
+        reply = Future()
+        self.__pending_replies[correlation_id] = reply
+        try:
+            self.__enqueue(
+                exchange,
+                routing_key,
+                message,
+                reply_to=DIRECT_REPLY_TO,
+                correlation_id=correlation_id,
+            )
+            return reply.result(timeout)
+        except TimeoutError:
+            logger.warning(f"No reply from '{routing_key}' after {timeout}s")
+            return None
+        finally:
+            self.__pending_replies.pop(correlation_id, None)
 
-        self.channel.basic_consume(
-            queue=callback_queue,
-            on_message_callback=self._on_response,
-            auto_ack=False
+    def __enqueue(
+        self, exchange: str, routing_key: str, message: dict, reply_to=None, correlation_id=None
+    ) -> Future:
+        self.__start()
+        future = Future()
+        properties = BasicProperties(
+            content_type=self.content_type,
+            headers=codec.headers(),
+            delivery_mode=2,
+            reply_to=reply_to,
+            correlation_id=correlation_id,
+        )
+        self.__outbox.append(
+            Publication(exchange, routing_key, codec.encode(message, self.content_type), properties, future)
         )
+        self.__wake()
+        return future
 
-        self.channel.basic_publish(
-            exchange=exchange,
-            routing_key=routing_key,
-            body=json.dumps(message).encode(),
-            properties=BasicProperties(
-                reply_to=callback_queue,
-                correlation_id=correlation_id,
-                content_type="application/json",
-                delivery_mode=2,
-            ),
+    def __wait(self, futures: list[Future], timeout: float = None) -> None:
+        timeout = self.confirm_timeout if timeout is None else timeout
+        _, not_done = wait(futures, timeout=timeout)
+        if not_done:
+            raise PublishError(f"{len(not_done)} message(s) not confirmed after {timeout}s")
+        for future in futures:
+            future.result()
+
+    def __wake(self) -> None:
+        connection = self.connection
+        if connection is None:
+            return
+        try:
+            connection.ioloop.add_callback_threadsafe(self.__drain)
+        except Exception:
+            # The connection is being replaced; the new channel drains the outbox when it opens
+            pass
+
+    def __start(self) -> None:
+        with self.__lock:
+            if self.__io_thread is not None:
+                return
+            self.__closing = False
+            self.__io_thread = threading.Thread(target=self.__run, daemon=True)
+            self.__io_thread.start()
+
+    def __run(self) -> None:
+        while not self.__closing:
+            self.connection = SelectConnection(
+                parameters=create_parameters(self.host, self.username, self.password),
+                on_open_callback=self.__on_connection_open,
+                on_open_error_callback=self.__on_connection_open_error,
+                on_close_callback=self.__on_connection_closed,
+            )
+            self.connection.ioloop.start()
+            if not self.__closing:
+                time.sleep(RECONNECT_DELAY)
+
+    def __on_connection_open(self, connection: SelectConnection) -> None:
+        logger.debug("Producer connection opened.")
+        connection.channel(on_open_callback=self.__on_channel_open)
+
+    def __on_connection_open_error(self, connection: SelectConnection, error: Exception) -> None:
+        logger.error(f"Producer failed to connect to RabbitMQ, retrying: {error}")
+        connection.ioloop.stop()
+
+    def __on_connection_closed(self, connection: SelectConnection, reason: Exception) -> None:
+        self.channel = None
+        self.__ready.clear()
+        if not self.__closing:
+            logger.warning(f"Producer connection closed, reconnecting: {reason}")
+        connection.ioloop.stop()
+
+    def __on_channel_open(self, channel) -> None:
+        self.channel = channel
+        channel.add_on_close_callback(self.__on_channel_closed)
+        channel.confirm_delivery(
+            ack_nack_callback=self.__on_delivery_confirmation,
+            callback=self.__on_confirm_select_ok,
         )
 
-        # Start the I/O loop in a separate thread if not already running
-        def consumer_loop():
-            while correlation_id not in self.responses:
-                try:
-                    self.connection.process_data_events(time_limit=0.1)
-                except AMQPConnectionError as e:
-                    print(f"Lost connection while waiting for RPC reply: {e}")
-                    break
+    def __on_confirm_select_ok(self, frame) -> None:
+        # Replies to direct reply-to must be consumed, without acks, before any request is sent
+        self.channel.basic_consume(
+            queue=DIRECT_REPLY_TO, on_message_callback=self.__on_response, auto_ack=True
+        )
+        # Delivery tags restart on every channel; in-flight messages from a lost channel go first
+        self.__delivery_tag = 0
+        self.__outbox.extendleft(reversed(list(self.__unconfirmed.values())))
+        self.__unconfirmed.clear()
+        self.__ready.set()
+        self.__drain()
 
-        start = time.time()
-        thread = threading.Thread(target=consumer_loop)
-        thread.start()
-        thread.join(timeout)
+    def __on_channel_closed(self, channel, reason: Exception) -> None:
+        self.channel = None
+        self.__ready.clear()
+        if not self.__closing:
+            logger.warning(f"Producer channel closed: {reason}")
+            if self.connection and self.connection.is_open:
+                self.connection.close()
 
-        self.close()
+    def __drain(self) -> None:
+        while self.__ready.is_set() and self.__outbox:
+            publication = self.__outbox.popleft()
+            self.__delivery_tag += 1
+            self.__unconfirmed[self.__delivery_tag] = publication
+            self.channel.basic_publish(
+                exchange=publication.exchange,
+                routing_key=publication.routing_key,
+                body=publication.body,
+                properties=publication.properties,
+            )
 
-        return self.responses.pop(correlation_id, None)
+    def __on_delivery_confirmation(self, frame) -> None:
+        method = frame.method
+        acked = isinstance(method, Basic.Ack)
+        if method.multiple:
+            # Tags are assigned in increasing order, so the dict is ordered by tag
+            tags = [tag for tag in self.__unconfirmed if tag <= method.delivery_tag]
+        else:
+            tags = [method.delivery_tag]
+        for tag in tags:
+            publication = self.__unconfirmed.pop(tag, None)
+            if publication is None or publication.future.done():
+                continue
+            if acked:
+                publication.future.set_result(True)
+            else:
+                publication.future.set_exception(
+                    PublishError(f"Message to '{publication.routing_key}' was refused by the broker")
+                )
 
+    def __on_response(self, channel, method, properties: BasicProperties, body: bytes) -> None:
+        reply = self.__pending_replies.pop(properties.correlation_id, None)
+        if reply is None:
+            logger.debug(f"Discarding late RPC reply '{properties.correlation_id}'")
+            return
+        try:
+            reply.set_result(codec.decode(body, properties.content_type, properties.headers))
+        except codec.CodecError as e:
+            reply.set_exception(e)
 
     def close(self):
-        if self.channel and self.channel.is_open:
-            self.channel.close()
-        if self.connection and self.connection.is_open:
+        """Waits for pending confirms, then closes the connection and stops the I/O thread."""
+        with self.__lock:
+            io_thread, self.__io_thread = self.__io_thread, None
+        if io_thread is None:
+            return
+        try:
+            self.flush()
+        except PublishError as e:
+            logger.warning(f"Closing producer with unconfirmed messages: {e}")
+        self.__closing = True
+        if self.connection:
+            self.connection.ioloop.add_callback_threadsafe(self.__shutdown)
+        io_thread.join(self.confirm_timeout)
+
+    def __shutdown(self) -> None:
+        if self.connection.is_open:
             self.connection.close()
+        elif not self.connection.is_closing:
+            self.connection.ioloop.stop()
@@ -21,6 +21,15 @@ class Config(BaseSettings):
     TICKET_GENERATED_QUEUE: str = "ticket_generated_queue"
     PROMOTIONS_QUEUE: str = "promotions_queue"
 
+    # RabbitMQ Message Encoding
+    MESSAGE_CONTENT_TYPE: str = "application/json"  # Codec for published messages; consumers read any installed codec
+
+    # RabbitMQ Consumer Configuration
+    CONSUMER_PREFETCH_COUNT: int = 32  # Unacked messages a consumer may hold at once
+    CONSUMER_WORKERS: int = 0  # Threads running consumer callbacks; 0 runs them on the connection thread
+    CONSUMER_BATCH_SIZE: int = 100  # Most messages handed to a batch callback at once
+    CONSUMER_BATCH_WAIT_MS: int = 50  # Longest time a message waits for its batch to fill up
+
     # RabbitMQ Routing Keys
     APPROVED_PAYMENT_ROUTING_KEY: str = "approved_payment"
 
@@ -58,6 +67,10 @@ class Config(BaseSettings):
     )
 
     REQUEST_TIMEOUT: int = 5  # Timeout for HTTP requests in seconds
+    HTTP_CLIENT_MAX_CONNECTIONS: int = 100  # Open connections shared by the async HTTP client
+
+    # Async Book Service Configuration
+    ASYNC_CONSUMER_PREFETCH_COUNT: int = 100  # Unacked messages processed concurrently by the async consumer
 
     # PostgreSQL Configuration
     DB_HOST: str = "localhost"
@@ -65,6 +78,9 @@ class Config(BaseSettings):
     DB_USER: str = "user"
     DB_PASSWORD: str = "password"
     DB_PORT: int = 5432
+    DB_POOL_MIN_SIZE: int = 1  # Connections opened when the pool starts
+    DB_POOL_MAX_SIZE: int = 10  # Upper bound of concurrent connections per service
+    DB_POOL_TIMEOUT: int = 5  # Seconds to wait for a free connection before failing
 
     # Logging Configuration
     LOG_LEVEL: str = (
@@ -10,7 +10,10 @@ def __configure_dependencies(binder: inject.Binder) -> None:
         database=config.DB_NAME,
         user=config.DB_USER,
         password=config.DB_PASSWORD,
-        port=config.DB_PORT
+        port=config.DB_PORT,
+        min_connections=config.DB_POOL_MIN_SIZE,
+        max_connections=config.DB_POOL_MAX_SIZE,
+        pool_timeout=config.DB_POOL_TIMEOUT,
     )
 
     # Create producer for sending promotions
@@ -18,6 +21,7 @@ def __configure_dependencies(binder: inject.Binder) -> None:
         host=config.RABBITMQ_HOST,
         username=config.RABBITMQ_USERNAME,
         password=config.RABBITMQ_PASSWORD,
+        content_type=config.MESSAGE_CONTENT_TYPE,
     )
 
     # Bind instances to their types
@@ -8,12 +8,15 @@ def __configure_dependencies(binder: inject.Binder) -> None:
         host=config.RABBITMQ_HOST,
         username=config.RABBITMQ_USERNAME,
         password=config.RABBITMQ_PASSWORD,
+        prefetch_count=config.CONSUMER_PREFETCH_COUNT,
+        workers=config.CONSUMER_WORKERS,
     )
 
     producer = Producer(
         host=config.RABBITMQ_HOST,
         username=config.RABBITMQ_USERNAME,
         password=config.RABBITMQ_PASSWORD,
+        content_type=config.MESSAGE_CONTENT_TYPE,
     )
 
     binder.bind(Producer, producer)